@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
 import argparse
 import logging
 from pathlib import Path
@@ -19,7 +20,10 @@ load_dotenv()
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from code_assistant import CodeAssistant
+from multi_repo import MultiRepoAssistant
 from config import AppConfig, LLMConfig
+from ann_index import check_ann_support
+import evaluation
 
 def main():
     parser = argparse.ArgumentParser(
@@ -30,14 +34,21 @@ Examples:
   python main.py --repo ./my_project --interactive
   python main.py --repo ./my_project --query "How does the authentication work?"
   python main.py --repo ./my_project --provider openai --model gpt-4
+  python main.py --repo billing=../billing api=../api --query "@billing who calls charge()?"
+  python main.py --repo . --export-index index.tar.gz      # in CI
+  python main.py --repo . --import-index index.tar.gz --interactive
+  python main.py --repo test_repo --provider offline --db-path /tmp/eval_db \
+      --evaluate eval/golden_test_repo.json --baseline eval/baseline_offline.json
         """
     )
     
     parser.add_argument(
         '--repo',
         type=str,
+        nargs='+',
+        action='extend',
         required=True,
-        help='Path to the code repository to analyze'
+        help='Path to the code repository to analyze; pass several (optionally name=path) to query them as shards'
     )
     
     parser.add_argument(
@@ -65,6 +76,103 @@ Examples:
         help='Force rebuild the vector index'
     )
     
+    parser.add_argument(
+        '--export-index',
+        type=str,
+        metavar='BUNDLE',
+        help='Build or refresh the index, write it to a portable bundle file (e.g. index.tar.gz) and exit'
+    )
+    
+    parser.add_argument(
+        '--import-index',
+        type=str,
+        metavar='BUNDLE',
+        help='Install a prebuilt index bundle first; only local changes are then re-indexed'
+    )
+    
+    parser.add_argument(
+        '--evaluate',
+        type=str,
+        metavar='GOLDEN',
+        help='Run a golden question set (recall@k, MRR, p50/p95 latency), write the results and exit'
+    )
+    
+    parser.add_argument(
+        '--eval-output',
+        type=str,
+        default='eval/results.json',
+        help='Where --evaluate writes its results (default: eval/results.json)'
+    )
+    
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        help='Results file to compare --evaluate against; exits with status 1 on a regression'
+    )
+    
+    parser.add_argument(
+        '--eval-repeats',
+        type=int,
+        default=3,
+        help='Timed passes over the golden set (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--max-file-bytes',
+        type=int,
+        help='Skip source files larger than this many bytes (default: 1000000)'
+    )
+    
+    parser.add_argument(
+        '--chunking',
+        choices=['structural', 'recursive'],
+        help='Chunk per function/class (structural, default) or by character window (recursive)'
+    )
+    
+    parser.add_argument(
+        '--top-files',
+        type=int,
+        help='Two-tier retrieval: search chunks of the N best-matching files only (default: 0 = all chunks)'
+    )
+    
+    parser.add_argument(
+        '--latency-budget',
+        type=float,
+        help='Seconds per question; retrieval and generation degrade in stages to meet it (default: unlimited)'
+    )
+    
+    parser.add_argument(
+        '--multi-query',
+        action='store_true',
+        help='Split compound questions into sub-queries searched in parallel and fused by rank'
+    )
+    
+    parser.add_argument(
+        '--no-compression',
+        action='store_true',
+        help='Send retrieved chunks verbatim instead of stripping comments, docstrings and unrelated bodies'
+    )
+    
+    parser.add_argument(
+        '--telemetry-log',
+        type=str,
+        metavar='JSONL',
+        help='Append per-question telemetry (stage latencies, tokens, TTFT, cache hits) to this file'
+    )
+    
+    parser.add_argument(
+        '--background-index',
+        action='store_true',
+        help='With --interactive, build a missing index in the background (recently changed and most-imported '
+             'files first) and answer from what is indexed so far'
+    )
+    
+    parser.add_argument(
+        '--no-sync',
+        action='store_true',
+        help='Only report files changed since the index was built instead of re-indexing them'
+    )
+    
     parser.add_argument(
         '--show-sources',
         action='store_true',
@@ -88,8 +196,8 @@ Examples:
         '--provider',
         type=str,
         default='ollama',
-        choices=['ollama', 'openai'],
-        help='LLM provider to use (default: ollama)'
+        choices=['ollama', 'openai', 'offline'],
+        help='LLM provider to use (default: ollama; offline = model-free stand-ins for evaluation)'
     )
 
     parser.add_argument(
@@ -99,37 +207,184 @@ Examples:
         help='Model name to use (default: llama3)'
     )
     
+    parser.add_argument(
+        '--fast-model',
+        type=str,
+        help='Small model for simple lookup questions; the --model handles the rest'
+    )
+    
+    parser.add_argument(
+        '--quantization',
+        type=str,
+        choices=['int8', 'float16'],
+        help='Keep a quantized in-memory copy of the embeddings for a fast first-pass search (adds to disk usage)'
+    )
+
+    parser.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='With --quantization, rank on quantized vectors only (no full-precision rescoring)'
+    )
+    
+    parser.add_argument(
+        '--ann',
+        type=str,
+        choices=['ivf', 'hnsw'],
+        help='Use an approximate nearest-neighbor index for candidate search'
+    )
+
+    parser.add_argument(
+        '--nprobe',
+        type=int,
+        help='IVF clusters scanned per query (higher = better recall, slower)'
+    )
+
+    parser.add_argument(
+        '--ef',
+        type=int,
+        help='HNSW search breadth (higher = better recall, slower)'
+    )
+    
+    parser.add_argument(
+        '--search-type',
+        type=str,
+        choices=['mmr', 'similarity'],
+        help='Retrieval strategy (default: mmr; similarity skips the diversity pass)'
+    )
+
+    parser.add_argument(
+        '--k',
+        type=int,
+        help='Number of chunks retrieved per question (default: 8)'
+    )
+
+    parser.add_argument(
+        '--fetch-k',
+        type=int,
+        help='MMR candidate pool size (default: 20)'
+    )
+
+    parser.add_argument(
+        '--lambda-mult',
+        type=float,
+        help='MMR relevance/diversity balance, 1.0 = relevance only (default: 0.5)'
+    )
+    
     args = parser.parse_args()
     
-    if not os.path.exists(args.repo):
-        logger.error(f"Repository path does not exist: {args.repo}")
-        sys.exit(1)
+    repos = {}
+    for entry in args.repo:
+        name, _, path = entry.rpartition('=') if '=' in entry else ('', '', entry)
+        name = name or os.path.basename(os.path.abspath(path))
+        if not os.path.exists(path):
+            logger.error(f"Repository path does not exist: {path}")
+            sys.exit(1)
+        if name in repos:
+            logger.error(f"Two repositories are named '{name}' ({repos[name]} and {path}); "
+                         f"name them with --repo name=path")
+            sys.exit(1)
+        repos[name] = path
     
     # Initialize configuration
     config = AppConfig.from_env()
     config.persist_directory = args.db_path
     config.llm.provider = args.provider
     config.llm.model_name = args.model
+    if args.fast_model:
+        config.llm.fast_model_name = args.fast_model
+    if args.no_sync:
+        config.auto_sync = False
+    if args.max_file_bytes:
+        config.max_file_bytes = args.max_file_bytes
+    if args.chunking:
+        config.chunking = args.chunking
+    if args.top_files is not None:
+        config.retrieval.top_files = args.top_files
+    if args.multi_query:
+        config.retrieval.multi_query = True
+    if args.telemetry_log:
+        config.telemetry_log = args.telemetry_log
+    if args.no_compression:
+        config.compress_prompt = False
+    if args.background_index:
+        config.background_index = True
+    if args.latency_budget is not None:
+        config.latency_budget = args.latency_budget
+    if args.quantization:
+        config.retrieval.quantization = args.quantization
+    if args.low_memory:
+        config.retrieval.rescore = False
+    if args.ann:
+        config.retrieval.ann = args.ann
+    if args.nprobe:
+        config.retrieval.ann_nprobe = args.nprobe
+    if args.ef:
+        config.retrieval.ann_ef = args.ef
+    if args.search_type:
+        config.retrieval.search_type = args.search_type
+    if args.k:
+        config.retrieval.k = args.k
+    if args.fetch_k:
+        config.retrieval.fetch_k = args.fetch_k
+    if args.lambda_mult is not None:
+        config.retrieval.lambda_mult = args.lambda_mult
 
     if args.provider == 'openai' and not config.llm.api_key:
         logger.error("OPENAI_API_KEY environment variable not set for OpenAI provider")
         sys.exit(1)
+    try:
+        check_ann_support(config.retrieval.ann)
+    except (ValueError, ImportError) as e:
+        logger.error(str(e))
+        sys.exit(1)
     
     logger.info("Initializing AI Code Assistant...")
-    logger.info(f"Repository: {args.repo}")
+    logger.info(f"Repository: {', '.join(repos.values())}")
     logger.info(f"Provider: {args.provider}, Model: {args.model}")
     
+    if (args.export_index or args.import_index) and len(repos) > 1:
+        logger.error("Index bundles hold a single repository's index")
+        sys.exit(1)
+    if args.evaluate and len(repos) > 1:
+        logger.error("Golden sets name files of a single repository")
+        sys.exit(1)
+    
     try:
-        assistant = CodeAssistant(
-            repo_path=args.repo,
-            config=config
-        )
+        if len(repos) > 1:
+            assistant = MultiRepoAssistant(repos, config=config)
+        else:
+            assistant = CodeAssistant(
+                repo_path=next(iter(repos.values())),
+                config=config
+            )
+        
+        if args.export_index:
+            assistant.export_index(args.export_index, args.extensions)
+            return
+        if args.import_index:
+            assistant.import_index(args.import_index)
         
         assistant.index_repository(
             file_extensions=args.extensions,
-            force_reindex=args.reindex
+            force_reindex=args.reindex,
+            # One-shot commands need the whole index before they run
+            background=config.background_index and args.interactive
         )
         
+        if args.evaluate:
+            results = evaluation.evaluate(assistant, evaluation.load_golden(args.evaluate), repeats=args.eval_repeats)
+            evaluation.write_results(results, args.eval_output)
+            print(json.dumps(results["metrics"], indent=2, sort_keys=True))
+            print(f"Results written to {args.eval_output}")
+            if args.baseline:
+                with open(args.baseline, 'r', encoding='utf-8') as f:
+                    lines, regressions = evaluation.compare(results, json.load(f))
+                print("\n".join(lines))
+                if regressions:
+                    logger.error(f"Regressed against {args.baseline}: {', '.join(regressions)}")
+                    sys.exit(1)
+            return
+        
         if args.show_structure:
             print("\n" + "="*80)
             print(assistant.get_repository_structure())
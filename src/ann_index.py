@@ -0,0 +1,291 @@
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+import os
+import json
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from quantization import QuantizedIndex, append_rows, top_k
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ANN = ("ivf", "hnsw")
+
+
+def check_ann_support(ann: Optional[str]) -> None:
+    """Fail fast on an unknown ANN mode, or HNSW without hnswlib, before any index is opened."""
+    if ann and ann not in SUPPORTED_ANN:
+        raise ValueError(f"Unsupported ANN index: {ann}")
+    if ann == "hnsw" and hnswlib is None:
+        raise ImportError("--ann hnsw needs the optional hnswlib package: pip install hnswlib")
+
+
+class IVFIndex(QuantizedIndex):
+    """
+    Inverted-file index: vectors are clustered around nlist centroids (spherical k-means)
+    and a query only scores the rows of its nprobe closest clusters. Storage reuses the
+    QuantizedIndex layout, so IVF can run over int8/float16 codes or plain float32.
+    k-means assignment and batched queries are spread over a thread pool; NumPy releases
+    the GIL inside the matrix products, so this scales across cores.
+    """
+
+    FILE_NAME = "ivf_index.npz"
+    TRAIN_SAMPLE = 100_000
+    TRAIN_ITERATIONS = 10
+    PARALLEL_ROWS = 200_000
+
+    def __init__(self, dtype: str = "float32", nlist: int = 0, nprobe: int = 8, threads: int = 0):
+        super().__init__(dtype)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.threads = threads or os.cpu_count() or 1
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._list_order = np.empty(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._lists_stale = False  # rebuilt on the next search, not after every added batch
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="ivf")
+        return self._executor
+
+    def _blocks(self, n: int) -> List[Tuple[int, int]]:
+        size = max(1, -(-n // self.threads))
+        return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+    def _assign(self, matrix: np.ndarray) -> np.ndarray:
+        """Nearest centroid of every row, computed in parallel blocks."""
+        def assign_block(bounds):
+            start, end = bounds
+            return np.argmax(matrix[start:end] @ self.centroids.T, axis=1).astype(np.int32)
+        parts = list(self.executor.map(assign_block, self._blocks(len(matrix))))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+
+    def train(self, vectors) -> None:
+        """
+        Fit the coarse quantizer with spherical k-means.
+
+        Args:
+            vectors: Sample of full-precision embeddings
+        """
+        matrix = self.normalize(vectors)
+        nlist = self.nlist or int(4 * np.sqrt(len(matrix)))
+        nlist = max(1, min(nlist, len(matrix)))
+        rng = np.random.default_rng(0)
+
+        if len(matrix) > self.TRAIN_SAMPLE:
+            matrix = matrix[rng.choice(len(matrix), self.TRAIN_SAMPLE, replace=False)]
+
+        self.centroids = matrix[rng.choice(len(matrix), nlist, replace=False)].copy()
+        for _ in range(self.TRAIN_ITERATIONS):
+            labels = self._assign(matrix)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, matrix)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = matrix[rng.choice(len(matrix), int(empty.sum()))]
+            self.centroids = self.normalize(sums)
+
+        self.nlist = nlist
+        logger.info(f"Trained IVF quantizer with {nlist} lists on {len(matrix)} vectors")
+
+    @property
+    def assignments(self) -> np.ndarray:
+        """Cluster of every stored row."""
+        return self._assignments[:len(self.ids)]
+
+    @assignments.setter
+    def assignments(self, value: np.ndarray) -> None:
+        self._assignments = value
+
+    def compact(self) -> None:
+        super().compact()
+        if len(self._assignments) > len(self.ids):
+            self._assignments = self.assignments.copy()
+
+    def _rebuild_lists(self) -> None:
+        self._lists_stale = False
+        self._list_order = np.argsort(self.assignments, kind="stable")
+        counts = np.bincount(self.assignments, minlength=self.nlist)
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        if not ids:
+            return
+        if self.centroids is None:
+            self.train(vectors)
+        used = len(self.ids)
+        self._assignments = append_rows(self._assignments, used, self._assign(self.normalize(vectors)))
+        super().add(ids, vectors)
+        self._lists_stale = True
+
+    def remove(self, ids: Sequence[str]) -> None:
+        doomed = set(ids)
+        if not doomed or not self.ids:
+            return
+        keep = np.array([i not in doomed for i in self.ids], dtype=bool)
+        self.assignments = self.assignments[keep]
+        super().remove(ids)
+        self._rebuild_lists()
+
+    def _probe_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._lists_stale:
+            self._rebuild_lists()
+        lists = top_k(self.centroids @ query, nprobe)
+        return np.concatenate([
+            self._list_order[self._list_offsets[i]:self._list_offsets[i + 1]] for i in lists
+        ])
+
+    def search(self, query_vector, k: int, nprobe: int = None) -> List[Tuple[str, float]]:
+        """
+        Find approximately the k nearest stored vectors.
+
+        Args:
+            query_vector: Full-precision query embedding
+            k: Number of candidates to return
+            nprobe: Clusters to scan (more = better recall, higher latency)
+
+        Returns:
+            List of (id, cosine similarity), best first
+        """
+        if not self.ids or k <= 0:
+            return []
+
+        query = self.normalize(query_vector)[0]
+        rows = self._probe_rows(query, nprobe or self.nprobe)
+
+        if len(rows) > self.PARALLEL_ROWS:
+            parts = self.executor.map(lambda b: self.scores_for(rows[b[0]:b[1]], query), self._blocks(len(rows)))
+            scores = np.concatenate(list(parts))
+        else:
+            scores = self.scores_for(rows, query)
+
+        best = top_k(scores, k)
+        return [(self.ids[rows[i]], float(scores[i])) for i in best]
+
+    def _arrays(self) -> dict:
+        arrays = super()._arrays()
+        arrays["centroids"] = self.centroids if self.centroids is not None else np.empty((0, 0), dtype=np.float32)
+        arrays["assignments"] = self.assignments
+        arrays["params"] = np.array([self.nlist, self.nprobe])
+        return arrays
+
+    def _restore(self, data) -> None:
+        super()._restore(data)
+        self.nlist = int(data["params"][0])
+        self.centroids = data["centroids"] if data["centroids"].size else None
+        self.assignments = data["assignments"].astype(np.int32)
+        self._rebuild_lists()
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph (via hnswlib) over cosine distance.
+    ef trades recall for latency at query time; M and ef_construction shape the graph.
+    Insertion and batched queries use hnswlib's native worker threads.
+    """
+
+    FILE_NAME = "hnsw_index.bin"
+    META_FILE = "hnsw_index.json"
+    exact = True
+
+    def __init__(self, ef: int = 64, M: int = 16, ef_construction: int = 200, threads: int = 0):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSW mode: pip install hnswlib")
+        self.ef = ef
+        self.M = M
+        self.ef_construction = ef_construction
+        self.threads = threads or os.cpu_count() or 1
+        self.index = None
+        self.dim = 0
+        self.labels: List[Optional[str]] = []
+        self._label_of = {}
+
+    def __len__(self) -> int:
+        return len(self._label_of)
+
+    @property
+    def dimension(self) -> int:
+        return self.dim
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.get_current_count() * (self.dim * 4 + self.M * 2 * 4) if self.index else 0
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        if not ids:
+            return
+        matrix = QuantizedIndex.normalize(vectors)
+
+        if self.index is None:
+            self.dim = matrix.shape[1]
+            self.index = hnswlib.Index(space="cosine", dim=self.dim)
+            self.index.init_index(max_elements=max(1024, len(ids) * 2), M=self.M, ef_construction=self.ef_construction)
+        needed = len(self.labels) + len(ids)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(needed * 2)
+
+        labels = np.arange(len(self.labels), needed)
+        self.index.add_items(matrix, labels, num_threads=self.threads)
+        for label, doc_id in zip(labels, ids):
+            self.labels.append(doc_id)
+            self._label_of[doc_id] = int(label)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        for doc_id in ids:
+            label = self._label_of.pop(doc_id, None)
+            if label is not None:
+                self.index.mark_deleted(label)
+                self.labels[label] = None
+
+    def search(self, query_vector, k: int) -> List[Tuple[str, float]]:
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(self, query_vectors, k: int) -> List[List[Tuple[str, float]]]:
+        """Query the graph; hnswlib parallelizes across the batch."""
+        k = min(k, len(self))
+        if k <= 0:
+            return [[] for _ in query_vectors]
+
+        self.index.set_ef(max(self.ef, k))
+        labels, distances = self.index.knn_query(
+            QuantizedIndex.normalize(query_vectors), k=k, num_threads=self.threads
+        )
+        return [
+            [(self.labels[label], 1.0 - float(distance)) for label, distance in zip(row_labels, row_distances)]
+            for row_labels, row_distances in zip(labels, distances)
+        ]
+
+    def save(self, directory: str) -> None:
+        if self.index is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.index.save_index(os.path.join(directory, self.FILE_NAME))
+        with open(os.path.join(directory, self.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "M": self.M, "ef_construction": self.ef_construction,
+                       "labels": self.labels}, f)
+
+    @classmethod
+    def load(cls, directory: str, ef: int = 64, threads: int = 0) -> Optional["HNSWIndex"]:
+        meta_path = os.path.join(directory, cls.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        index = cls(ef=ef, M=meta["M"], ef_construction=meta["ef_construction"], threads=threads)
+        index.dim = meta["dim"]
+        index.labels = meta["labels"]
+        index._label_of = {doc_id: label for label, doc_id in enumerate(index.labels) if doc_id is not None}
+        index.index = hnswlib.Index(space="cosine", dim=index.dim)
+        index.index.load_index(os.path.join(directory, cls.FILE_NAME),
+                               max_elements=max(1024, len(index.labels) * 2))
+        return index
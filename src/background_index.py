@@ -0,0 +1,168 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set
+
+
+class IndexingCancelled(Exception):
+    """Raised inside a background build that was asked to stop; its last checkpoint stays resumable."""
+
+
+def _rank_scores(values: Dict[str, float]) -> Dict[str, float]:
+    """Scores in (0, 1] by rank, highest value first; paths with no signal get none."""
+    ranked = sorted((path for path, value in values.items() if value > 0), key=values.get, reverse=True)
+    return {path: 1 - i / len(ranked) for i, path in enumerate(ranked)}
+
+
+def prioritize(paths: List[str], modified: Dict[str, float], in_degree: Dict[str, int]) -> List[str]:
+    """
+    Order files for indexing: recently changed and widely imported files first. Both signals
+    become rank scores so neither dominates by its units; ties (including files with
+    neither signal) keep their original order.
+
+    Args:
+        paths: Repo-relative paths to order
+        modified: Latest change time per path (git log, plus uncommitted edits)
+        in_degree: Number of repo files importing each path (CodeGraph.in_degree)
+    """
+    recency, imports = _rank_scores(modified), _rank_scores(in_degree)
+    return sorted(paths, key=lambda path: recency.get(path, 0) + imports.get(path, 0), reverse=True)
+
+
+class BuildProgress:
+    """
+    State a background full build shares with the question loop: the queue of files still
+    to index, which questions can reorder by naming files, how many files are indexed,
+    and how the build ended.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.error: Optional[BaseException] = None
+        self.started = threading.Event()  # the collection is open and answers questions
+        self.finished = threading.Event()
+        self._resumed = 0  # files indexed by an earlier, interrupted run
+        # Chunks are written in the order files are taken, so every file taken up to the
+        # last one reported written is complete, including files that yield no chunks
+        self._taken: Dict[str, int] = {}
+        self._written = -1
+        self._order: deque = deque()
+        self._urgent: deque = deque()
+        self._pending: Set[str] = set()
+        self._names: Dict[str, List[str]] = {}
+        self._cancelled = False
+        self._cond = threading.Condition()
+
+    def start(self, pending: List[str], done: int) -> Iterator[str]:
+        """
+        Begin the build over pending files (in priority order).
+
+        Returns:
+            The files to index, in the order they are taken from the queue
+        """
+        with self._cond:
+            self.total = done + len(pending)
+            self._resumed = done
+            self._order = deque(pending)
+            self._pending = set(pending)
+            for path in pending:
+                name = os.path.basename(path).lower()
+                keys = {path.replace(os.sep, "/").lower(), name}
+                stem = os.path.splitext(name)[0]
+                if stem != "__init__":
+                    keys.add(stem)
+                for key in keys:
+                    self._names.setdefault(key, []).append(path)
+        self.started.set()
+        return self._files()
+
+    def _files(self) -> Iterator[str]:
+        while True:
+            with self._cond:
+                if self._cancelled:
+                    raise IndexingCancelled()
+                path = self._next()
+            if path is None:
+                return
+            yield path
+
+    def _next(self) -> Optional[str]:
+        for queue in (self._urgent, self._order):
+            while queue:
+                path = queue.popleft()
+                if path in self._pending:
+                    self._pending.discard(path)
+                    self._taken[path] = len(self._taken)
+                    return path
+        return None
+
+    @property
+    def done(self) -> int:
+        """Files indexed, including those of a resumed build's checkpoint."""
+        return self._resumed + self._written + 1
+
+    def _indexed(self, path: str) -> bool:
+        return self._taken.get(path, len(self._taken)) <= self._written
+
+    def mark_indexed(self, paths: List[str]) -> None:
+        """Record files whose chunks have all been written."""
+        with self._cond:
+            self._written = max([self._written] + [self._taken[path] for path in paths if path in self._taken])
+            self._cond.notify_all()
+
+    def promote(self, question: str) -> List[str]:
+        """
+        Move the queued files a question names (by path, file name or module name) to the
+        front of the queue.
+
+        Returns:
+            The files not indexed yet among those named
+        """
+        words = {word.strip(".").lower() for word in re.findall(r"[\w./-]+", question)}
+        keys = set()
+        for word in words:
+            # "src/app/config.py" also names "app/config.py" and "config.py"
+            parts = word.split("/")
+            keys.update("/".join(parts[i:]) for i in range(len(parts)))
+        with self._cond:
+            named = list(dict.fromkeys(path for key in keys for path in self._names.get(key, [])))
+            queued = [path for path in named if path in self._pending]
+            self._urgent.extendleft(reversed(queued))
+            return [path for path in named if not self._indexed(path)]
+
+    def wait_for(self, paths: List[str], timeout: float) -> bool:
+        """Wait until the files are indexed (or the build ends). Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self.finished.is_set() or all(self._indexed(path) for path in paths), timeout
+            )
+
+    def cancel(self) -> None:
+        """Stop taking files; the build ends with IndexingCancelled after writing what it has read."""
+        with self._cond:
+            self._cancelled = True
+
+    def finish(self, error: BaseException = None) -> None:
+        with self._cond:
+            self.error = error
+            if error is None and not self._cancelled:
+                self._written = len(self._taken) - 1
+            self.finished.set()
+            self.started.set()
+            self._cond.notify_all()
+
+    def note(self, waiting: List[str] = ()) -> Optional[str]:
+        """Coverage note for an answer given mid-build (None once the build has completed)."""
+        if self.finished.is_set() and self.error is None and not self._cancelled:
+            return None
+        coverage = f"{self.done:,} of {self.total:,} files ({self.done / max(self.total, 1):.0%})"
+        if self.error is not None:
+            return f"Indexing stopped at {coverage} ({self.error}); answers only cover those. Rerun to resume."
+        if self._cancelled:
+            return f"Indexing paused at {coverage}; the next run resumes it."
+        note = f"Index still building: {coverage} indexed; answers only cover those."
+        missing = [path for path in waiting if not self._indexed(path)]
+        if missing:
+            note += f" Not indexed yet: {', '.join(missing[:5])}" + (" ..." if len(missing) > 5 else "")
+        return note
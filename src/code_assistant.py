@@ -2,9 +2,24 @@ from code_parser import CodeParser
 from vector_store import VectorStore
 from repo_mapper import RepoMapper
 from rag_chain import RAGChain
+from model_router import FAST, STRONG
 from config import AppConfig
+from manifest import IndexManifest, StaleReport
+from index_generations import IndexGenerations
+import git_tracker
+import index_bundle
+from ingest import stream_into
+from background_index import BuildProgress, IndexingCancelled, prioritize
+from llm_factory import LLMFactory
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+import os
+import time
+import shutil
 import logging
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -12,64 +27,618 @@ class CodeAssistant:
     """
     Main class that orchestrates all components of the AI code assistant.
     This is how tools like Cursor, Windsurf, and Antigravity work internally.
+    The index under config.persist_directory is a set of generations: full builds,
+    imports and syncs write a new one (syncs start from a copy of the current one) and
+    publish it atomically, so other processes keep answering from the previous
+    generation meanwhile; persist_directory is the one in use.
     """
     
+    # Caches derived from the source tree alone, carried into a new generation
+    CARRIED_OVER = ("repo_map_cache.json",)
+    # Set while (and after) a full build runs in the background
+    build_progress: Optional[BuildProgress] = None
+    
     def __init__(self, repo_path: str, config: AppConfig = None):
         self.repo_path = repo_path
         self.config = config or AppConfig.from_env()
-        self.persist_directory = self.config.persist_directory
+        self.generations = IndexGenerations(self.config.persist_directory)
+        # Before the first build, caches go to the root and are carried into its generation
+        self.persist_directory = self.generations.open() or self.config.persist_directory
+        self._start_warmup()
         
         self.parser = CodeParser(
             chunk_size=self.config.chunk_size, 
-            chunk_overlap=self.config.chunk_overlap
+            chunk_overlap=self.config.chunk_overlap,
+            max_file_bytes=self.config.max_file_bytes,
+            chunking=self.config.chunking
+        )
+        self.vector_store = VectorStore(
+            persist_directory=self.persist_directory,
+            config=self.config.llm,
+            retrieval_config=self.config.retrieval,
+            dedup=self.config.dedup_chunks,
+            lexical=self.config.latency_budget > 0
+        )
+        self.repo_mapper = RepoMapper(
+            repo_path,
+            cache_path=os.path.join(self.persist_directory, "repo_map_cache.json")
         )
-        self.vector_store = VectorStore(persist_directory=self.persist_directory, config=self.config.llm)
-        self.repo_mapper = RepoMapper(repo_path)
         self.rag_chain: Optional[RAGChain] = None
         
         self.is_initialized = False
         
-    def index_repository(self, file_extensions: list = None, force_reindex: bool = False) -> None:
+    def _start_warmup(self) -> None:
+        """
+        Load the chat and embedding models in background threads as soon as the config is
+        known, so model load overlaps indexing and mapping instead of delaying the first answer.
+        """
+        if not self.config.warm_up:
+            return
+        llm_config = self.config.llm
+        executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="warmup")
+        executor.submit(self._warm, "embedding model",
+                        lambda: LLMFactory.warm_up_embeddings(LLMFactory.create_embeddings(llm_config)))
+        executor.submit(self._warm, "chat model",
+                        lambda: LLMFactory.warm_up_llm(LLMFactory.create_llm(llm_config)))
+        if llm_config.fast_model_name:
+            fast_config = replace(llm_config, model_name=llm_config.fast_model_name)
+            executor.submit(self._warm, "fast chat model",
+                            lambda: LLMFactory.warm_up_llm(LLMFactory.create_llm(fast_config)))
+        executor.shutdown(wait=False)
+        
+    @staticmethod
+    def _warm(name: str, load: Callable[[], bool]) -> None:
+        start = time.perf_counter()
+        try:
+            if load():
+                logger.info(f"Warmed up {name} in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            # The real request reports a persistent problem; warm-up is best effort
+            logger.debug(f"Warm-up of {name} failed: {e}")
+        
+    def index_repository(self, file_extensions: list = None, force_reindex: bool = False,
+                         background: bool = False) -> None:
         """
         Index the repository by parsing code and storing in vector database.
         
         Args:
             file_extensions: List of file extensions to index (e.g., ['.py', '.js'])
             force_reindex: If True, rebuild index even if it exists
+            background: Run a full build in the background, most relevant files first,
+                and answer questions from what is indexed so far (see build_progress)
         """
         if file_extensions is None:
             file_extensions = ['.py']
             
+        # The repository map only reads source files, so it is built while indexing runs
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="repo-map") as executor:
+            logger.info("Building repository map...")
+            repo_map_future = executor.submit(self.build_repo_map, file_extensions)
+            if not background:
+                self.build_index(file_extensions, force_reindex)
+            repo_map = repo_map_future.result()
+        if background:
+            # After the map, whose import graph ranks the files
+            self.build_index(file_extensions, force_reindex, background=True)
+        
+        logger.info("Initializing RAG chain...")
+        retriever = self.get_retriever()
+        self.rag_chain = RAGChain(
+            retriever, 
+            repo_map=repo_map,
+            config=self.config.llm,
+            graph=self.get_code_graph(),
+            max_expansions=self.config.retrieval.graph_expansions,
+            multi_query=self.config.retrieval.multi_query,
+            latency_budget=self.config.latency_budget,
+            degraded_max_tokens=self.config.degraded_max_tokens,
+            compress_prompt=self.config.compress_prompt,
+            telemetry_log=self.config.telemetry_log
+        )
+        
+        self.is_initialized = True
+        logger.info("Code Assistant ready!")
+        
+    def build_index(self, file_extensions: list, force_reindex: bool = False, background: bool = False) -> None:
+        """
+        Load the vector index from disk and bring stale files up to date,
+        or parse the repository and build it from scratch.
+        
+        Args:
+            file_extensions: List of file extensions to index
+            force_reindex: If True, rebuild index even if it exists
+            background: Run a full build on a thread, returning once it can answer questions
+        """
         if not force_reindex and self.vector_store.load_existing():
             logger.info("Loaded existing index from disk")
+            self.sync_index(file_extensions)
+            if self.config.retrieval.top_files and not len(self.vector_store.file_index):
+                manifest = IndexManifest.load(self.persist_directory)
+                if manifest is not None:
+                    with self.generations.writer(), self._staged_generation():
+                        self._update_file_summaries(manifest, list(manifest.files))
+        elif background:
+            self._start_background_index(file_extensions, force_reindex)
         else:
-            logger.info(f"Indexing repository at: {self.repo_path}")
-            logger.info(f"Processing file types: {', '.join(file_extensions)}")
+            with self.generations.writer():
+                # Another indexer may have published an index while this one waited
+                if not force_reindex and self.reopen_index():
+                    self.sync_index(file_extensions)
+                else:
+                    self._full_index(file_extensions)
             
-            documents = self.parser.parse_repository(self.repo_path, file_extensions)
+    def _start_background_index(self, file_extensions: list, force_reindex: bool) -> None:
+        """Run the full build on a thread; returns once its collection is open for questions."""
+        progress = BuildProgress()
+        
+        def build() -> None:
+            error = None
+            try:
+                with self.generations.writer():
+                    if not force_reindex and self.reopen_index():
+                        self.sync_index(file_extensions)
+                    else:
+                        self._full_index(file_extensions, progress)
+            except IndexingCancelled:
+                logger.info("Background indexing paused; the next run resumes it")
+            except Exception as e:
+                logger.error(f"Background indexing failed: {e}")
+                error = e
+            finally:
+                progress.finish(error)
+        
+        self.build_progress = progress
+        self._build_thread = threading.Thread(target=build, name="background-index", daemon=True)
+        self._build_thread.start()
+        progress.started.wait()
+        if progress.error is not None and self.vector_store.db is None:
+            raise progress.error
+        
+    def stop_background_index(self) -> None:
+        """Pause a running background build at a resumable checkpoint (on exit)."""
+        if self.build_progress is None or self.build_progress.finished.is_set():
+            return
+        logger.info("Pausing background indexing...")
+        self.build_progress.cancel()
+        self._build_thread.join()
+        
+    def _prepare_question(self, question: str) -> Optional[str]:
+        """
+        Get the index ready for a question: switch to a newer published index, or while a
+        background build runs, index the files the question names next and wait briefly for them.
+        
+        Returns:
+            Note on index coverage to show with the answer, None once the index is complete
+        """
+        progress = self.build_progress
+        if progress is None or progress.finished.is_set():
+            self.reopen_index()
+            return progress.note() if progress else None
+        waiting = progress.promote(question)
+        if waiting:
+            logger.info(f"Indexing {', '.join(waiting)} next")
+            progress.wait_for(waiting, self.config.background_wait)
+        return progress.note(waiting)
+        
+    def _full_index(self, file_extensions: list, progress: BuildProgress = None) -> None:
+        """
+        Build the index into a new generation and publish it (writer lock held). Progress is
+        checkpointed into the generation's manifest, so after an interruption the next build
+        resumes there instead of starting over. With progress (background builds) files are
+        indexed in priority order from a queue that questions can reorder.
+        """
+        logger.info(f"Indexing repository at: {self.repo_path}")
+        logger.info(f"Processing file types: {', '.join(file_extensions)}")
+        
+        fingerprints = IndexManifest.scan(self.repo_path, file_extensions)
+        
+        previous = self.persist_directory
+        manifest = self._resume_generation(file_extensions)
+        resumed = manifest is not None
+        if not resumed:
+            self._begin_generation()
+            manifest = IndexManifest.for_config(self.config, file_extensions)
+            manifest.complete = False
+        try:
+            if resumed:
+                pending = self._resume_files(manifest, fingerprints)
+                logger.info(f"Resuming interrupted build: {len(manifest.files)} files already indexed, "
+                            f"{len(pending)} to go")
+            else:
+                self.vector_store.reset()
+                manifest.save(self.persist_directory)  # marks the generation as resumable
+                pending = list(fingerprints)
+            if progress is not None:
+                pending = progress.start(self._prioritized(pending, file_extensions), len(manifest.files))
+            chunk_ids = self._ingest((os.path.join(self.repo_path, path) for path in pending),
+                                     checkpoint=self._checkpointer(manifest, fingerprints, progress))
+            self._record_chunks(manifest, {
+                path: fingerprints[path] for path in fingerprints if path not in manifest.files
+            }, chunk_ids)
             
-            if not documents:
+            if not any(entry["chunk_ids"] for entry in manifest.files.values()):
                 raise ValueError("No documents were parsed. Check repository path and file extensions.")
             
-            self.vector_store.initialize_from_documents(documents)
-            logger.info(f"Successfully indexed {len(documents)} code chunks")
+            if resumed:
+                pruned = self.vector_store.prune_unreferenced(set(manifest.chunk_ids(list(manifest.files))))
+                if pruned:
+                    logger.info(f"Removed {pruned} chunks of the interrupted build that no file uses anymore")
+            self.vector_store.finish_bulk_load()
+            
+            manifest.complete = True
+            self._update_file_summaries(manifest, list(fingerprints))
+            self._stamp_commit(manifest, file_extensions)
+            manifest.save(self.persist_directory)
+        except BaseException:
+            if not manifest.complete:
+                self._save_checkpoint(manifest)
+            # The unpublished generation is resumed by the next build, or collected by the next publish
+            self._use_generation(previous)
+            self.vector_store.load_existing()
+            raise
+        self.generations.publish(self.persist_directory)
+        logger.info(f"Successfully indexed {len(manifest.chunk_ids(list(manifest.files)))} code chunks")
         
-        logger.info("Building repository map...")
-        repo_map = self.repo_mapper.get_compact_map(
-            extensions=set(file_extensions),
-            max_lines=150
+    def _resume_generation(self, file_extensions: list) -> Optional[IndexManifest]:
+        """
+        Switch to the newest generation an interrupted build left behind with the same settings.
+        
+        Returns:
+            Its checkpointed manifest, or None if there is nothing to resume
+        """
+        expected = IndexManifest.for_config(self.config, file_extensions)
+        previous = self.persist_directory
+        for path in self.generations.inactive():
+            manifest = IndexManifest.load(path)
+            if manifest is None or manifest.complete:
+                continue
+            if manifest.param_mismatches(expected) or manifest.extensions != expected.extensions:
+                logger.info(f"Not resuming build {os.path.basename(path)}: it used other settings")
+                continue
+            self._use_generation(path)
+            if self.vector_store.load_existing():
+                return manifest
+            self._use_generation(previous)
+        return None
+        
+    def _resume_files(self, manifest: IndexManifest, fingerprints: dict) -> list:
+        """
+        Drop the checkpointed files that changed or disappeared since the interrupted build.
+        
+        Returns:
+            Repo-relative paths still to index
+        """
+        stale = [path for path, entry in manifest.files.items()
+                 if fingerprints.get(path) != {"size": entry["size"], "mtime_ns": entry["mtime_ns"]}]
+        self.vector_store.release_sources({
+            os.path.join(self.repo_path, path): manifest.chunk_ids([path]) for path in stale
+        })
+        for path in stale:
+            del manifest.files[path]
+        return [path for path in fingerprints if path not in manifest.files]
+        
+    def _prioritized(self, paths: list, file_extensions: list) -> list:
+        """Files ordered by recent changes (git, uncommitted edits first) and import in-degree."""
+        modified = git_tracker.last_modified(self.repo_path)
+        now = time.time()
+        modified.update((path, now) for path in git_tracker.dirty_paths(self.repo_path, file_extensions))
+        graph = self.get_code_graph()
+        return prioritize(paths, modified, graph.in_degree() if graph else {})
+        
+    def _checkpointer(self, manifest: IndexManifest, fingerprints: dict,
+                      progress: BuildProgress = None) -> Callable[[dict], None]:
+        """Ingest callback recording finished files, saved every index_checkpoint_seconds."""
+        last_saved = time.monotonic()
+        
+        def checkpoint(finished: dict) -> None:
+            nonlocal last_saved
+            paths = [os.path.relpath(source, self.repo_path) for source in finished]
+            self._record_chunks(manifest, {path: fingerprints[path] for path in paths}, finished)
+            if progress is not None:
+                progress.mark_indexed(paths)
+            if time.monotonic() - last_saved >= self.config.index_checkpoint_seconds:
+                self._save_checkpoint(manifest)
+                last_saved = time.monotonic()
+        return checkpoint
+        
+    def _save_checkpoint(self, manifest: IndexManifest) -> None:
+        """Persist what an unfinished build has written (the manifest last, so it never runs ahead)."""
+        self.vector_store.duplicates.save()
+        manifest.save(self.persist_directory)
+        logger.info(f"Checkpoint: {len(manifest.files)} files indexed")
+        
+    def _use_generation(self, path: str) -> None:
+        """Point the index, manifest and repository map cache at an index directory."""
+        self.persist_directory = path
+        self.vector_store.persist_directory = path
+        self.repo_mapper.cache_path = os.path.join(path, "repo_map_cache.json")
+        
+    def _begin_generation(self) -> str:
+        """Switch to a new, empty generation, seeded with the source-derived caches of the current one."""
+        path = self.generations.allocate()
+        os.makedirs(path)
+        previous = self.persist_directory
+        self._use_generation(path)
+        for name in self.CARRIED_OVER:
+            if os.path.exists(os.path.join(previous, name)):
+                shutil.copy2(os.path.join(previous, name), os.path.join(path, name))
+        return path
+        
+    @contextmanager
+    def _staged_generation(self):
+        """
+        Switch to a new generation holding a copy of the current index for changes that
+        are published once complete (writer lock held); on failure the current one stays.
+        """
+        previous = self.persist_directory
+        path = self.generations.allocate()
+        self.generations.copy(previous, path)
+        self._use_generation(path)
+        try:
+            if not self.vector_store.load_existing():
+                raise RuntimeError(f"Copy of the index in {path} could not be opened")
+            yield path
+        except BaseException:
+            # The copy is collected by the next publish
+            self._use_generation(previous)
+            self.vector_store.load_existing()
+            raise
+        self.generations.publish(path)
+        
+    def reopen_index(self) -> bool:
+        """
+        Switch to an index another process published since this one was opened; until
+        then this process keeps answering from the generation it holds.
+        
+        Returns:
+            True if a newer index was loaded
+        """
+        path = self.generations.active_path()
+        if path is None or path == self.persist_directory:
+            return False
+        path = self.generations.open()
+        if path is None or path == self.persist_directory:
+            return False
+        self._use_generation(path)
+        if not self.vector_store.load_existing():
+            return False
+        logger.info(f"Switched to index generation {os.path.basename(path)}")
+        return True
+        
+    def _ingest(self, file_paths: list, checkpoint: Callable[[dict], None] = None) -> dict:
+        """Stream files through parse -> split -> embed -> write with bounded buffers."""
+        self.parser.skipped.clear()
+        chunk_ids = stream_into(
+            self.vector_store,
+            self.parser.iter_chunks(file_paths),
+            batch_size=self.config.ingest_batch_size,
+            max_pending=self.config.ingest_queue_batches,
+            checkpoint=checkpoint
         )
+        if self.parser.skipped:
+            logger.info(self.parser.skipped.summary())
+        return chunk_ids
         
-        logger.info("Initializing RAG chain...")
-        retriever = self.vector_store.get_retriever()
-        self.rag_chain = RAGChain(
-            retriever, 
-            repo_map=repo_map,
-            config=self.config.llm
+    def _record_chunks(self, manifest: IndexManifest, fingerprints: dict, chunk_ids: dict) -> None:
+        """Record fingerprints and chunk ids (keyed by chunk source path) of freshly indexed files."""
+        by_path = {os.path.relpath(source, self.repo_path): ids for source, ids in chunk_ids.items()}
+        for path, fingerprint in fingerprints.items():
+            manifest.files[path] = {**fingerprint, "chunk_ids": by_path.get(path, [])}
+            
+    def _update_file_summaries(self, manifest: IndexManifest, changed: list, deleted: list = ()) -> None:
+        """
+        Refresh the per-file summary vectors of two-tier retrieval (skipped while it's off,
+        so flat retrieval pays no extra embedding calls).
+        
+        Args:
+            manifest: Manifest with the chunk ids of the changed files
+            changed: Repo-relative paths of new or re-indexed files
+            deleted: Repo-relative paths of removed (or re-indexed) files
+        """
+        if not self.config.retrieval.top_files:
+            return
+        summaries = {}
+        for path in changed:
+            # Files that produced no chunks (skipped, empty) have nothing to narrow down to
+            if manifest.files.get(path, {}).get("chunk_ids"):
+                source = os.path.join(self.repo_path, path)
+                summaries[source] = self.repo_mapper.summary_for(source)
+        self.vector_store.update_file_summaries(
+            summaries, [os.path.join(self.repo_path, path) for path in deleted]
         )
+        self.repo_mapper.save_cache()
+            
+    def export_index(self, output_path: str, file_extensions: list) -> dict:
+        """
+        Bring the index and repository map up to date, then pack them into a portable
+        bundle (see index_bundle.export_bundle) that developers can import instead of
+        indexing from scratch.
         
-        self.is_initialized = True
-        logger.info("Code Assistant ready!")
+        Returns:
+            The bundle metadata
+        """
+        self.build_index(file_extensions)
+        self.build_repo_map(file_extensions)
+        return index_bundle.export_bundle(self.persist_directory, self.repo_path, output_path)
+        
+    def import_index(self, bundle_path: str) -> dict:
+        """
+        Install an index bundle as a new generation of this assistant's index. Chunk paths
+        are moved from the exporting checkout to this one, and files git reports unchanged
+        since the bundle's commit keep their index entries, so the next build_index only
+        re-indexes local changes. The generation is published once all that is done.
+        
+        Returns:
+            The bundle metadata
+        """
+        meta = index_bundle.read_meta(bundle_path)
+        built = IndexManifest(**meta["manifest"])
+        mismatches = built.param_mismatches(IndexManifest.for_config(self.config, built.extensions))
+        if mismatches:
+            raise ValueError(f"Index bundle was built with different settings: {'; '.join(mismatches)}")
+        
+        with self.generations.writer():
+            path = self.generations.allocate()
+            index_bundle.import_bundle(bundle_path, path)
+            previous = self.persist_directory
+            self._use_generation(path)
+            try:
+                self.repo_mapper = RepoMapper(
+                    self.repo_path,
+                    cache_path=os.path.join(self.persist_directory, "repo_map_cache.json")
+                )
+                if meta["repo_path"] != self.repo_path:
+                    self.vector_store.load_existing()
+                    moved = self.vector_store.relocate_sources(
+                        lambda source: index_bundle.relocate(source, meta["repo_path"], self.repo_path)
+                    )
+                    logger.info(f"Moved {moved} chunks from {meta['repo_path']} to {self.repo_path}")
+                self._restamp_unchanged()
+            except BaseException:
+                self._use_generation(previous)
+                self.vector_store.load_existing()
+                raise
+            self.generations.publish(path)
+        return meta
+        
+    def _restamp_unchanged(self) -> None:
+        """
+        Refresh the recorded mtimes of files whose content matches the indexed commit: a
+        fresh checkout has new mtimes everywhere, which would otherwise mark every file stale
+        once git can't narrow the check.
+        """
+        manifest = IndexManifest.load(self.persist_directory)
+        if manifest is None or not manifest.commit:
+            return
+        changed = git_tracker.changed_since(self.repo_path, manifest.commit)
+        if changed is None:
+            logger.warning(f"Indexed commit {manifest.commit[:12]} isn't in this clone; "
+                           "files will be checked by size and mtime")
+            return
+        unchanged = [path for path in manifest.files if path not in changed and path not in manifest.dirty]
+        for path in unchanged:
+            full_path = os.path.join(self.repo_path, path)
+            if os.path.isfile(full_path):
+                fingerprint = IndexManifest.fingerprint(full_path)
+                if fingerprint["size"] == manifest.files[path]["size"]:
+                    manifest.files[path].update(fingerprint)
+        manifest.save(self.persist_directory)
+        self.repo_mapper.restamp(unchanged)
+        self.repo_mapper.save_cache()
+        logger.info(f"{len(unchanged)} of {len(manifest.files)} indexed files are unchanged since "
+                    f"{manifest.commit[:12]}; {len(changed)} paths changed locally")
+            
+    def _stamp_commit(self, manifest: IndexManifest, file_extensions: list) -> None:
+        """Record the checked-out commit and uncommitted paths, if the repo is under git."""
+        manifest.commit = git_tracker.head_commit(self.repo_path)
+        manifest.dirty = git_tracker.dirty_paths(self.repo_path, file_extensions) if manifest.commit else []
+            
+    def sync_index(self, file_extensions: list) -> Optional[StaleReport]:
+        """
+        Validate the loaded index against its manifest, then re-index only the stale files
+        (or just report them when auto_sync is off). When the index records a git commit,
+        `git diff` against it narrows the check to touched files; otherwise every file
+        is checked with one stat pass. Changes are written under the writer lock into a
+        copy of the index that is then published, so other processes never see a half-synced
+        one; if another process published a newer index meanwhile, that one is opened and
+        checked instead.
+        
+        Args:
+            file_extensions: List of file extensions to index
+            
+        Returns:
+            The stale-file report, or None if the index has no usable manifest
+        """
+        manifest = IndexManifest.load(self.persist_directory)
+        if manifest is None:
+            logger.warning("Index has no manifest, so staleness can't be checked. Run once with --reindex to record one.")
+            return None
+        
+        mismatches = manifest.param_mismatches(IndexManifest.for_config(self.config, file_extensions))
+        if mismatches:
+            logger.warning(f"Index was built with different settings: {'; '.join(mismatches)}")
+            if self.config.auto_sync:
+                with self.generations.writer():
+                    if self.reopen_index():
+                        return self.sync_index(file_extensions)
+                    logger.warning("Rebuilding the index from scratch")
+                    self._full_index(file_extensions)
+            return None
+        
+        report = git_tracker.stale_report(self.repo_path, manifest, file_extensions)
+        if report is None:
+            report = manifest.diff(self.repo_path, file_extensions)
+        if report.is_clean:
+            logger.info(f"Index is up to date ({len(manifest.files)} files)")
+            if manifest.commit != git_tracker.head_commit(self.repo_path):
+                with self.generations.writer():
+                    self._stamp_commit(manifest, file_extensions)
+                    manifest.save(self.persist_directory)
+            return report
+        
+        logger.warning(f"Index is stale: {report.summary()}")
+        if not self.config.auto_sync:
+            logger.warning("Automatic sync is off; answers may use outdated code")
+            return report
+        
+        with self.generations.writer():
+            if self.reopen_index():
+                return self.sync_index(file_extensions)
+            with self._staged_generation():
+                self._apply_sync(manifest, report, file_extensions)
+        return report
+        
+    def _apply_sync(self, manifest: IndexManifest, report: StaleReport, file_extensions: list) -> None:
+        """Re-index the stale files of a report (writer lock held, in a staged generation)."""
+        self.vector_store.release_sources({
+            os.path.join(self.repo_path, path): manifest.chunk_ids([path])
+            for path in report.modified + report.deleted
+        })
+        for path in report.deleted:
+            manifest.files.pop(path, None)
+        
+        changed = report.added + report.modified
+        fingerprints = {path: IndexManifest.fingerprint(os.path.join(self.repo_path, path)) for path in changed}
+        chunk_ids = self._ingest([os.path.join(self.repo_path, path) for path in changed])
+        self.vector_store.finish_bulk_load(retrain=False)
+        
+        self._record_chunks(manifest, fingerprints, chunk_ids)
+        self.repo_mapper.invalidate(changed + report.deleted)
+        self._update_file_summaries(manifest, changed, report.modified + report.deleted)
+        manifest.extensions = sorted(file_extensions)
+        self._stamp_commit(manifest, file_extensions)
+        manifest.save(self.persist_directory)
+        logger.info(f"Re-indexed {len(changed)} files ({sum(len(ids) for ids in chunk_ids.values())} chunks), "
+                    f"removed {len(report.deleted)}")
+            
+    def build_repo_map(self, file_extensions: list, max_lines: int = 150) -> str:
+        """
+        Build the compact repository map included in every prompt.
+        
+        Args:
+            file_extensions: List of file extensions to include
+            max_lines: Maximum number of lines in the map
+            
+        Returns:
+            Compact repository map
+        """
+        return self.repo_mapper.get_compact_map(
+            extensions=set(file_extensions),
+            max_lines=max_lines
+        )
+        
+    def get_retriever(self):
+        """Retriever handed to the RAG chain."""
+        return self.vector_store.get_retriever()
+        
+    def get_code_graph(self):
+        """Import/call graph from the last repository map build (None before it)."""
+        return self.repo_mapper.graph
+        
+    @property
+    def retrieval_timing(self) -> dict:
+        """Stage timings of the most recent retrieval."""
+        return self.vector_store.last_timing
         
     def ask(self, question: str, show_sources: bool = False) -> str:
         """
@@ -84,6 +653,9 @@ class CodeAssistant:
         """
         if not self.is_initialized:
             raise ValueError("Assistant not initialized. Call index_repository() first.")
+        note = self._prepare_question(question)
+        if note:
+            logger.warning(note)
         
         if show_sources:
             answer, sources = self.rag_chain.ask_with_sources(question)
@@ -98,7 +670,8 @@ class CodeAssistant:
             print("="*80)
             for i, doc in enumerate(sources, 1):
                 source = doc.metadata.get('source', 'Unknown')
-                print(f"\n[{i}] {source}")
+                copies = len(doc.metadata.get('sources', [])) - 1
+                print(f"\n[{i}] {source}" + (f" (+{copies} identical copies)" if copies > 0 else ""))
                 print("-" * 40)
                 print(doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content)
             
@@ -146,15 +719,22 @@ class CodeAssistant:
         ))
         
         console.print("[green]✓ System Ready[/green]")
-        console.print("[dim]Type 'exit' to quit, 'sources' to toggle source visibility[/dim]\n")
+        if self.build_progress is not None and self.build_progress.note():
+            console.print(f"[yellow]{self.build_progress.note()}[/yellow] "
+                          "[dim]Name files in a question to index them next.[/dim]")
+        console.print("[dim]Type 'exit' to quit, 'sources' to toggle source visibility, "
+                      "'reset' to start a new conversation, 'stats' for latency and token stats, "
+                      "'routes' for model routing stats[/dim]\n")
         
         show_sources = False
+        self._start_session()
         
         while True:
             try:
                 user_input = Prompt.ask("\n[bold cyan]You[/bold cyan]")
                 
                 if user_input.lower() in ['exit', 'quit', 'q']:
+                    self.stop_background_index()
                     console.print("\n[yellow]Goodbye![/yellow]")
                     break
                     
@@ -163,27 +743,61 @@ class CodeAssistant:
                     status = "[green]ON[/green]" if show_sources else "[red]OFF[/red]"
                     console.print(f"Source documents: {status}")
                     continue
+                    
+                if user_input.lower() == 'reset':
+                    self.rag_chain.reset_session()
+                    console.print("Conversation reset")
+                    continue
+                
+                if user_input.lower() == 'routes':
+                    console.print(self.rag_chain.route_stats.report(self._route_models()))
+                    continue
+                
+                if user_input.lower() == 'stats':
+                    console.print(self.rag_chain.telemetry.report())
+                    continue
                 
                 if not user_input:
                     continue
+                try:
+                    note = self._prepare_question(user_input)
+                except KeyboardInterrupt:
+                    console.print("[yellow]Cancelled[/yellow]")
+                    continue
                 
-                # Show spinner while thinking
-                with console.status("[bold blue]Thinking...[/bold blue]", spinner="dots"):
-                    if show_sources:
-                         answer, sources = self.rag_chain.ask_with_sources(user_input)
-                    else:
-                         answer = self.rag_chain.ask(user_input)
-                         sources = []
-
-                # Print Answer
+                # Spinner until the first token, then the answer streams in;
+                # Ctrl-C stops this answer, not the session
                 console.print("\n[bold purple]Assistant:[/bold purple]")
-                console.print(Markdown(answer))
+                streamed = []
+                with Live(Spinner("dots", text="[bold blue]Thinking...[/bold blue]"),
+                          console=console, refresh_per_second=8) as live:
+                    def show(token: str) -> None:
+                        streamed.append(token)
+                        live.update(Markdown("".join(streamed)))
+                    try:
+                        response = self.rag_chain.query(user_input, on_token=show)
+                    except KeyboardInterrupt:
+                        live.update("[yellow]Cancelled[/yellow]")
+                        continue
+                    live.update(Markdown(response["answer"]))
+                sources = response["context"] if show_sources else []
+                
+                if response["degradations"]:
+                    console.print(f"[dim]Degraded: {', '.join(response['degradations'])}[/dim]")
+                if self.config.llm.fast_model_name:
+                    console.print(f"[dim]Model: {self._route_models()[response['route']]}[/dim]")
+                console.print(f"[dim]{response['telemetry'].line()}[/dim]")
+                if note:
+                    console.print(f"[yellow]{note}[/yellow]")
                 
                 # Print Sources if enabled
                 if show_sources and sources:
                      console.print("\n[bold yellow]Sources:[/bold yellow]")
                      for i, doc in enumerate(sources, 1):
                         source = doc.metadata.get('source', 'Unknown')
+                        copies = len(doc.metadata.get('sources', [])) - 1
+                        if copies > 0:
+                            source += f" (+{copies} identical copies)"
                         content = doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content
                         console.print(Panel(
                             content,
@@ -192,6 +806,7 @@ class CodeAssistant:
                         ))
 
             except KeyboardInterrupt:
+                self.stop_background_index()
                 console.print("\n\n[yellow]Goodbye![/yellow]")
                 break
             except Exception as e:
@@ -203,17 +818,47 @@ class CodeAssistant:
         print("\n" + "="*80)
         print("INTERACTIVE CODE ASSISTANT")
         print("="*80)
+        self._start_session()
         
         while True:
             try:
                 user_input = input("\nYou: ").strip()
                 if user_input.lower() in ['exit', 'quit', 'q']:
+                    self.stop_background_index()
                     break
-                print("\nAssistant: ", end="", flush=True)
-                print(self.rag_chain.ask(user_input))
+                if user_input.lower() == 'reset':
+                    self.rag_chain.reset_session()
+                    continue
+                if user_input.lower() == 'stats':
+                    print(self.rag_chain.telemetry.report())
+                    continue
+                # Ctrl-C cancels this question (even mid-retrieval), not the session
+                try:
+                    note = self._prepare_question(user_input)
+                    print("\nAssistant: ", end="", flush=True)
+                    response = self.rag_chain.query(user_input, on_token=lambda token: print(token, end="", flush=True))
+                except KeyboardInterrupt:
+                    print("\n(cancelled)")
+                    continue
+                print()
+                if response["degradations"]:
+                    print(f"(degraded: {', '.join(response['degradations'])})")
+                if note:
+                    print(f"({note})")
             except Exception:
+                self.stop_background_index()
                 break
     
+    def _route_models(self) -> dict:
+        return {FAST: self.config.llm.fast_model_name, STRONG: self.config.llm.model_name}
+    
+    def _start_session(self) -> None:
+        self.rag_chain.start_session(
+            max_turns=self.config.session_turns,
+            reuse_threshold=self.config.followup_reuse,
+            extend_threshold=self.config.followup_extend
+        )
+    
     def get_repository_structure(self) -> str:
         """
         Get the repository structure map.
@@ -0,0 +1,149 @@
+import os
+import ast
+import builtins
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+IGNORED_NAMES = set(dir(builtins)) | {"self", "cls", "super", "__init__"}
+
+# (repo-relative path, qualified name, start line, end line)
+Definition = Tuple[str, str, int, int]
+
+
+def extract_python_graph(source: str, module: str, is_package: bool = False) -> dict:
+    """
+    Definitions, imports and calls of one Python file.
+
+    Args:
+        source: File contents
+        module: Dotted module name of the file (for resolving relative imports)
+        is_package: The file is a package's __init__.py
+
+    Returns:
+        {"defs": [[qualname, start, end], ...], "calls": [[line, name], ...],
+         "imports": [dotted module names]}
+    """
+    tree = ast.parse(source)
+    defs, calls, imports = [], set(), set()
+    package = module.split(".") if is_package else module.split(".")[:-1]
+
+    def visit(node, scope: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{scope}.{child.name}" if scope != "<module>" else child.name
+                start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                defs.append([qualname, start, child.end_lineno])
+                visit(child, qualname)
+                continue
+            if isinstance(child, ast.Call):
+                func = child.func
+                name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+                if name and name not in IGNORED_NAMES:
+                    calls.add((child.lineno, name))
+            elif isinstance(child, ast.Import):
+                imports.update(alias.name for alias in child.names)
+            elif isinstance(child, ast.ImportFrom):
+                base = child.module or ""
+                if child.level:
+                    parent = package[:len(package) - (child.level - 1)] if child.level > 1 else package
+                    base = ".".join(parent + ([base] if base else []))
+                if base:
+                    imports.add(base)
+                # `from pkg import submodule` names a module as often as a symbol
+                imports.update(f"{base}.{alias.name}" if base else alias.name for alias in child.names)
+            visit(child, scope)
+
+    visit(tree, "<module>")
+    return {
+        "defs": defs,
+        "calls": sorted(calls),
+        "imports": sorted(imports),
+    }
+
+
+def module_name(path: str) -> str:
+    """Dotted module name of a repo-relative Python path ("auth/__init__.py" -> "auth")."""
+    parts = os.path.splitext(path)[0].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+@dataclass
+class CodeGraph:
+    """
+    Import and call graph of a repository, assembled by RepoMapper from the per-file AST data
+    it caches next to the index (repo_map_cache.json). Lets context expansion pull in the
+    definitions a retrieved chunk calls with dictionary lookups instead of extra searches.
+    """
+
+    repo_path: str
+    files: Dict[str, dict] = field(default_factory=dict)  # path -> extract_python_graph(...)
+
+    def __post_init__(self):
+        self._by_name: Dict[str, List[Definition]] = {}
+        self._modules = {module_name(path): path for path in self.files}
+        for path, data in self.files.items():
+            for qualname, start, end in data["defs"]:
+                self._by_name.setdefault(qualname.rsplit(".", 1)[-1], []).append((path, qualname, start, end))
+        self._imports = {path: self._resolve_imports(data["imports"]) for path, data in self.files.items()}
+
+    def _resolve_imports(self, modules: Iterable[str]) -> Set[str]:
+        return {self._modules[m] for m in modules if m in self._modules}
+
+    def imports_of(self, path: str) -> Set[str]:
+        """Repo files imported by path."""
+        return self._imports.get(path, set())
+
+    def in_degree(self) -> Dict[str, int]:
+        """Number of repo files importing each file."""
+        counts = {path: 0 for path in self.files}
+        for imported in self._imports.values():
+            for path in imported:
+                counts[path] += 1
+        return counts
+
+    def calls_in(self, path: str, start_line: int, end_line: int) -> List[str]:
+        """Names called within a line range of path, in order of first call."""
+        data = self.files.get(path)
+        if not data:
+            return []
+        return list(dict.fromkeys(name for line, name in data["calls"] if start_line <= line <= end_line))
+
+    def resolve(self, name: str, from_path: str) -> Optional[Definition]:
+        """
+        Definition a call to name most likely refers to: one in the same file, then one in
+        a file it imports, then the only definition of that name in the repo.
+        """
+        candidates = self._by_name.get(name)
+        if not candidates:
+            return None
+        for preferred in ({from_path}, self.imports_of(from_path)):
+            for candidate in candidates:
+                if candidate[0] in preferred:
+                    return candidate
+        # A name defined in several unrelated places is too ambiguous to guess
+        return candidates[0] if len(candidates) == 1 else None
+
+    def referenced_definitions(self, path: str, start_line: int, end_line: int) -> List[Definition]:
+        """Definitions called from a line range, excluding ones inside that range."""
+        found = []
+        for name in self.calls_in(path, start_line, end_line):
+            definition = self.resolve(name, path)
+            if definition is None:
+                continue
+            def_path, _, start, end = definition
+            if def_path == path and start >= start_line and end <= end_line:
+                continue
+            found.append(definition)
+        return found
+
+    def definition_text(self, definition: Definition) -> Optional[str]:
+        """Current source lines of a definition, read from the working tree."""
+        path, _, start, end = definition
+        try:
+            with open(os.path.join(self.repo_path, path), 'r', encoding='utf-8', errors='replace') as f:
+                lines = f.read().split("\n")
+        except OSError:
+            return None
+        return "\n".join(lines[start - 1:end])
@@ -1,20 +1,59 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 from langchain_community.document_loaders.generic import GenericLoader
 from langchain_community.document_loaders.parsers import LanguageParser
-from typing import List
+from typing import Iterable, Iterator, List
 from langchain_core.documents import Document
+from file_reader import SkipReport, read_source_file
+from structural_chunker import SUPPORTED_CHUNKING, StructuralChunker
 import os
 
 
+LANGUAGE_MAP = {
+    ".py": Language.PYTHON,
+    ".js": Language.JS,
+    ".ts": Language.TS,
+    ".java": Language.JAVA,
+    ".cpp": Language.CPP,
+    ".go": Language.GO,
+    ".rs": Language.RUST,
+}
+
+
+def iter_source_files(repo_path: str, file_extensions: List[str]) -> Iterator[str]:
+    """
+    Yield every file under repo_path with one of the supported extensions.
+    Shared by the parser and the index manifest so both see the same file set.
+    """
+    extensions = []
+    for ext in file_extensions:
+        if ext not in LANGUAGE_MAP:
+            print(f"Warning: {ext} not supported, skipping...")
+            continue
+        extensions.append(ext)
+    
+    for root, _, files in os.walk(repo_path):
+        for file in files:
+            if os.path.splitext(file)[1] in extensions:
+                yield os.path.join(root, file)
+
+
 class CodeParser:
     """
     Parses code files using AST (Abstract Syntax Tree) to maintain semantic integrity.
     Unlike simple text splitters, this ensures functions and classes are not broken mid-way.
+    With chunking="recursive" the language-aware character splitter is used instead.
     """
     
-    def __init__(self, chunk_size: int = 2000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 2000, chunk_overlap: int = 200, max_file_bytes: int = 1_000_000,
+                 chunking: str = "structural"):
+        if chunking not in SUPPORTED_CHUNKING:
+            raise ValueError(f"Unsupported chunking: {chunking}. Supported: {', '.join(SUPPORTED_CHUNKING)}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_file_bytes = max_file_bytes
+        self.chunking = chunking
+        self.chunker = StructuralChunker(chunk_size, chunk_overlap)
+        self.skipped = SkipReport()
         
     def load_repository(self, repo_path: str, file_extensions: List[str] = None) -> List[Document]:
         """
@@ -33,50 +72,70 @@ class CodeParser:
         if not os.path.exists(repo_path):
             raise ValueError(f"Repository path does not exist: {repo_path}")
             
-        language_map = {
-            ".py": Language.PYTHON,
-            ".js": Language.JS,
-            ".ts": Language.TS,
-            ".java": Language.JAVA,
-            ".cpp": Language.CPP,
-            ".go": Language.GO,
-            ".rs": Language.RUST,
-        }
-        
         all_documents = []
         
-        for ext in file_extensions:
-            if ext not in language_map:
-                print(f"Warning: {ext} not supported, skipping...")
-                continue
-                
-            language = language_map[ext]
-            
-            try:
-                # Manually walk and load to handle encoding errors better
-                for root, _, files in os.walk(repo_path):
-                    for file in files:
-                        if file.endswith(ext):
-                            file_path = os.path.join(root, file)
-                            try:
-                                from langchain_community.document_loaders import TextLoader
-                                loader = TextLoader(file_path, encoding='utf-8', autodetect_encoding=True)
-                                documents = loader.load()
-                                
-                                # Add language metadata for the splitter
-                                for doc in documents:
-                                    doc.metadata["language"] = language
-                                    
-                                all_documents.extend(documents)
-                            except Exception as e:
-                                print(f"Skipping {file_path} due to error: {e}")
-                                continue
-            except Exception as e:
-                print(f"Error loading {ext} files: {e}")
-                continue
+        for file_path in iter_source_files(repo_path, file_extensions):
+            all_documents.extend(self._load_file(file_path))
         
         return all_documents
     
+    def _load_file(self, file_path: str) -> List[Document]:
+        """Load one source file, tagging it with its language for the splitter."""
+        text, reason = read_source_file(file_path, self.max_file_bytes)
+        if reason:
+            self.skipped.add(reason, file_path)
+            return []
+        
+        # Add language metadata for the splitter
+        language = LANGUAGE_MAP[os.path.splitext(file_path)[1]]
+        return [Document(page_content=text, metadata={"source": file_path, "language": language})]
+    
+    def iter_documents(self, file_paths: Iterable[str]) -> Iterator[Document]:
+        """
+        Lazily load files one at a time, so only the file being split is held in memory.
+        
+        Args:
+            file_paths: Paths of the files to load (unsupported extensions are skipped)
+        """
+        for file_path in file_paths:
+            if os.path.splitext(file_path)[1] in LANGUAGE_MAP:
+                yield from self._load_file(file_path)
+    
+    def iter_chunks(self, file_paths: Iterable[str]) -> Iterator[Document]:
+        """
+        Streaming counterpart of parse_repository: yields each file's chunks as soon
+        as the file is split, one chunk per definition (or with the splitter for that
+        file's language when chunking is "recursive").
+        
+        Args:
+            file_paths: Paths of the files to parse
+        """
+        splitters = {}
+        for doc in self.iter_documents(file_paths):
+            if self.chunking == "structural":
+                yield from self.chunker.split_document(doc)
+                continue
+            language = doc.metadata["language"]
+            if language not in splitters:
+                splitters[language] = RecursiveCharacterTextSplitter.from_language(
+                    language=language,
+                    chunk_size=self.chunk_size,
+                    chunk_overlap=self.chunk_overlap
+                )
+            yield from splitters[language].split_documents([doc])
+    
+    def parse_files(self, file_paths: List[str]) -> List[Document]:
+        """
+        Load and split an explicit list of files, e.g. the stale files of an existing index.
+        
+        Args:
+            file_paths: Paths of the files to parse
+            
+        Returns:
+            List of split code chunks
+        """
+        return list(self.iter_chunks(file_paths))
+    
     def split_documents(self, documents: List[Document], language: Language = Language.PYTHON) -> List[Document]:
         """
         Split documents using AST-aware splitting to preserve code structure.
@@ -117,17 +176,7 @@ class CodeParser:
             return []
         
         primary_ext = file_extensions[0] if file_extensions else ".py"
-        language_map = {
-            ".py": Language.PYTHON,
-            ".js": Language.JS,
-            ".ts": Language.TS,
-            ".java": Language.JAVA,
-            ".cpp": Language.CPP,
-            ".go": Language.GO,
-            ".rs": Language.RUST,
-        }
-        
-        language = language_map.get(primary_ext, Language.PYTHON)
+        language = LANGUAGE_MAP.get(primary_ext, Language.PYTHON)
         texts = self.split_documents(documents, language)
         
         return texts
@@ -1,22 +1,62 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 @dataclass
 class LLMConfig:
-    provider: str = "ollama"  # ollama, openai
+    provider: str = "ollama"  # ollama, openai, offline (hashing embeddings + extractive answers, for evaluation)
     model_name: str = "llama3"
+    fast_model_name: Optional[str] = None  # small model for simple lookups, None = one model for all
     temperature: float = 0.0
     base_url: Optional[str] = "http://localhost:11434"
     api_key: Optional[str] = None
     embedding_model: str = "llama3" # or text-embedding-3-large
 
+@dataclass
+class RetrievalConfig:
+    search_type: str = "mmr"  # mmr, similarity
+    k: int = 8
+    fetch_k: int = 20  # MMR candidate pool
+    lambda_mult: float = 0.5  # MMR: 1.0 = relevance only, 0.0 = diversity only
+    quantization: Optional[str] = None  # None, int8, float16
+    rescore: bool = True  # False = low-memory mode, rank on quantized vectors only
+    rescore_multiplier: int = 4  # candidates rescored per result
+    ann: Optional[str] = None  # None (Chroma search), ivf, hnsw
+    ann_nlist: int = 0  # IVF clusters, 0 = 4 * sqrt(n)
+    ann_nprobe: int = 8  # IVF clusters scanned per query
+    ann_ef: int = 64  # HNSW search breadth
+    ann_threads: int = 0  # 0 = all cores
+    top_files: int = 0  # two-tier: search chunks of the N best-matching files only, 0 = flat
+    graph_expansions: int = 4  # referenced definitions added to the context via the code graph
+    multi_query: bool = False  # split compound questions into sub-queries fused by reciprocal rank
+    cache_size: int = 256  # query-embedding and result LRU entries, 0 disables
+
 @dataclass
 class AppConfig:
     llm: LLMConfig
     persist_directory: str = "./chroma_db"
     chunk_size: int = 2000
     chunk_overlap: int = 200
+    chunking: str = "structural"  # structural (one chunk per definition), recursive
+    max_file_bytes: int = 1_000_000  # larger files are skipped as fixtures/bundles
+    dedup_chunks: bool = True  # store identical chunks once, listing every source
+    retrieval: RetrievalConfig = field(default_factory=RetrievalConfig)
+    shard_workers: int = 8  # parallel shard searches in multi-repo mode
+    shard_timeout: float = 10.0  # seconds before a slow shard is dropped
+    auto_sync: bool = True  # re-index stale files on startup instead of only reporting them
+    ingest_batch_size: int = 256  # chunks embedded and written per batch
+    ingest_queue_batches: int = 4  # parsed batches allowed to wait for the embedder
+    index_checkpoint_seconds: float = 30.0  # how often a full build records resumable progress
+    background_index: bool = False  # build a missing index in the background, answering from what's indexed
+    background_wait: float = 10.0  # seconds a question waits mid-build for the files it names
+    warm_up: bool = True  # load local models in the background at startup
+    session_turns: int = 4  # interactive turns kept verbatim; older ones are summarized
+    followup_reuse: float = 0.9  # query similarity at which the previous context is reused as is
+    followup_extend: float = 0.7  # similarity at which the previous context is extended
+    latency_budget: float = 0.0  # seconds per question before degrading, 0 = unlimited
+    degraded_max_tokens: int = 256  # answer token cap once the budget runs short
+    compress_prompt: bool = True  # strip comments/docstrings and unrelated bodies from context chunks
+    telemetry_log: Optional[str] = None  # JSONL file each question's telemetry is appended to
 
     @classmethod
     def from_env(cls) -> "AppConfig":
@@ -24,10 +64,47 @@ class AppConfig:
             llm=LLMConfig(
                 provider=os.getenv("LLM_PROVIDER", "ollama"),
                 model_name=os.getenv("LLM_MODEL", "llama3.2"),
+                fast_model_name=os.getenv("LLM_FAST_MODEL") or None,
                 temperature=float(os.getenv("LLM_TEMPERATURE", "0.0")),
                 base_url=os.getenv("LLM_BASE_URL", "http://localhost:11434"),
                 api_key=os.getenv("OPENAI_API_KEY"),
                 embedding_model=os.getenv("EMBEDDING_MODEL", "nomic-embed-text" if os.getenv("LLM_PROVIDER", "ollama") == "ollama" else "text-embedding-3-large")
             ),
-            persist_directory=os.getenv("DB_PATH", "./chroma_db")
+            persist_directory=os.getenv("DB_PATH", "./chroma_db"),
+            chunking=os.getenv("CHUNKING", "structural"),
+            max_file_bytes=int(os.getenv("MAX_FILE_BYTES", "1000000")),
+            dedup_chunks=os.getenv("DEDUP_CHUNKS", "true").lower() != "false",
+            shard_workers=int(os.getenv("SHARD_WORKERS", "8")),
+            shard_timeout=float(os.getenv("SHARD_TIMEOUT", "10")),
+            auto_sync=os.getenv("INDEX_AUTO_SYNC", "true").lower() != "false",
+            ingest_batch_size=int(os.getenv("INGEST_BATCH_SIZE", "256")),
+            index_checkpoint_seconds=float(os.getenv("INDEX_CHECKPOINT_SECONDS", "30")),
+            background_index=os.getenv("BACKGROUND_INDEX", "false").lower() == "true",
+            background_wait=float(os.getenv("BACKGROUND_WAIT", "10")),
+            warm_up=os.getenv("MODEL_WARMUP", "true").lower() != "false",
+            session_turns=int(os.getenv("SESSION_TURNS", "4")),
+            followup_reuse=float(os.getenv("FOLLOWUP_REUSE", "0.9")),
+            followup_extend=float(os.getenv("FOLLOWUP_EXTEND", "0.7")),
+            latency_budget=float(os.getenv("LATENCY_BUDGET", "0")),
+            degraded_max_tokens=int(os.getenv("DEGRADED_MAX_TOKENS", "256")),
+            compress_prompt=os.getenv("PROMPT_COMPRESSION", "true").lower() != "false",
+            telemetry_log=os.getenv("TELEMETRY_LOG") or None,
+            retrieval=RetrievalConfig(
+                search_type=os.getenv("SEARCH_TYPE", "mmr"),
+                k=int(os.getenv("RETRIEVAL_K", "8")),
+                fetch_k=int(os.getenv("RETRIEVAL_FETCH_K", "20")),
+                lambda_mult=float(os.getenv("MMR_LAMBDA", "0.5")),
+                quantization=os.getenv("EMBEDDING_QUANTIZATION") or None,
+                rescore=os.getenv("QUANTIZED_RESCORE", "true").lower() != "false",
+                rescore_multiplier=int(os.getenv("QUANTIZED_RESCORE_MULTIPLIER", "4")),
+                ann=os.getenv("ANN_INDEX") or None,
+                ann_nlist=int(os.getenv("ANN_NLIST", "0")),
+                ann_nprobe=int(os.getenv("ANN_NPROBE", "8")),
+                ann_ef=int(os.getenv("ANN_EF", "64")),
+                ann_threads=int(os.getenv("ANN_THREADS", "0")),
+                top_files=int(os.getenv("RETRIEVAL_TOP_FILES", "0")),
+                graph_expansions=int(os.getenv("GRAPH_EXPANSIONS", "4")),
+                multi_query=os.getenv("MULTI_QUERY", "false").lower() == "true",
+                cache_size=int(os.getenv("QUERY_CACHE_SIZE", "256"))
+            )
         )
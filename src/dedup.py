@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCATION_KEYS = ("source", "start_line", "end_line", "symbol", "parent")
+
+
+def content_hash(text: str) -> str:
+    """
+    Chunk id derived from content: line endings, trailing whitespace and surrounding blank
+    lines are normalized so copies that only differ in formatting noise share one id.
+    """
+    lines = text.replace("\r\n", "\n").strip("\n").split("\n")
+    normalized = "\n".join(line.rstrip() for line in lines)
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def location(metadata: dict) -> dict:
+    """The part of a chunk's metadata that identifies where one copy lives."""
+    return {key: metadata[key] for key in LOCATION_KEYS if key in metadata}
+
+
+class DuplicateRegistry:
+    """
+    Every location of chunks whose content occurs more than once. Such a chunk is embedded
+    and stored once; its stored metadata describes the first location (the representative)
+    and this registry lists all of them, representative first. Chunks with a single
+    location have no entry, so the registry only grows with actual duplication.
+    """
+
+    FILE_NAME = "chunk_duplicates.json"
+
+    def __init__(self, directory: str = None):
+        self.path = os.path.join(directory, self.FILE_NAME) if directory else None
+        self.locations: Dict[str, List[dict]] = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, directory: str) -> "DuplicateRegistry":
+        registry = cls(directory)
+        if os.path.exists(registry.path):
+            try:
+                with open(registry.path, 'r', encoding='utf-8') as f:
+                    registry.locations = json.load(f)
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable duplicate registry {registry.path}: {e}")
+        return registry
+
+    def save(self) -> None:
+        """Persist atomically if anything changed."""
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.locations, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def clear(self) -> None:
+        self.locations.clear()
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def add(self, chunk_id: str, representative: dict, duplicate: dict) -> None:
+        """
+        Record another location of an already stored chunk.
+
+        Args:
+            chunk_id: Content-hash id of the chunk
+            representative: Location stored with the chunk (used when it has no entry yet)
+            duplicate: Location of the new copy
+        """
+        entry = self.locations.get(chunk_id, [representative])
+        if duplicate in entry:
+            return  # a resumed build re-adds chunks it wrote before being interrupted
+        entry.append(duplicate)
+        self.locations[chunk_id] = entry
+        self._dirty = True
+
+    def sources(self, chunk_id: str) -> List[str]:
+        """Distinct source paths of a chunk, representative first (empty if it has no copies)."""
+        return list(dict.fromkeys(loc["source"] for loc in self.locations.get(chunk_id, [])))
+
+    def ids_for_sources(self, sources: Iterable[str]) -> List[str]:
+        """Chunks with a copy in any of the given sources."""
+        wanted = set(sources)
+        return [chunk_id for chunk_id, entry in self.locations.items()
+                if any(loc["source"] in wanted for loc in entry)]
+
+    def release(self, chunk_id: str, source: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Drop every location of a chunk in source.
+
+        Returns:
+            Tuple of (orphaned, new representative): orphaned is True when no other location
+            keeps the chunk alive; the new representative is set when the stored location was
+            dropped while copies remain, so the stored metadata can be pointed at a live copy
+        """
+        entry = self.locations.get(chunk_id)
+        if entry is None:
+            return True, None
+        remaining = [loc for loc in entry if loc["source"] != source]
+        if len(remaining) == len(entry):
+            return False, None
+        self._dirty = True
+        if not remaining:
+            del self.locations[chunk_id]
+            return True, None
+        if len(remaining) == 1:
+            del self.locations[chunk_id]
+        else:
+            self.locations[chunk_id] = remaining
+        return False, remaining[0] if entry[0]["source"] == source else None
+
+    def relocate(self, move: Callable[[str], str]) -> None:
+        """Rewrite every location's source path (index moved to another checkout)."""
+        for entry in self.locations.values():
+            for loc in entry:
+                loc["source"] = move(loc["source"])
+        self._dirty = bool(self.locations)
+    
+    def forget(self, chunk_ids: Iterable[str]) -> None:
+        """Remove the entries of chunks deleted outright."""
+        for chunk_id in chunk_ids:
+            if self.locations.pop(chunk_id, None) is not None:
+                self._dirty = True
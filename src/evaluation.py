@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from prompt_compression import compress_documents
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+RECALL_AT = (1, 3, 5)
+# Changes smaller than these are noise, not regressions
+QUALITY_TOLERANCE = 0.005
+LATENCY_TOLERANCE = 0.2  # relative
+LATENCY_FLOOR_MS = 2.0  # absolute, so sub-millisecond stages don't flap
+
+
+@dataclass
+class GoldenQuestion:
+    """A question and the repo-relative files (and optionally Class.method symbols) that answer it."""
+    question: str
+    files: List[str]
+    symbols: List[str] = field(default_factory=list)
+
+
+def load_golden(path: str) -> List[GoldenQuestion]:
+    """Read a golden set: {"questions": [{"question", "files", "symbols"}, ...]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [GoldenQuestion(**entry) for entry in data["questions"]]
+
+
+def _defines(doc: Document, symbol: str) -> bool:
+    """The chunk holds the symbol's definition (chunk metadata first, then its text)."""
+    leaf = symbol.rsplit(".", 1)[-1]
+    chunk_symbol = doc.metadata.get("symbol") or ""
+    if chunk_symbol in (symbol, leaf) or chunk_symbol.endswith(f".{leaf}"):
+        return True
+    return re.search(rf"^\s*(async\s+)?(def|class)\s+{re.escape(leaf)}\b", doc.page_content, re.MULTILINE) is not None
+
+
+def score(golden: GoldenQuestion, documents: List[Document], repo_path: str) -> dict:
+    """
+    Rank metrics of one retrieval. A chunk is relevant if it comes from an expected file
+    and, when symbols are listed, defines one of them.
+
+    Returns:
+        Dict with the retrieved (file, symbol) list, the rank of the first relevant chunk
+        (None if none), and file / symbol recall at each cutoff in RECALL_AT
+    """
+    files = [os.path.relpath(doc.metadata.get("source", ""), repo_path).replace(os.sep, "/") for doc in documents]
+    relevant = [
+        path in golden.files and (not golden.symbols or any(_defines(doc, s) for s in golden.symbols))
+        for path, doc in zip(files, documents)
+    ]
+    rank = relevant.index(True) + 1 if any(relevant) else None
+    result = {
+        "retrieved": [[path, doc.metadata.get("symbol") or ""] for path, doc in zip(files, documents)],
+        "rank": rank,
+    }
+    for k in RECALL_AT:
+        top_files, top_docs = set(files[:k]), documents[:k]
+        result[f"recall@{k}"] = len(top_files & set(golden.files)) / len(golden.files)
+        if golden.symbols:
+            found = [s for s in golden.symbols if any(_defines(doc, s) for doc in top_docs)]
+            result[f"symbol_recall@{k}"] = len(found) / len(golden.symbols)
+    return result
+
+
+def _percentiles(values: Sequence[float]) -> Tuple[Optional[float], Optional[float]]:
+    if not values:
+        return None, None
+    return float(np.percentile(values, 50)), float(np.percentile(values, 95))
+
+
+def evaluate(assistant, golden: List[GoldenQuestion], repeats: int = 3, end_to_end: bool = True) -> dict:
+    """
+    Run a golden set against an initialized assistant: ranking quality (recall@k, MRR)
+    and, with prompt compression on, how much smaller it makes each question's context
+    from the first pass; retrieval and end-to-end (retrieve, expand, generate) latency
+    percentiles over all passes. Query caches are cleared before each pass so every
+    question is timed cold.
+
+    Args:
+        assistant: Initialized CodeAssistant
+        golden: Questions to run
+        repeats: Timed passes over the set
+        end_to_end: Also time full answers (needs a chat model; see the offline provider)
+
+    Returns:
+        Results dict (see write_results)
+    """
+    chain = assistant.rag_chain
+    chain.retrieve("warm-up")  # collection load and first-call costs aren't per-question latency
+    per_question = [None] * len(golden)
+    retrieval_ms: List[List[float]] = [[] for _ in golden]
+    answer_ms: List[List[float]] = [[] for _ in golden]
+
+    for _ in range(repeats):
+        _clear_caches(assistant)
+        for i, item in enumerate(golden):
+            start = time.perf_counter()
+            documents = chain.retrieve(item.question)
+            retrieval_ms[i].append((time.perf_counter() - start) * 1000)
+            if per_question[i] is None:
+                per_question[i] = {"question": item.question, **score(item, documents, assistant.repo_path)}
+                if chain.compress_prompt:
+                    per_question[i].update(_context_sizes(chain, item.question, documents))
+        if end_to_end:
+            _clear_caches(assistant)
+            for i, item in enumerate(golden):
+                start = time.perf_counter()
+                chain.query(item.question)
+                answer_ms[i].append((time.perf_counter() - start) * 1000)
+
+    metrics = {}
+    for key in per_question[0]:
+        if key.startswith(("recall@", "symbol_recall@")):
+            values = [q[key] for q in per_question if key in q]
+            metrics[key] = float(np.mean(values))
+    metrics["mrr"] = float(np.mean([1 / q["rank"] if q["rank"] else 0.0 for q in per_question]))
+    if chain.compress_prompt:
+        # Share of context characters compression removes, over the whole set
+        metrics["compression"] = 1 - (sum(q["compressed_chars"] for q in per_question)
+                                      / max(sum(q["context_chars"] for q in per_question), 1))
+    all_retrieval = [ms for times in retrieval_ms for ms in times]
+    metrics["retrieval_p50_ms"], metrics["retrieval_p95_ms"] = _percentiles(all_retrieval)
+    if end_to_end:
+        all_answers = [ms for times in answer_ms for ms in times]
+        metrics["e2e_p50_ms"], metrics["e2e_p95_ms"] = _percentiles(all_answers)
+    for i, q in enumerate(per_question):
+        q["retrieval_ms"] = float(np.median(retrieval_ms[i]))
+        if end_to_end:
+            q["e2e_ms"] = float(np.median(answer_ms[i]))
+
+    config = assistant.config
+    return {
+        "version": RESULTS_VERSION,
+        "config": {
+            "provider": config.llm.provider,
+            "model": config.llm.model_name,
+            "embedding_model": config.llm.embedding_model,
+            "chunking": config.chunking,
+            "chunk_size": config.chunk_size,
+            "chunk_overlap": config.chunk_overlap,
+            "search_type": config.retrieval.search_type,
+            "k": config.retrieval.k,
+            "fetch_k": config.retrieval.fetch_k,
+            "lambda_mult": config.retrieval.lambda_mult,
+            "top_files": config.retrieval.top_files,
+            "multi_query": config.retrieval.multi_query,
+            "graph_expansions": config.retrieval.graph_expansions,
+        },
+        "questions_run": len(golden),
+        "repeats": repeats,
+        "metrics": metrics,
+        "questions": per_question,
+    }
+
+
+def _context_sizes(chain, question: str, documents: List[Document]) -> dict:
+    """Prompt context size of a question before and after compression (graph expansion included)."""
+    context = chain.expand(documents)
+    return {
+        "context_chars": len(chain.format_context(context)),
+        "compressed_chars": len(chain.format_context(compress_documents(context, question))),
+    }
+
+
+def _clear_caches(assistant) -> None:
+    store = getattr(assistant, "vector_store", None)
+    if store is not None:
+        store.embedding_cache.clear()
+        store.result_cache.clear()
+
+
+def write_results(results: dict, path: str) -> None:
+    """Write results as stable, indented JSON so two runs diff cleanly."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict) -> Tuple[List[str], List[str]]:
+    """
+    Compare a run against a baseline run.
+
+    Returns:
+        Tuple of (report lines for every metric, regressions: quality drops beyond
+        QUALITY_TOLERANCE and latency increases beyond LATENCY_TOLERANCE)
+    """
+    lines, regressions = [], []
+    if results.get("config") != baseline.get("config"):
+        changed = sorted(key for key in set(results["config"]) | set(baseline.get("config", {}))
+                         if results["config"].get(key) != baseline.get("config", {}).get(key))
+        lines.append(f"Config differs from the baseline: {', '.join(changed)}")
+    for key, value in results["metrics"].items():
+        before = baseline["metrics"].get(key)
+        if value is None or before is None:
+            continue
+        delta = value - before
+        line = f"{key:>20}: {before:10.3f} -> {value:10.3f} ({delta:+.3f})"
+        if key.endswith("_ms"):
+            regressed = delta > max(before * LATENCY_TOLERANCE, LATENCY_FLOOR_MS)
+        else:
+            regressed = delta < -QUALITY_TOLERANCE
+        if regressed:
+            line += "  REGRESSION"
+            regressions.append(key)
+        lines.append(line)
+
+    ranks = {q["question"]: q["rank"] for q in baseline.get("questions", [])}
+    for q in results["questions"]:
+        if q["question"] in ranks and q["rank"] != ranks[q["question"]]:
+            lines.append(f"rank {ranks[q['question']]} -> {q['rank']}: {q['question']}")
+    return lines, regressions
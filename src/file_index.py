@@ -0,0 +1,91 @@
+try:
+    from langchain_chroma import Chroma
+except ImportError:
+    Chroma = None
+
+import os
+import logging
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class FileSummaryIndex:
+    """
+    Coarse tier of two-tier retrieval: one vector per file, embedded from the file's path,
+    docstrings and definition signatures (see RepoMapper.summary_for), in its own Chroma
+    collection next to the chunk collection. A query first ranks files here, and the chunk
+    search is then restricted to the best files.
+    """
+
+    COLLECTION_NAME = "file_summaries"
+    PAGE_SIZE = 1000
+
+    def __init__(self, persist_directory: str, embeddings):
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.db = None
+
+    def reset(self) -> None:
+        """Replace any existing summary collection with an empty one."""
+        if os.path.exists(self.persist_directory):
+            Chroma(collection_name=self.COLLECTION_NAME, persist_directory=self.persist_directory).delete_collection()
+        self.load()
+
+    def load(self) -> None:
+        self.db = Chroma(
+            collection_name=self.COLLECTION_NAME,
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+
+    def __len__(self) -> int:
+        return self.db._collection.count() if self.db else 0
+
+    def upsert(self, summaries: Dict[str, str]) -> None:
+        """
+        Embed and store (or replace) file summaries.
+
+        Args:
+            summaries: Summary text per source path; the path is the vector's id
+        """
+        sources = list(summaries)
+        for start in range(0, len(sources), self.PAGE_SIZE):
+            batch = sources[start:start + self.PAGE_SIZE]
+            texts = [summaries[source] for source in batch]
+            self.db._collection.upsert(
+                ids=batch,
+                embeddings=self.embeddings.embed_documents(texts),
+                documents=texts,
+                metadatas=[{"source": source} for source in batch]
+            )
+        logger.info(f"Indexed {len(sources)} file summaries")
+
+    def delete(self, sources: List[str]) -> None:
+        for start in range(0, len(sources), self.PAGE_SIZE):
+            self.db.delete(ids=sources[start:start + self.PAGE_SIZE])
+
+    def relocate(self, move: Callable[[str], str]) -> None:
+        """Re-key every summary vector under its new source path, reusing the stored embeddings."""
+        rows = self.db.get(include=["embeddings", "documents"])
+        if not rows["ids"]:
+            return
+        sources = [move(source) for source in rows["ids"]]
+        self.delete(list(rows["ids"]))
+        for start in range(0, len(sources), self.PAGE_SIZE):
+            end = start + self.PAGE_SIZE
+            self.db._collection.upsert(
+                ids=sources[start:end],
+                embeddings=rows["embeddings"][start:end],
+                documents=rows["documents"][start:end],
+                metadatas=[{"source": source} for source in sources[start:end]]
+            )
+    
+    def top_files(self, query_vector, n: int) -> List[str]:
+        """Source paths of the n files whose summaries best match the query."""
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        result = self.db._collection.query(query_embeddings=[query_vector], n_results=n, include=[])
+        return result["ids"][0]
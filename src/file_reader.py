@@ -0,0 +1,128 @@
+import os
+import re
+import mmap
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from charset_normalizer import from_bytes
+
+SNIFF_BYTES = 8192
+HEADER_BYTES = 1024
+# Generator headers, matched only in a file's leading comment lines: the @generated tag,
+# Go's "// Code generated ... DO NOT EDIT." convention and protoc's banner
+GENERATED_HEADERS = re.compile(
+    rb"@generated\b"
+    rb"|^// Code generated .* DO NOT EDIT\.$"
+    rb"|Generated by the protocol buffer compiler\.\s+DO NOT EDIT!"
+)
+COMMENT_PREFIXES = (b"#", b"//", b"/*", b"*", b"--", b";", b"<!--")
+GENERATED_SUFFIXES = ("_pb2.py", "_pb2_grpc.py", ".pb.go", ".min.js", ".bundle.js", ".generated.ts")
+MINIFIED_LINE_LENGTH = 1000
+# Short files often fit several legacy encodings equally well (GBK bytes are also valid
+# CP949); ties go to the encoding most common in source files
+ENCODING_PREFERENCE = ("cp1252", "gb18030", "cp932", "big5", "cp1251", "cp949", "cp1250")
+
+
+@dataclass
+class SkipReport:
+    """Files left out of the index, grouped by reason."""
+    reasons: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.reasons)
+
+    def add(self, reason: str, path: str) -> None:
+        self.reasons.setdefault(reason, []).append(path)
+
+    def clear(self) -> None:
+        self.reasons.clear()
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"Skipped {sum(len(p) for p in self.reasons.values())} files:"]
+        for reason, paths in sorted(self.reasons.items()):
+            lines.append(f"  {reason}: {len(paths)}")
+            lines.extend(f"    {path}" for path in paths[:limit])
+            if len(paths) > limit:
+                lines.append(f"    ... and {len(paths) - limit} more")
+        return "\n".join(lines)
+
+
+def read_source_file(path: str, max_bytes: int = 1_000_000) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Read a source file for indexing, rejecting files that would only add noise.
+    Size is checked before opening, the first bytes are sniffed through a memory map for
+    binary content and generator headers in the leading comments, and UTF-8 is tried before charset
+    detection; Windows-1252 is the last resort when detection finds nothing.
+
+    Args:
+        path: File to read
+        max_bytes: Files larger than this are skipped
+
+    Returns:
+        Tuple of (text, None) on success or (None, skip reason)
+    """
+    if path.endswith(GENERATED_SUFFIXES):
+        return None, "generated"
+
+    try:
+        size = os.path.getsize(path)
+        if size > max_bytes:
+            return None, "too large"
+        if size == 0:
+            return "", None
+
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            head = mapped[:SNIFF_BYTES]
+            if b"\0" in head:
+                return None, "binary"
+            if _generated_header(head[:HEADER_BYTES]):
+                return None, "generated"
+            data = mapped[:]
+    except OSError:
+        return None, "unreadable"
+
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = _decode_legacy(data)
+        if text is None:
+            return None, "undecodable"
+
+    # Minified bundles pack everything onto a handful of huge lines
+    if size > SNIFF_BYTES and size / (text.count("\n") + 1) > MINIFIED_LINE_LENGTH:
+        return None, "minified"
+
+    return text, None
+
+
+def _generated_header(head: bytes) -> bool:
+    """Whether a generator header appears among the comment lines a file starts with."""
+    in_block = False
+    for line in head.splitlines():
+        line = line.strip()
+        if in_block or not line or line.startswith(COMMENT_PREFIXES):
+            if GENERATED_HEADERS.search(line):
+                return True
+            # Inner lines of a /* ... */ block needn't start with a comment prefix
+            if line.startswith(b"/*") or in_block:
+                in_block = b"*/" not in line[2 if not in_block else 0:]
+            continue
+        return False
+    return False
+
+
+def _decode_legacy(data: bytes) -> Optional[str]:
+    """
+    Decode non-UTF-8 source with the detected encoding. Windows-1252 decodes nearly any
+    bytes, so it is only tried when detection finds no plausible encoding.
+    """
+    matches = list(from_bytes(data))
+    if matches:
+        least_chaos = min(match.chaos for match in matches)
+        tied = [match for match in matches if match.chaos == least_chaos]
+        rank = {encoding: i for i, encoding in enumerate(ENCODING_PREFERENCE)}
+        # min() keeps detection order among encodings outside the preference list
+        return str(min(tied, key=lambda match: rank.get(match.encoding, len(rank))))
+    try:
+        return data.decode("cp1252")
+    except UnicodeDecodeError:
+        return None
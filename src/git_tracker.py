@@ -0,0 +1,126 @@
+import os
+import logging
+import subprocess
+from typing import Dict, List, Optional, Set
+from manifest import IndexManifest, StaleReport
+
+logger = logging.getLogger(__name__)
+
+
+def _git(repo_path: str, *args: str) -> Optional[str]:
+    """Run a git command in repo_path, returning stdout or None if git fails."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_path, *args],
+            capture_output=True, text=True, encoding="utf-8", errors="replace", check=True
+        )
+        return result.stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def head_commit(repo_path: str) -> Optional[str]:
+    """Commit currently checked out in repo_path, or None outside a git work tree."""
+    output = _git(repo_path, "rev-parse", "--verify", "HEAD")
+    return output.strip() if output else None
+
+
+def _split_z(output: str) -> List[str]:
+    return [os.path.normpath(part) for part in output.split("\0") if part]
+
+
+def _untracked(repo_path: str) -> Set[str]:
+    output = _git(repo_path, "ls-files", "--others", "--exclude-standard", "-z")
+    return set(_split_z(output)) if output else set()
+
+
+def dirty_paths(repo_path: str, extensions: List[str]) -> List[str]:
+    """
+    Paths (relative to repo_path) that differ from HEAD: uncommitted edits and untracked files.
+    Recorded in the manifest so a later revert of such an edit is still noticed.
+    """
+    output = _git(repo_path, "diff", "--name-only", "--relative", "-z", "HEAD")
+    paths = set(_split_z(output)) if output else set()
+    paths |= _untracked(repo_path)
+    return sorted(p for p in paths if os.path.splitext(p)[1] in extensions)
+
+
+def changed_since(repo_path: str, commit: str) -> Optional[Set[str]]:
+    """
+    Paths touched between commit and the current working tree, from
+    `git diff --name-status -M <commit>` plus untracked files. Renames yield both paths.
+
+    Returns:
+        Set of paths relative to repo_path, or None if git can't answer (e.g. unknown commit)
+    """
+    output = _git(repo_path, "diff", "--name-status", "-M", "--relative", "-z", commit)
+    if output is None:
+        return None
+
+    paths = set()
+    fields = _split_z(output)
+    i = 0
+    while i < len(fields):
+        status = fields[i]
+        # Renames and copies carry a score and two paths: R100 old new
+        width = 2 if status[0] in "RC" else 1
+        paths.update(fields[i + 1:i + 1 + width])
+        i += 1 + width
+    return paths | _untracked(repo_path)
+
+
+def last_modified(repo_path: str, max_commits: int = 2000) -> Dict[str, int]:
+    """
+    Commit time of the latest change to each path within the last max_commits commits
+    (paths relative to repo_path; uncommitted edits aren't included, see dirty_paths).
+
+    Returns:
+        Mapping of path to Unix timestamp, empty outside a git work tree
+    """
+    output = _git(repo_path, "-c", "core.quotepath=off", "log", f"-{max_commits}",
+                  "--format=%x00%ct", "--name-only", "--relative")
+    modified: Dict[str, int] = {}
+    timestamp = None
+    for line in (output or "").splitlines():
+        if line.startswith("\0"):
+            timestamp = int(line[1:])
+        elif line and timestamp is not None:
+            # Newest commits come first, so the first time a path shows up is its latest change
+            modified.setdefault(os.path.normpath(line), timestamp)
+    return modified
+
+
+def stale_report(repo_path: str, manifest: IndexManifest, extensions: List[str]) -> Optional[StaleReport]:
+    """
+    Work out stale files from git instead of stat-ing the whole tree.
+    Only paths git reports as touched since the indexed commit (plus paths that were
+    dirty at indexing time) are checked against their recorded fingerprints.
+
+    Returns:
+        StaleReport, or None when git can't be used and a full manifest diff is needed
+    """
+    if not manifest.commit or manifest.extensions != sorted(extensions):
+        return None
+
+    changed = changed_since(repo_path, manifest.commit)
+    if changed is None:
+        logger.info(f"Indexed commit {manifest.commit[:12]} not found; falling back to a full scan")
+        return None
+
+    candidates = {p for p in changed | set(manifest.dirty) if os.path.splitext(p)[1] in extensions}
+    report = StaleReport()
+    for path in sorted(candidates):
+        full_path = os.path.join(repo_path, path)
+        recorded = manifest.files.get(path)
+        if not os.path.isfile(full_path):
+            if recorded is not None:
+                report.deleted.append(path)
+        elif recorded is None:
+            report.added.append(path)
+        else:
+            fingerprint = IndexManifest.fingerprint(full_path)
+            if recorded["size"] != fingerprint["size"] or recorded["mtime_ns"] != fingerprint["mtime_ns"]:
+                report.modified.append(path)
+
+    logger.info(f"git reports {len(changed)} paths touched since {manifest.commit[:12]}")
+    return report
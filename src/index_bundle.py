@@ -0,0 +1,165 @@
+import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tarfile
+from typing import Dict, Optional
+
+try:
+    import chromadb
+except ImportError:
+    chromadb = None
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+META_NAME = "bundle.json"
+INDEX_PREFIX = "index/"
+# Leftovers of interrupted atomic writes are never part of an index
+SKIPPED_SUFFIXES = (".tmp", ".lock")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _index_files(directory: str) -> Dict[str, str]:
+    """Every file of an index directory: bundle-relative name -> absolute path."""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(SKIPPED_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, directory).replace(os.sep, "/")] = path
+    return files
+
+
+def relocate(source: str, old_root: str, new_root: str) -> str:
+    """Path of a file under new_root given its path under old_root."""
+    return os.path.join(new_root, os.path.relpath(source, old_root))
+
+
+def export_bundle(persist_directory: str, repo_path: str, output_path: str) -> dict:
+    """
+    Pack an index directory (Chroma data, manifest, duplicate registry, file summaries,
+    side indexes, repository map cache and code graph) into one gzip-compressed tar
+    with a sha256 per file.
+
+    Args:
+        persist_directory: Index directory to pack
+        repo_path: Repository path the index was built from (chunk sources start with it)
+        output_path: Bundle file to write
+
+    Returns:
+        The bundle metadata (also stored in the bundle as bundle.json)
+    """
+    manifest_path = os.path.join(persist_directory, "index_manifest.json")
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"No index manifest in {persist_directory}; build the index before exporting it")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("dirty"):
+        logger.warning(f"Exporting an index with {len(manifest['dirty'])} uncommitted files; "
+                       "importers will re-index them")
+
+    files = _index_files(persist_directory)
+    meta = {
+        "format": BUNDLE_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": manifest.get("commit"),
+        "repo_path": repo_path,
+        "chromadb": getattr(chromadb, "__version__", None),
+        "manifest": {key: value for key, value in manifest.items() if key not in ("files", "dirty")},
+        "files": {name: _sha256(path) for name, path in sorted(files.items())},
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with tarfile.open(tmp_path, "w:gz") as tar:
+        data = json.dumps(meta, indent=2).encode("utf-8")
+        info = tarfile.TarInfo(META_NAME)
+        info.size, info.mtime = len(data), int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+        for name, path in sorted(files.items()):
+            tar.add(path, arcname=INDEX_PREFIX + name, recursive=False)
+    os.replace(tmp_path, output_path)
+
+    size = os.path.getsize(output_path)
+    logger.info(f"Exported {len(files)} index files ({size / 1e6:.1f} MB) at commit "
+                f"{(meta['commit'] or 'unknown')[:12]} to {output_path}")
+    return meta
+
+
+def read_meta(bundle_path: str) -> dict:
+    """Metadata of a bundle, without extracting it."""
+    with tarfile.open(bundle_path, "r:gz") as tar:
+        member = tar.getmember(META_NAME)
+        meta = json.load(tar.extractfile(member))
+    if meta.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported index bundle format {meta.get('format')} (expected {BUNDLE_FORMAT})")
+    return meta
+
+
+def import_bundle(bundle_path: str, persist_directory: str) -> dict:
+    """
+    Verify a bundle and install its index as persist_directory. Files are extracted next
+    to the target and checked against their sha256 before the old index (if any) is
+    replaced, so a corrupt or truncated bundle leaves the current index untouched.
+    Chunk paths still point at the exporting machine's repository; see relocate().
+
+    Returns:
+        The bundle metadata
+    """
+    meta = read_meta(bundle_path)
+    version = getattr(chromadb, "__version__", None)
+    if meta.get("chromadb") and version and meta["chromadb"].split(".")[:2] != version.split(".")[:2]:
+        logger.warning(f"Bundle was written with chromadb {meta['chromadb']}, this is {version}")
+
+    target = os.path.abspath(persist_directory)
+    staging = target + ".import"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        with tarfile.open(bundle_path, "r:gz") as tar:
+            for member in tar:
+                if member.name == META_NAME:
+                    continue
+                name = member.name[len(INDEX_PREFIX):]
+                if (not member.isfile() or not member.name.startswith(INDEX_PREFIX)
+                        or name not in meta["files"] or os.path.isabs(name) or ".." in name.split("/")):
+                    raise ValueError(f"Unexpected entry in index bundle: {member.name}")
+                path = os.path.join(staging, *name.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with tar.extractfile(member) as src, open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+
+        for name, checksum in meta["files"].items():
+            path = os.path.join(staging, *name.split("/"))
+            if not os.path.exists(path):
+                raise ValueError(f"Index bundle is missing {name}")
+            if _sha256(path) != checksum:
+                raise ValueError(f"Checksum mismatch for {name}; the bundle is corrupt")
+
+        previous: Optional[str] = None
+        if os.path.exists(target):
+            previous = target + ".previous"
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(target, previous)
+        os.replace(staging, target)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info(f"Imported {len(meta['files'])} index files built at commit "
+                f"{(meta.get('commit') or 'unknown')[:12]} on {meta['created']}")
+    return meta
@@ -0,0 +1,219 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_DIR = "generations"
+CURRENT_FILE = "CURRENT"
+WRITER_LOCK = "writer.lock"
+READER_LOCK = "reader.lock"
+# Marks a directory holding a complete index (same file VectorStore.load_existing checks)
+INDEX_FILE = "chroma.sqlite3"
+
+
+class IndexGenerations:
+    """
+    Index directories under one --db-path, kept as generations so readers never see a
+    half-built index. A full build (or bundle import) writes a new directory under
+    generations/ and publishes it by atomically replacing the CURRENT pointer file; an
+    incremental sync does the same with a copy of the current generation.
+    Processes that opened an older generation keep a shared lock on it and keep serving
+    from it until they reopen; generations nobody holds are garbage-collected on publish.
+    Writers (builds, syncs, imports) are serialized by an exclusive lock on writer.lock.
+
+    An index written directly into the root before generations existed is still used
+    until the first build publishes a generation. Without fcntl (Windows) there is no
+    locking: publishing stays atomic, but concurrent writers aren't serialized.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._held: Optional[tuple] = None  # (path, fd) of the generation this process reads
+        self._writer_fd: Optional[int] = None
+        self._writer_depth = 0
+        self._lock = threading.RLock()
+        if fcntl is None:
+            logger.warning("fcntl is unavailable; concurrent indexers are not serialized")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, GENERATIONS_DIR, name)
+
+    def current(self) -> Optional[str]:
+        """Name of the published generation, or None."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def active_path(self) -> Optional[str]:
+        """Directory of the published generation (or a pre-generation index in the root), or None."""
+        name = self.current()
+        if name and os.path.exists(os.path.join(self.path(name), INDEX_FILE)):
+            return self.path(name)
+        if os.path.exists(os.path.join(self.root, INDEX_FILE)):
+            return self.root
+        return None
+
+    def open(self, attempts: int = 5) -> Optional[str]:
+        """
+        Take a shared lock on the published index so it isn't collected while this
+        process reads it (retrying if a newer generation is published meanwhile).
+
+        Returns:
+            The index directory, or None if there is no index yet
+        """
+        for _ in range(attempts):
+            path = self.active_path()
+            if path is None:
+                return None
+            # Collection never touches the current generation, so once it is held and
+            # still current it stays until this process lets go
+            if self.hold(path) and self.active_path() == path:
+                return path
+        return None
+
+    def hold(self, path: str) -> bool:
+        """
+        Take a shared lock on a generation (releasing the one held before).
+
+        Returns:
+            False if the generation is being collected
+        """
+        with self._lock:
+            if self._held and self._held[0] == path:
+                return True
+            fd = None
+            if fcntl is not None:
+                try:
+                    fd = os.open(os.path.join(path, READER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+                except FileNotFoundError:
+                    return False
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    return False
+            self._release()
+            self._held = (path, fd)
+            return True
+
+    def _release(self) -> None:
+        if self._held and self._held[1] is not None:
+            os.close(self._held[1])
+        self._held = None
+
+    @contextmanager
+    def writer(self):
+        """Exclusive writer lock for the whole --db-path; reentrant within a process."""
+        with self._lock:
+            if self._writer_depth == 0 and fcntl is not None:
+                os.makedirs(self.root, exist_ok=True)
+                fd = os.open(os.path.join(self.root, WRITER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info(f"Waiting for another indexer to finish with {self.root}...")
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._writer_fd = fd
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._writer_depth -= 1
+                if self._writer_depth == 0 and self._writer_fd is not None:
+                    os.close(self._writer_fd)
+                    self._writer_fd = None
+
+    def allocate(self) -> str:
+        """Path for a new generation (not created yet). Call with the writer lock held."""
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        return self.path(name)
+
+    def copy(self, source: str, path: str) -> None:
+        """Copy an index directory into a new generation, leaving out lock and temporary files."""
+        shutil.copytree(source, path, ignore=shutil.ignore_patterns(
+            GENERATIONS_DIR, CURRENT_FILE, WRITER_LOCK, READER_LOCK, "*.tmp"))
+
+    def inactive(self) -> List[str]:
+        """
+        Generations other than the current one, newest first: older indexes still
+        read by other processes and builds that were interrupted before publishing.
+        """
+        directory = os.path.join(self.root, GENERATIONS_DIR)
+        if not os.path.isdir(directory):
+            return []
+        current = self.current()
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory), reverse=True)
+                if name != current and os.path.isdir(os.path.join(directory, name))]
+
+    def publish(self, path: str) -> None:
+        """
+        Make a fully written generation the current one, switch this process to it and
+        collect unused generations. Call with the writer lock held.
+        """
+        name = os.path.basename(path)
+        pointer = os.path.join(self.root, CURRENT_FILE)
+        tmp_path = pointer + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(name + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, pointer)
+        self.hold(path)
+        logger.info(f"Published index generation {name}")
+        if os.path.exists(os.path.join(self.root, INDEX_FILE)):
+            logger.info(f"The index files directly in {self.root} predate generations and are no longer used")
+        self.collect()
+
+    def collect(self) -> List[str]:
+        """
+        Delete generations that are neither current nor held by any process (including
+        leftovers of interrupted builds). Call with the writer lock held.
+
+        Returns:
+            Names of the deleted generations
+        """
+        directory = os.path.join(self.root, GENERATIONS_DIR)
+        if not os.path.isdir(directory):
+            return []
+        current = self.current()
+        held = os.path.basename(self._held[0]) if self._held else None
+        removed = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name in (current, held) or not os.path.isdir(path):
+                continue
+            fd = None
+            if fcntl is not None:
+                try:
+                    fd = os.open(os.path.join(path, READER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue  # still read by another process
+                except OSError:
+                    if fd is not None:
+                        os.close(fd)
+                    continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+            finally:
+                if fd is not None:
+                    os.close(fd)
+        if removed:
+            logger.info(f"Removed {len(removed)} unused index generations")
+        return removed
@@ -0,0 +1,99 @@
+import time
+import logging
+import threading
+from queue import Empty, Full, Queue
+from typing import Callable, Dict, Iterable, List, Optional
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def stream_into(vector_store, chunks: Iterable[Document], batch_size: int = 256, max_pending: int = 4,
+                checkpoint: Optional[Callable[[Dict[str, List[str]]], None]] = None) -> Dict[str, List[str]]:
+    """
+    Bounded-memory ingest: a producer thread walks, reads and splits files while the
+    caller's thread embeds and writes batches to the vector store. At most max_pending
+    batches wait in the queue, so peak memory depends on the batch size, not the repo size,
+    and every written batch is immediately searchable.
+
+    Args:
+        vector_store: VectorStore with an open collection (see VectorStore.reset)
+        chunks: Lazily produced chunks, e.g. CodeParser.iter_chunks(...)
+        batch_size: Chunks embedded and written per batch
+        max_pending: Batches the producer may run ahead of the writer
+        checkpoint: Called after each written batch with the chunk ids of the files whose
+            chunks have now all been written (chunks must arrive grouped by file, as
+            CodeParser.iter_chunks yields them)
+
+    Returns:
+        Mapping of chunk source path to the ids of its chunks
+    """
+    queue: Queue = Queue(maxsize=max_pending)
+    stop = threading.Event()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch:
+                put(batch)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+    producer.start()
+
+    chunk_ids: Dict[str, List[str]] = {}
+    unfinished: Dict[str, None] = {}  # sources seen since the last checkpoint, in order
+    written = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            batch = queue.get()
+            if batch is _DONE:
+                break
+            ids = vector_store.add_documents(batch, flush_side_index=False)
+            for doc, chunk_id in zip(batch, ids):
+                chunk_ids.setdefault(doc.metadata["source"], []).append(chunk_id)
+                unfinished[doc.metadata["source"]] = None
+            if checkpoint is not None:
+                # The last file of the batch may continue in the next one
+                last = batch[-1].metadata["source"]
+                checkpoint({source: chunk_ids[source] for source in unfinished if source != last})
+                unfinished = {last: None}
+            written += len(batch)
+            logger.info(f"Ingested {written} chunks from {len(chunk_ids)} files "
+                        f"({written / (time.perf_counter() - start):.0f} chunks/s)")
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue if the writer failed
+        while True:
+            try:
+                queue.get_nowait()
+            except Empty:
+                break
+        producer.join()
+
+    if errors:
+        raise errors[0]
+    print(f"Processed {written} semantic code chunks from {len(chunk_ids)} files.")
+    return chunk_ids
@@ -0,0 +1,55 @@
+import time
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fractions of the budget, measured from the start of the request
+EMBED_SHARE = 0.3  # query embedding not done by then: fall back to lexical search
+FAST_RETRIEVAL_SHARE = 0.1  # embedding done later than this: skip MMR and reduce k
+GENERATION_SHARE = 0.6  # less than this left when generation starts: cap answer tokens
+MIN_DEGRADED_K = 3  # reduced k never goes below this
+
+
+class LatencyBudget:
+    """
+    Deadline for one question, and the degradations applied to stay within it.
+    A budget of 0 seconds is unlimited: nothing is degraded, but a cancelled answer is
+    still recorded here.
+    """
+
+    def __init__(self, seconds: float = 0.0):
+        self.seconds = seconds
+        self.start = time.perf_counter()
+        self.degradations: List[str] = []
+
+    @property
+    def limited(self) -> bool:
+        return self.seconds > 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None when unlimited."""
+        if not self.limited:
+            return None
+        return max(0.0, self.seconds - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.limited and self.elapsed() >= self.seconds
+
+    def past(self, share: float) -> bool:
+        """More than share of the budget has been used."""
+        return self.limited and self.elapsed() > self.seconds * share
+
+    def until(self, share: float) -> Optional[float]:
+        """Seconds until share of the budget is used (never negative), or None when unlimited."""
+        if not self.limited:
+            return None
+        return max(0.0, self.seconds * share - self.elapsed())
+
+    def degrade(self, name: str, reason: str) -> None:
+        if name not in self.degradations:
+            self.degradations.append(name)
+            logger.info(f"Degraded ({name}) after {self.elapsed():.2f}s: {reason}")
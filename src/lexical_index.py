@@ -0,0 +1,103 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase search terms of code or prose. Identifiers are kept whole and also split
+    into their snake_case / camelCase parts, so "verify_token" matches "verifyToken".
+    """
+    tokens = []
+    for identifier in IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for piece in identifier.split("_") for p in CAMEL_BOUNDARY.split(piece) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 index over chunk texts. The embedding-free fallback used when the query
+    embedding can't be computed within the latency budget; built from the texts already
+    stored in Chroma, so it needs no persistence of its own. Chunks are added and removed
+    as the store changes; removed chunks leave gaps that are compacted away once they
+    outnumber the live ones.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.ids: List[Optional[str]] = []  # None where a chunk was removed
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(doc, term frequency)]
+        self.positions: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / len(self.positions) if self.positions else 0.0
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Index chunks, replacing any already indexed under the same id."""
+        self.remove([chunk_id for chunk_id in ids if chunk_id in self.positions])
+        for chunk_id, text in zip(ids, texts):
+            position = len(self.ids)
+            terms = Counter(tokenize(text or ""))
+            self.ids.append(chunk_id)
+            self.lengths.append(sum(terms.values()))
+            self.positions[chunk_id] = position
+            self.total_length += self.lengths[-1]
+            for term, count in terms.items():
+                self.postings.setdefault(term, []).append((position, count))
+
+    def remove(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            position = self.positions.pop(chunk_id, None)
+            if position is not None:
+                self.ids[position] = None
+                self.total_length -= self.lengths[position]
+        if len(self.ids) > 2 * len(self.positions) + 1024:
+            self._compact()
+
+    def _compact(self) -> None:
+        renumbered = {}
+        for position, chunk_id in enumerate(self.ids):
+            if chunk_id is not None:
+                renumbered[position] = len(renumbered)
+        self.ids = [chunk_id for chunk_id in self.ids if chunk_id is not None]
+        self.lengths = [self.lengths[old] for old in renumbered]
+        self.positions = {chunk_id: position for position, chunk_id in enumerate(self.ids)}
+        postings = {}
+        for term, entries in self.postings.items():
+            kept = [(renumbered[position], count) for position, count in entries if position in renumbered]
+            if kept:
+                postings[term] = kept
+        self.postings = postings
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Best k (chunk id, BM25 score) pairs for the query's terms."""
+        n = len(self.positions)
+        average_length = self.average_length or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = [(position, count) for position, count in self.postings.get(term, ())
+                        if self.ids[position] is not None]
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, count in postings:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[position] / average_length)
+                scores[position] = scores.get(position, 0.0) + idf * count * (self.K1 + 1) / (count + norm)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(self.ids[position], scores[position]) for position in best]
@@ -2,6 +2,7 @@ from langchain_core.language_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_ollama import ChatOllama, OllamaEmbeddings
+from offline_models import ExtractiveChatModel, HashingEmbeddings
 from config import LLMConfig
 import logging
 
@@ -17,7 +18,8 @@ class LLMFactory:
             return ChatOpenAI(
                 model=config.model_name,
                 temperature=config.temperature,
-                api_key=config.api_key
+                api_key=config.api_key,
+                stream_usage=True  # token counts for telemetry
             )
         elif config.provider == "ollama":
             logger.info(f"Initializing Ollama LLM with model {config.model_name} at {config.base_url}")
@@ -26,6 +28,9 @@ class LLMFactory:
                 temperature=config.temperature,
                 base_url=config.base_url
             )
+        elif config.provider == "offline":
+            logger.info("Initializing offline extractive chat model (no LLM)")
+            return ExtractiveChatModel()
         else:
             raise ValueError(f"Unsupported LLM provider: {config.provider}")
 
@@ -45,5 +50,45 @@ class LLMFactory:
                 model=config.embedding_model,
                 base_url=config.base_url
             )
+        elif config.provider == "offline":
+            logger.info("Initializing offline hashing embeddings")
+            return HashingEmbeddings()
         else:
             raise ValueError(f"Unsupported LLM provider: {config.provider}")
+
+    @staticmethod
+    def limit_tokens(llm: BaseChatModel, max_tokens: int) -> BaseChatModel:
+        """Copy of the model that stops after max_tokens generated tokens."""
+        if isinstance(llm, ChatOllama):
+            return llm.model_copy(update={"num_predict": max_tokens})
+        if isinstance(llm, ChatOpenAI):
+            return llm.model_copy(update={"max_tokens": max_tokens})
+        return llm
+
+    @staticmethod
+    def warm_up_llm(llm: BaseChatModel, prompt: str = "OK") -> bool:
+        """
+        Make a local model resident before the first real question by generating one token.
+        Ollama also keeps the prompt's KV cache, so a prompt sharing the real prompts'
+        static prefix (instructions + repository map) prefills that prefix ahead of time.
+        Hosted providers have no load penalty and are left alone.
+        
+        Returns:
+            True if a warm-up request was made
+        """
+        if isinstance(llm, ChatOllama):
+            # Options must match real requests (num_ctx) or Ollama reloads the model
+            options = {"num_predict": 1}
+            if llm.num_ctx:
+                options["num_ctx"] = llm.num_ctx
+            llm.invoke(prompt, options=options)
+            return True
+        return False
+
+    @staticmethod
+    def warm_up_embeddings(embeddings: Embeddings) -> bool:
+        """Load a local embedding model so the first query embedding doesn't pay for it."""
+        if isinstance(embeddings, OllamaEmbeddings):
+            embeddings.embed_query("warm-up")
+            return True
+        return False
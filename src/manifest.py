@@ -0,0 +1,150 @@
+import os
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from code_parser import iter_source_files
+from config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class StaleReport:
+    """Files whose index entries no longer match the working tree."""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    @property
+    def is_clean(self) -> bool:
+        return not (self.added or self.modified or self.deleted)
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [f"{len(self.added)} added, {len(self.modified)} modified, {len(self.deleted)} deleted"]
+        for label, paths in (("+", self.added), ("~", self.modified), ("-", self.deleted)):
+            lines.extend(f"  {label} {path}" for path in paths[:limit])
+            if len(paths) > limit:
+                lines.append(f"  {label} ... and {len(paths) - limit} more")
+        return "\n".join(lines)
+
+
+@dataclass
+class IndexManifest:
+    """
+    Record of how an index was built, stored next to the Chroma files: the embedding model,
+    chunking parameters, file size limit, chunk id scheme, extensions, the indexed git
+    commit, and a (size, mtime) fingerprint plus chunk ids per file.
+    Lets startup tell exactly which files are stale with one stat pass instead of
+    choosing between trusting the index blindly and rebuilding it from scratch.
+    A full build saves it periodically while running, marked incomplete, so an
+    interrupted build can resume after the files whose chunks were all written.
+    """
+
+    provider: str
+    embedding_model: str
+    chunk_size: int
+    chunk_overlap: int
+    chunking: str = "recursive"  # manifests written before structural chunking existed
+    # Defaults as of manifests written before these were recorded
+    max_file_bytes: int = 1_000_000  # larger files are stored with no chunks
+    dedup_chunks: bool = True  # content-hash chunk ids (random ids when off)
+    extensions: List[str] = field(default_factory=list)
+    files: Dict[str, dict] = field(default_factory=dict)
+    commit: Optional[str] = None  # git commit the index reflects
+    dirty: List[str] = field(default_factory=list)  # paths differing from that commit at index time
+    complete: bool = True  # False in checkpoints of a build still in progress (files lists what landed)
+    version: int = MANIFEST_VERSION
+
+    FILE_NAME = "index_manifest.json"
+
+    @classmethod
+    def for_config(cls, config: AppConfig, extensions: List[str]) -> "IndexManifest":
+        """Empty manifest describing an index built with the given settings."""
+        return cls(
+            provider=config.llm.provider,
+            embedding_model=config.llm.embedding_model,
+            chunk_size=config.chunk_size,
+            chunk_overlap=config.chunk_overlap,
+            chunking=config.chunking,
+            max_file_bytes=config.max_file_bytes,
+            dedup_chunks=config.dedup_chunks,
+            extensions=sorted(extensions),
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IndexManifest"]:
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(**json.load(f))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable index manifest {path}: {e}")
+            return None
+
+    def save(self, directory: str) -> None:
+        """Write the manifest atomically so a crash never leaves a truncated file."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILE_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+    def param_mismatches(self, expected: "IndexManifest") -> List[str]:
+        """Settings that differ from the expected ones and invalidate every vector."""
+        mismatches = []
+        for name in ("version", "provider", "embedding_model", "chunk_size", "chunk_overlap", "chunking",
+                     "max_file_bytes", "dedup_chunks"):
+            built, wanted = getattr(self, name), getattr(expected, name)
+            if built != wanted:
+                mismatches.append(f"{name}: {built} -> {wanted}")
+        return mismatches
+
+    @staticmethod
+    def fingerprint(path: str) -> dict:
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @classmethod
+    def scan(cls, repo_path: str, extensions: List[str]) -> Dict[str, dict]:
+        """Fingerprint every source file with a single stat call each."""
+        fingerprints = {}
+        for path in iter_source_files(repo_path, extensions):
+            try:
+                fingerprints[os.path.relpath(path, repo_path)] = cls.fingerprint(path)
+            except OSError:
+                continue
+        return fingerprints
+
+    def diff(self, repo_path: str, extensions: List[str]) -> StaleReport:
+        """
+        Compare the recorded fingerprints with the working tree.
+
+        Args:
+            repo_path: Path to the indexed repository
+            extensions: File extensions currently being indexed
+
+        Returns:
+            StaleReport listing added, modified and deleted files (repo-relative paths)
+        """
+        current = self.scan(repo_path, extensions)
+        report = StaleReport()
+        for path, fingerprint in current.items():
+            recorded = self.files.get(path)
+            if recorded is None:
+                report.added.append(path)
+            elif recorded["size"] != fingerprint["size"] or recorded["mtime_ns"] != fingerprint["mtime_ns"]:
+                report.modified.append(path)
+        report.deleted = [path for path in self.files if path not in current]
+        for paths in (report.added, report.modified, report.deleted):
+            paths.sort()
+        return report
+
+    def chunk_ids(self, paths: List[str]) -> List[str]:
+        """Chunk ids recorded for the given repo-relative paths."""
+        return [chunk_id for path in paths for chunk_id in self.files.get(path, {}).get("chunk_ids", [])]
@@ -0,0 +1,43 @@
+import numpy as np
+from typing import List
+from quantization import QuantizedIndex
+
+
+def maximal_marginal_relevance(query_vector, candidates, k: int = 8, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Select k diverse candidates with Maximal Marginal Relevance.
+    The candidate similarity matrix is computed once and the running "closest selected"
+    similarity is updated with one vectorized max per step, so there is no per-pair loop
+    and no re-fetching of embeddings.
+
+    Args:
+        query_vector: Query embedding
+        candidates: Matrix of candidate embeddings (one row per candidate)
+        k: Number of candidates to select
+        lambda_mult: 1.0 = pure relevance, 0.0 = pure diversity
+
+    Returns:
+        Row indices of the selected candidates, in selection order
+    """
+    matrix = QuantizedIndex.normalize(candidates)
+    k = min(k, len(matrix))
+    if k <= 0:
+        return []
+
+    relevance = matrix @ QuantizedIndex.normalize(query_vector)[0]
+    similarity = matrix @ matrix.T
+
+    selected = [int(np.argmax(relevance))]
+    closest = similarity[selected[0]].copy()
+    available = np.ones(len(matrix), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * closest
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(closest, similarity[best], out=closest)
+
+    return selected
@@ -0,0 +1,111 @@
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+FAST = "fast"
+STRONG = "strong"
+
+LOOKUP = re.compile(
+    r"^\s*(where (is|are|does|do)\b|which (file|class|function|module|method)\b|what (file|module|type|class)\b"
+    r"|what does \S+ return\b|what (are|is) the (arguments|parameters|signature|return type|default)\b"
+    r"|list (the|all)\b|show me\b|find\b)",
+    re.IGNORECASE,
+)
+LOOKUP_WORDS = re.compile(r"\b(return|returns|defined|signature|arguments?|parameters?|default|located|imported)\b", re.IGNORECASE)
+HARD = re.compile(
+    r"\b(why|design|architect\w*|refactor\w*|trade-?offs?|compare|comparison|pros and cons|should|improve"
+    r"|optimi[sz]\w*|best way|explain|walk me through|end[- ]to[- ]end|overall|bug|race|security|scal\w+"
+    r"|implement|rewrite|migrate)\b",
+    re.IGNORECASE,
+)
+IDENTIFIER = re.compile(r"`([^`]+)`|\b([A-Za-z_]\w*(?:\.\w+)*)\(\)|\b([a-z]+_\w+|[a-z]+[A-Z]\w*|[A-Z][a-z]+[A-Z]\w*)\b")
+MAX_LOOKUP_WORDS = 20
+
+
+def named_identifiers(question: str) -> List[str]:
+    """Code identifiers named in a question: `quoted`, called(), snake_case or CamelCase words."""
+    names = []
+    for quoted, called, bare in IDENTIFIER.findall(question):
+        name = (quoted or called or bare).strip().rstrip("()")
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def classify(question: str, documents: List[Document] = ()) -> Tuple[str, str]:
+    """
+    Route a question with cheap heuristics and retrieval confidence: short lookups of a
+    named symbol ("what does `get_connection` return", "where is TokenService defined")
+    go to the fast model, as long as the symbol's definition was retrieved; reasoning
+    questions (why / design / refactor / explain ...) and long questions go to the strong one.
+
+    Returns:
+        Tuple of (FAST or STRONG, reason)
+    """
+    words = question.split()
+    if HARD.search(question):
+        return STRONG, "reasoning question"
+    if len(words) > MAX_LOOKUP_WORDS:
+        return STRONG, "long question"
+
+    names = named_identifiers(question)
+    if not (LOOKUP.search(question) or (names and LOOKUP_WORDS.search(question))):
+        return STRONG, "not a lookup"
+    if not names:
+        return FAST, "lookup"
+
+    # Retrieval confidence: the named symbol is defined in the context
+    for name in names:
+        leaf = name.rsplit(".", 1)[-1]
+        for doc in documents:
+            symbol = doc.metadata.get("symbol") or ""
+            if symbol.rsplit(".", 1)[-1] == leaf or re.search(rf"\b(def|class)\s+{re.escape(leaf)}\b", doc.page_content):
+                return FAST, f"lookup of {name}"
+    return STRONG, f"lookup of {names[0]}, not found in the context"
+
+
+class RouteStats:
+    """Per-route question counts and recent answer latencies."""
+
+    WINDOW = 1000
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {FAST: 0, STRONG: 0}
+        self.latencies: Dict[str, deque] = {FAST: deque(maxlen=self.WINDOW), STRONG: deque(maxlen=self.WINDOW)}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float) -> None:
+        with self._lock:
+            self.counts[route] += 1
+            self.latencies[route].append(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        """Per route: questions, share of all questions, p50 / p95 answer latency in seconds."""
+        with self._lock:
+            total = sum(self.counts.values())
+            result = {}
+            for route, count in self.counts.items():
+                latencies = np.asarray(self.latencies[route], dtype=np.float64)
+                result[route] = {
+                    "questions": count,
+                    "share": count / total if total else 0.0,
+                    "p50_s": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    "p95_s": float(np.percentile(latencies, 95)) if len(latencies) else None,
+                }
+            return result
+
+    def report(self, models: Dict[str, str] = None) -> str:
+        lines = []
+        for route, stats in self.summary().items():
+            model = f" ({models[route]})" if models and route in models else ""
+            if stats["questions"]:
+                lines.append(
+                    f"{route}{model}: {stats['questions']} questions ({stats['share']:.0%}), "
+                    f"p50 {stats['p50_s']:.2f}s, p95 {stats['p95_s']:.2f}s"
+                )
+            else:
+                lines.append(f"{route}{model}: no questions")
+        return "\n".join(lines)
@@ -0,0 +1,67 @@
+import re
+from typing import Dict, List
+from langchain_core.documents import Document
+
+RRF_K = 60  # standard reciprocal rank fusion damping constant
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "how", "what", "where", "when", "why", "which", "who",
+    "does", "do", "did", "it", "its", "of", "in", "on", "to", "from", "for", "and", "or", "with",
+    "this", "that", "there", "be", "by", "get", "gets", "work", "works",
+}
+CLAUSE_SEPARATORS = re.compile(r"\?\s+|;\s*|,\s*(?:and\s+|then\s+)?|\s+(?:and then|and also|then|and|as well as|versus|vs\.?)\s+", re.IGNORECASE)
+FLOW = re.compile(r"\bfrom\s+(.+?)\s+(?:to|into|through)\s+(.+?)(?:[?.!]|$)", re.IGNORECASE)
+
+
+def _content_words(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z_][a-z0-9_]*", text.lower()) if w not in STOP_WORDS]
+
+
+def split_question(question: str, max_queries: int = 4) -> List[str]:
+    """
+    Split a broad question into a few focused sub-queries with cheap heuristics: clauses
+    joined by "and"/"then"/commas/semicolons become separate queries, and "from X to Y"
+    flow questions search both ends. The full question always comes first, so fusion
+    still favours chunks that match it as a whole.
+
+    Args:
+        question: User question
+        max_queries: Upper bound on the number of queries, including the full question
+
+    Returns:
+        List of queries; just [question] when it doesn't decompose
+    """
+    queries = [question.strip()]
+    flow = FLOW.search(question)
+    if flow:
+        queries.extend(part.strip() for part in flow.groups())
+    queries.extend(part.strip(" ?.!") for part in CLAUSE_SEPARATORS.split(question))
+
+    unique, seen = [], set()
+    for query in queries:
+        words = tuple(_content_words(query))
+        # Fragments without content words ("and how") only add noise
+        if not words or words in seen:
+            continue
+        seen.add(words)
+        unique.append(query)
+    return unique[:max_queries]
+
+
+def _document_key(doc: Document):
+    return doc.id or (doc.metadata.get("source"), doc.metadata.get("start_line"), doc.page_content[:200])
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked result lists: each document scores sum(1 / (k + rank)) over the lists it
+    appears in, so chunks found by several sub-queries rise to the top without needing
+    comparable similarity scores.
+    """
+    scores: Dict[object, float] = {}
+    documents: Dict[object, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = _document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
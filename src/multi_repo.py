@@ -0,0 +1,246 @@
+import os
+import re
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from code_assistant import CodeAssistant
+from config import AppConfig
+from rag_chain import RAGChain
+from retriever import ShardedRetriever
+
+logger = logging.getLogger(__name__)
+
+SHARD_PREFIX = re.compile(r"^\s*((?:@[\w.-]+[\s,]*)+)")
+
+
+class ShardedIndex:
+    """
+    Registry of per-repository index shards. Each shard is a CodeAssistant with its own
+    Chroma directory under a common base directory; queries fan out to all (or a subset of)
+    shards on a thread pool, slow shards are dropped at the timeout, and results are
+    merged by similarity score. A dropped shard is skipped until its overdue search
+    finishes, so one stuck shard can't fill the pool and delay every later query.
+    """
+
+    def __init__(self, config: AppConfig, base_directory: str = None):
+        self.config = config
+        self.base_directory = base_directory or config.persist_directory
+        self.shards: Dict[str, CodeAssistant] = {}
+        self.executor = ThreadPoolExecutor(max_workers=config.shard_workers, thread_name_prefix="shard")
+        self.last_timing = {}
+        self.last_dropped: List[str] = []
+        self._overdue: Dict[str, Future] = {}  # searches of dropped shards still running
+        self._overdue_lock = threading.Lock()
+
+    @staticmethod
+    def parse_shard_prefix(question: str) -> Tuple[Optional[List[str]], str]:
+        """
+        Split a leading "@billing @payments" shard selector off a question.
+
+        Returns:
+            Tuple of (shard names or None for all shards, remaining question)
+        """
+        match = SHARD_PREFIX.match(question)
+        if not match:
+            return None, question
+        names = re.findall(r"@([\w.-]+)", match.group(1))
+        return names, question[match.end():].strip()
+
+    def register(self, name: str, repo_path: str) -> CodeAssistant:
+        """
+        Register a repository as an index shard.
+
+        Args:
+            name: Shard name used in results and "@name" selectors
+            repo_path: Path to the repository
+
+        Returns:
+            The shard's CodeAssistant
+        """
+        if name in self.shards:
+            raise ValueError(f"Shard already registered: {name}")
+        shard_config = replace(self.config, persist_directory=os.path.join(self.base_directory, name))
+        self.shards[name] = CodeAssistant(repo_path, config=shard_config)
+        return self.shards[name]
+
+    def index_all(self, file_extensions: list, force_reindex: bool = False) -> None:
+        """Load or build every shard's vector index."""
+        for name, shard in self.shards.items():
+            logger.info(f"Indexing shard '{name}' ({shard.repo_path})")
+            shard.build_index(file_extensions, force_reindex)
+
+    def _select(self, names: Optional[List[str]]) -> Dict[str, CodeAssistant]:
+        if not names:
+            return self.shards
+        unknown = [n for n in names if n not in self.shards]
+        if unknown:
+            logger.warning(f"Unknown shards ignored: {', '.join(unknown)}")
+        return {n: self.shards[n] for n in names if n in self.shards}
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query once for all shards, which share one embedding model."""
+        return next(iter(self.shards.values())).vector_store.embed_query(query)
+
+    def search(self, query: str, k: int = None, shards: List[str] = None,
+               timeout: float = None) -> List[Tuple[Document, float]]:
+        """
+        Search the selected shards concurrently and merge the results by score.
+
+        Args:
+            query: Search query
+            k: Number of merged results (defaults to the configured k)
+            shards: Shard names to search, or None for all
+            timeout: Seconds to wait for shards (defaults to config.shard_timeout)
+
+        Returns:
+            List of (Document, score) with metadata["shard"] set, best first
+        """
+        start = time.perf_counter()
+        query_vector = self.embed_query(query)
+        embed_ms = (time.perf_counter() - start) * 1000
+        return self.search_by_vector(query_vector, k, shards, timeout, embed_ms)
+
+    def search_many(self, queries: List[str], k: int = None,
+                    shards: List[str] = None) -> List[List[Tuple[Document, float]]]:
+        """Several queries embedded in one batch, each fanned out to the shards concurrently."""
+        vectors = next(iter(self.shards.values())).vector_store.embed_queries(queries)
+        with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="multi-query") as executor:
+            return list(executor.map(lambda vector: self.search_by_vector(vector, k, shards), vectors))
+
+    def search_by_vector(self, query_vector, k: int = None, shards: List[str] = None,
+                         timeout: float = None, embed_ms: float = 0.0,
+                         search_type: str = None) -> List[Tuple[Document, float]]:
+        """Fan an embedded query out to the selected shards; see search()."""
+        selected = self._select(shards)
+        if not selected:
+            return []
+        k = k or self.config.retrieval.k
+
+        embedded = time.perf_counter()
+        merged, dropped = self._gather(
+            selected, lambda store: store.search_by_vector(query_vector, k, search_type), timeout
+        )
+        finished = time.perf_counter()
+        self.last_timing = {
+            "embed_ms": embed_ms,
+            "search_ms": (finished - embedded) * 1000,
+            "total_ms": embed_ms + (finished - embedded) * 1000,
+            "shards": len(selected),
+            "dropped_shards": dropped,
+        }
+        return merged[:k]
+
+    def lexical_search(self, query: str, k: int = None, shards: List[str] = None) -> List[Tuple[Document, float]]:
+        """Keyword search over the selected shards (no query embedding); see VectorStore.lexical_search."""
+        selected = self._select(shards)
+        if not selected:
+            return []
+        k = k or self.config.retrieval.k
+        merged, _ = self._gather(selected, lambda store: store.lexical_search(query, k), None)
+        return merged[:k]
+
+    def _gather(self, selected: Dict[str, CodeAssistant], search,
+                timeout: float = None) -> Tuple[List[Tuple[Document, float]], List[str]]:
+        """
+        Run search(vector_store) on every selected shard concurrently.
+
+        Returns:
+            Tuple of (results tagged with metadata["shard"], best first; names of shards
+            dropped for exceeding the timeout or still busy with an earlier dropped search)
+        """
+        timeout = self.config.shard_timeout if timeout is None else timeout
+        with self._overdue_lock:
+            self._overdue = {name: future for name, future in self._overdue.items() if not future.done()}
+            busy = sorted(name for name in selected if name in self._overdue)
+        if busy:
+            logger.warning(f"Skipped shards still busy with an earlier search: {', '.join(busy)}")
+        futures = {self.executor.submit(search, shard.vector_store): name
+                   for name, shard in selected.items() if name not in busy}
+        done, pending = wait(futures, timeout=timeout) if futures else (set(), set())
+        late = sorted(futures[f] for f in pending)
+        if late:
+            logger.warning(f"Dropped shards slower than {timeout}s: {', '.join(late)}")
+        with self._overdue_lock:
+            for future in pending:
+                # Searches still queued never start; running ones block their shard until done
+                if not future.cancel():
+                    self._overdue[futures[future]] = future
+        dropped = sorted(busy + late)
+        self.last_dropped = dropped
+
+        merged = []
+        for future in done:
+            name = futures[future]
+            try:
+                for doc, score in future.result():
+                    doc.metadata["shard"] = name
+                    merged.append((doc, score))
+            except Exception as e:
+                logger.error(f"Shard '{name}' search failed: {e}")
+
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return merged, dropped
+
+    def build_repo_map(self, file_extensions: list, max_lines: int = 150) -> str:
+        """
+        Combine per-shard repository maps, splitting the line budget evenly between shards.
+        """
+        budget = max(10, max_lines // max(1, len(self.shards)))
+        sections = []
+        for name, shard in self.shards.items():
+            sections.append(f"[{name}] {shard.repo_path}\n{shard.build_repo_map(file_extensions, budget)}")
+        return "\n\n".join(sections)
+
+    def get_retriever(self) -> ShardedRetriever:
+        """Retriever that fans out over all shards, honoring "@shard" question prefixes."""
+        return ShardedRetriever(index=self, k=self.config.retrieval.k)
+
+
+class MultiRepoAssistant(CodeAssistant):
+    """
+    Code assistant over several repositories at once, for cross-service questions.
+    Prefix a question with "@name" to restrict it to specific shards.
+    """
+
+    def __init__(self, repos: Dict[str, str], config: AppConfig = None):
+        self.config = config or AppConfig.from_env()
+        self.repo_path = None
+        self._start_warmup()
+        # Shards share the models warmed above
+        self.index = ShardedIndex(replace(self.config, warm_up=False))
+        for name, path in repos.items():
+            self.index.register(name, path)
+        self.rag_chain: Optional[RAGChain] = None
+        self.is_initialized = False
+
+    def build_index(self, file_extensions: list, force_reindex: bool = False, background: bool = False) -> None:
+        if background:
+            logger.warning("Background indexing covers a single repository; indexing all shards now")
+        self.index.index_all(file_extensions, force_reindex)
+
+    def reopen_index(self) -> bool:
+        reopened = [shard.reopen_index() for shard in self.index.shards.values()]
+        return any(reopened)
+
+    def build_repo_map(self, file_extensions: list, max_lines: int = 150) -> str:
+        return self.index.build_repo_map(file_extensions, max_lines)
+
+    def get_retriever(self):
+        return self.index.get_retriever()
+
+    def get_code_graph(self):
+        # Graph expansion resolves paths within a single repository
+        return None
+
+    @property
+    def retrieval_timing(self) -> dict:
+        return self.index.last_timing
+
+    def get_repository_structure(self) -> str:
+        return "\n\n".join(
+            f"[{name}]\n{shard.get_repository_structure()}" for name, shard in self.index.shards.items()
+        )
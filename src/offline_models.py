@@ -0,0 +1,72 @@
+import re
+import math
+import hashlib
+from collections import Counter
+from typing import Any, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from lexical_index import tokenize
+
+CONTEXT_HEADER = re.compile(r"^# (\S+:\d+-\d+)", re.MULTILINE)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Model-free embeddings for offline runs (evaluation, CI): identifier tokens hashed
+    into a fixed number of dimensions with sublinear term frequency, L2-normalized.
+    Deterministic across processes, so stored and query vectors always agree;
+    similarity is lexical overlap, not meaning.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token, count in Counter(tokenize(text)).items():
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            # The sign bit spreads hash collisions around zero instead of piling them up
+            vector[digest % self.dimensions] += (1 + math.log(count)) * (1 if digest >> 63 else -1)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class ExtractiveChatModel(BaseChatModel):
+    """
+    Stand-in chat model for offline runs: answers with the context sections it was
+    given ("# path:start-end" headers), streamed line by line. Makes end-to-end
+    latency measurable without a model; the answers carry no reasoning.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-extractive"
+
+    @staticmethod
+    def _answer(messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        sections = CONTEXT_HEADER.findall(prompt)
+        if not sections:
+            return "I don't have enough context."
+        return "Relevant code:\n" + "\n".join(f"- {section}" for section in dict.fromkeys(sections))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for line in self._answer(messages).splitlines(keepends=True):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=line))
+            if run_manager:
+                run_manager.on_llm_new_token(line, chunk=chunk)
+            yield chunk
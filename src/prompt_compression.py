@@ -0,0 +1,206 @@
+import io
+import re
+import ast
+import textwrap
+import tokenize
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+from lexical_index import tokenize as terms_of
+from multi_query import STOP_WORDS
+
+# Bodies this short cost about as much as the marker replacing them
+MIN_COLLAPSED_LINES = 4
+LINE_COMMENT = {"python": "#", "ruby": "#", "perl": "#"}
+DEFAULT_LINE_COMMENT = "//"
+C_STYLE_COMMENT = re.compile(r"^\s*(//|/\*|\*|\*/)")
+STEM_SUFFIXES = ("ing", "ed", "es", "s", "ion", "er")
+
+
+def _stem(term: str) -> str:
+    """Crude suffix stripping so "resolved" matches resolve_proxies and "cookies" matches cookie."""
+    for suffix in STEM_SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 4:
+            return term[:-len(suffix)]
+    return term
+
+
+def _stems(text: str) -> Set[str]:
+    return {_stem(term) for term in terms_of(text) if term not in STOP_WORDS and len(term) > 2}
+
+
+def _identifier_stems(node) -> Set[str]:
+    """Stems of the names and attributes a function uses (e.g. verify_password in its body)."""
+    names = [n.id if isinstance(n, ast.Name) else n.attr
+             for n in ast.walk(node) if isinstance(n, (ast.Name, ast.Attribute))]
+    return _stems(" ".join(names))
+
+
+def _docstring_lines(node) -> Optional[Tuple[int, int, str]]:
+    """(first line, last line, first line of text) of a node's docstring, 1-based within the chunk."""
+    body = getattr(node, "body", None)
+    if not body or not isinstance(body[0], ast.Expr):
+        return None
+    value = body[0].value
+    if not (isinstance(value, ast.Constant) and isinstance(value.value, str)):
+        return None
+    summary = next((line.strip() for line in value.value.strip().splitlines() if line.strip()), "")
+    return body[0].lineno, body[0].end_lineno, summary
+
+
+@lru_cache(maxsize=64)
+def _parse(text: str) -> Optional[ast.Module]:
+    """Parse a chunk (cached: compress_documents looks at every chunk before compressing it)."""
+    try:
+        return ast.parse(textwrap.dedent(text))
+    except SyntaxError:
+        return None
+
+
+def _functions(tree: ast.Module) -> List[ast.AST]:
+    return [node for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+
+@lru_cache(maxsize=64)
+def _matching_functions(text: str, terms: FrozenSet[str]) -> FrozenSet[int]:
+    """First lines of the chunk's functions named after, or using a name from, the question's terms."""
+    tree = _parse(text)
+    if tree is None:
+        return frozenset()
+    return frozenset(node.lineno for node in _functions(tree)
+                     if terms & (_stems(node.name) | _identifier_stems(node)))
+
+
+def _python_edits(text: str, terms: FrozenSet[str], focused: bool = False) -> Optional[Dict[int, Optional[str]]]:
+    """
+    Line edits for a Python chunk: line number -> replacement text, or None to drop it.
+    Returns None if the chunk doesn't parse (e.g. a definition split mid-body).
+    """
+    tree = _parse(text)
+    if tree is None:
+        return None
+    lines = text.split("\n")
+    edits: Dict[int, Optional[str]] = {}
+
+    # Full-line comments (tokenize knows which "#" are inside strings)
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(textwrap.dedent(text)).readline):
+            if token.type == tokenize.COMMENT and token.line.lstrip().startswith("#"):
+                edits[token.start[0]] = None
+    except (tokenize.TokenError, IndentationError):
+        pass
+
+    functions = _functions(tree)
+    relevant = {id(node) for node in functions if node.lineno in _matching_functions(text, terms)}
+    # A chunk holding one function (or none matching the question) may have been retrieved
+    # for that code as a whole, so its bodies stay unless the question's code is found
+    # elsewhere in the context (focused) or next to them
+    collapse = focused or (len(functions) > 1 and bool(relevant))
+
+    for node in [tree] + [n for n in ast.walk(tree) if isinstance(n, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))]:
+        docstring = _docstring_lines(node)
+        if docstring:
+            first, last, summary = docstring
+            indent = lines[first - 1][:len(lines[first - 1]) - len(lines[first - 1].lstrip())]
+            edits[first] = f'{indent}"""{summary}"""' if summary else None
+            for line in range(first + 1, last + 1):
+                edits[line] = None
+
+    if collapse:
+        outermost = [node for node in functions if not any(
+            other is not node and other.lineno <= node.lineno and node.end_lineno <= other.end_lineno
+            for other in functions)]
+        for node in outermost:
+            body = node.body[1:] if _docstring_lines(node) else node.body
+            if id(node) in relevant or not body:
+                continue
+            body_start, body_end = body[0].lineno, node.end_lineno
+            if body_end - body_start + 1 < MIN_COLLAPSED_LINES:
+                continue
+            indent = lines[body_start - 1][:len(lines[body_start - 1]) - len(lines[body_start - 1].lstrip())]
+            edits[body_start] = f"{indent}..."
+            for line in range(body_start + 1, body_end + 1):
+                edits[line] = None
+    return edits
+
+
+def _plain_edits(text: str, comment: str) -> Dict[int, Optional[str]]:
+    """Drop full-line comments of a chunk that isn't parsed."""
+    edits: Dict[int, Optional[str]] = {}
+    for number, line in enumerate(text.split("\n"), 1):
+        stripped = line.strip()
+        if stripped.startswith(comment) or (comment == DEFAULT_LINE_COMMENT and C_STYLE_COMMENT.match(line)):
+            edits[number] = None
+    return edits
+
+
+def compress_text(text: str, start_line: int, language: str, question: str, focused: bool = False) -> str:
+    """
+    Shorten one chunk for the prompt: full-line comments and license headers go,
+    docstrings shrink to their first line, blank lines go, and (for Python) bodies of
+    functions that don't match the question collapse to their signature. Wherever lines
+    were removed a "# L<n>" marker gives the original line number of the next line,
+    keeping citations exact.
+
+    Args:
+        text: Chunk text
+        start_line: Line number of the chunk's first line in its file
+        language: Chunk language (metadata["language"])
+        question: User question, for deciding which bodies matter
+        focused: Another chunk of the context holds a function matching the question, so
+            bodies here that don't match can go even in a single-function chunk
+
+    Returns:
+        Compressed text (the original if nothing could be removed)
+    """
+    comment = LINE_COMMENT.get(language, DEFAULT_LINE_COMMENT)
+    edits = None
+    if language == "python":
+        edits = _python_edits(text, frozenset(_stems(question)), focused)
+    if edits is None:
+        edits = _plain_edits(text, comment)
+    out: List[str] = []
+    expected = 1  # chunk line the next output line corresponds to without a marker
+    for number, line in enumerate(text.split("\n"), 1):
+        if number in edits:
+            line = edits[number]
+        if line is None or not line.strip():
+            continue
+        if number != expected:
+            out.append(f"{comment} L{start_line + number - 1}")
+        out.append(line)
+        expected = number + 1
+    return "\n".join(out)
+
+
+def _language(doc: Document) -> str:
+    language = doc.metadata.get("language") or ("python" if doc.metadata.get("source", "").endswith(".py") else "")
+    # Freshly split chunks carry the Language enum, stored ones its value
+    return str(getattr(language, "value", language))
+
+
+def compress_documents(documents: List[Document], question: str) -> List[Document]:
+    """
+    Compressed copies of context chunks (see compress_text). The originals are left
+    alone, since they are also shown as sources and kept for follow-up questions.
+    Chunks without line metadata can't be mapped back and are passed through.
+    Once any retrieved Python chunk has a function matching the question, unrelated
+    bodies collapse in every chunk; definitions added by graph expansion keep theirs,
+    since the matching code calls them.
+    """
+    terms = frozenset(_stems(question))
+    focused = any(
+        _language(doc) == "python" and not doc.metadata.get("expanded_from")
+        and _matching_functions(doc.page_content, terms)
+        for doc in documents
+    )
+    compressed = []
+    for doc in documents:
+        start_line = doc.metadata.get("start_line")
+        if not start_line:
+            compressed.append(doc)
+            continue
+        text = compress_text(doc.page_content, start_line, _language(doc), question,
+                             focused and not doc.metadata.get("expanded_from"))
+        compressed.append(doc if text == doc.page_content else Document(page_content=text, metadata=doc.metadata, id=doc.id))
+    return compressed
@@ -0,0 +1,235 @@
+import os
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+SUPPORTED_QUANTIZATION = ("int8", "float16")
+STORAGE_DTYPES = SUPPORTED_QUANTIZATION + ("float32",)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def append_rows(buffer: Optional[np.ndarray], used: int, rows: np.ndarray) -> np.ndarray:
+    """
+    Write rows after the first used rows of buffer, reallocating with doubled capacity when
+    it is full, so appending batch after batch costs amortized O(1) per row instead of
+    copying the whole matrix each time.
+
+    Returns:
+        The buffer holding all used + len(rows) rows (possibly a new one)
+    """
+    needed = used + len(rows)
+    if buffer is None or needed > len(buffer):
+        capacity = max(needed, 2 * (len(buffer) if buffer is not None else 0))
+        grown = np.empty((capacity,) + rows.shape[1:], dtype=rows.dtype)
+        if buffer is not None:
+            grown[:used] = buffer[:used]
+        buffer = grown
+    buffer[used:needed] = rows
+    return buffer
+
+
+class QuantizedIndex:
+    """
+    In-memory copy of the collection's embeddings used for a fast first-pass search.
+    Vectors are L2-normalized and stored as int8 (with a per-vector scale) or float16,
+    so searching holds 4x / 2x less vector memory than float32 would. This saves memory,
+    not disk: Chroma still stores the float32 vectors (rescoring, MMR and rebuilds read
+    them), and the saved index is written next to them.
+    float32 storage is also accepted for indexes (e.g. IVF) that only need the layout.
+    Rows live in buffers with spare capacity (see append_rows), trimmed on save.
+    """
+
+    FILE_NAME = "quantized_index.npz"
+    BLOCK_SIZE = 65536
+
+    def __init__(self, dtype: str = "int8"):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported quantization: {dtype}. Use one of {SUPPORTED_QUANTIZATION}")
+        self.dtype = dtype
+        self.ids: List[str] = []
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        """Stored vectors, one row per id (a view of the used part of the buffer)."""
+        return self._codes[:len(self.ids)] if self._codes is not None else None
+
+    @codes.setter
+    def codes(self, value: Optional[np.ndarray]) -> None:
+        self._codes = value
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        """Per-vector int8 scales (None for float storage)."""
+        return self._scales[:len(self.ids)] if self._scales is not None else None
+
+    @scales.setter
+    def scales(self, value: Optional[np.ndarray]) -> None:
+        self._scales = value
+
+    @property
+    def exact(self) -> bool:
+        """True when stored vectors are full precision and need no rescoring."""
+        return self.dtype == "float32"
+
+    @property
+    def dimension(self) -> int:
+        return self.codes.shape[1] if self.codes is not None else 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the quantized vectors and their scales."""
+        total = self.codes.nbytes if self.codes is not None else 0
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        """Return float32 copies of the vectors scaled to unit length."""
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _encode(self, vectors) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        matrix = self.normalize(vectors)
+        if self.dtype == "float32":
+            return matrix, None
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        """
+        Quantize and append vectors to the index.
+
+        Args:
+            ids: Chroma ids of the vectors, in the same order
+            vectors: Full-precision embeddings
+        """
+        if not ids:
+            return
+        codes, scales = self._encode(vectors)
+        used = len(self.ids)
+        self._codes = append_rows(self._codes, used, codes)
+        if scales is not None:
+            self._scales = append_rows(self._scales, used, scales)
+        self.ids.extend(ids)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        """Drop vectors from the index by id."""
+        doomed = set(ids)
+        if not doomed or not self.ids:
+            return
+        keep = np.array([i not in doomed for i in self.ids], dtype=bool)
+        # Slice while the views still cover every row
+        self.codes = self.codes[keep]
+        if self.scales is not None:
+            self.scales = self.scales[keep]
+        self.ids = [i for i, kept in zip(self.ids, keep) if kept]
+
+    def scores_for(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Similarity of a normalized query against a subset of stored rows."""
+        block = self.codes[rows].astype(np.float32) @ query
+        if self.scales is not None:
+            block *= self.scales[rows]
+        return block
+
+    def scores(self, query_vector) -> np.ndarray:
+        """
+        Approximate cosine similarity of the query against every stored vector.
+        Works block by block so only BLOCK_SIZE rows are ever dequantized at once.
+        """
+        query = self.normalize(query_vector)[0]
+        result = np.empty(len(self.ids), dtype=np.float32)
+
+        for start in range(0, len(self.ids), self.BLOCK_SIZE):
+            end = start + self.BLOCK_SIZE
+            block = self.codes[start:end].astype(np.float32) @ query
+            if self.scales is not None:
+                block *= self.scales[start:end]
+            result[start:end] = block
+
+        return result
+
+    def search(self, query_vector, k: int) -> List[Tuple[str, float]]:
+        """
+        Find the k nearest stored vectors.
+
+        Args:
+            query_vector: Full-precision query embedding
+            k: Number of candidates to return
+
+        Returns:
+            List of (id, approximate cosine similarity), best first
+        """
+        if not self.ids or k <= 0:
+            return []
+
+        scores = self.scores(query_vector)
+        return [(self.ids[i], float(scores[i])) for i in top_k(scores, k)]
+
+    def search_batch(self, query_vectors, k: int) -> List[List[Tuple[str, float]]]:
+        """Search for several queries, one after the other (each scan is already vectorized)."""
+        return [self.search(query_vector, k) for query_vector in query_vectors]
+
+    def _arrays(self) -> dict:
+        arrays = {
+            "dtype": np.array(self.dtype),
+            "ids": np.array(self.ids, dtype=str),
+            "codes": self.codes if self.codes is not None else np.empty((0, 0), dtype=self.dtype),
+        }
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        return arrays
+
+    def _restore(self, data) -> None:
+        self.ids = data["ids"].tolist()
+        self.codes = data["codes"] if self.ids else None
+        self.scales = data["scales"] if "scales" in data else None
+
+    def compact(self) -> None:
+        """Release the spare capacity left by appends."""
+        if self._codes is not None and len(self._codes) > len(self.ids):
+            self._codes = self.codes.copy()
+        if self._scales is not None and len(self._scales) > len(self.ids):
+            self._scales = self.scales.copy()
+
+    def save(self, directory: str) -> None:
+        """Write the index next to the Chroma files."""
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, self.FILE_NAME), **self._arrays())
+
+    @classmethod
+    def load(cls, directory: str, **kwargs) -> Optional["QuantizedIndex"]:
+        """
+        Load a previously saved index.
+
+        Returns:
+            The index, or None if the directory has none
+        """
+        path = os.path.join(directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(str(data["dtype"]), **kwargs)
+            index._restore(data)
+        return index
@@ -1,10 +1,23 @@
-from langchain_classic.chains.retrieval import create_retrieval_chain
-from langchain_classic.chains.combine_documents.stuff import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from typing import Dict, Any
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Any, List, Optional
+from code_graph import CodeGraph
+from latency_budget import EMBED_SHARE, FAST_RETRIEVAL_SHARE, GENERATION_SHARE, MIN_DEGRADED_K, LatencyBudget
+from model_router import FAST, STRONG, RouteStats, classify
+from multi_query import reciprocal_rank_fusion, split_question
+from prompt_compression import compress_documents
+from session_memory import SessionMemory
+from telemetry import QueryTelemetry, Telemetry, UsageCollector, estimate_tokens
 from config import LLMConfig
 from llm_factory import LLMFactory
+import os
+import time
+import queue
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -12,60 +25,423 @@ class RAGChain:
     """
     RAG (Retrieval-Augmented Generation) chain for code assistance.
     Combines retrieved code context with LLM to provide accurate, context-aware answers.
+    A query runs in explicit steps: retrieve chunks, expand them with the definitions they
+    call (looked up in the code graph, no extra searches), then generate the answer.
+    The static prompt prefix is prefilled in the background once the chain is built, and
+    each question's retrieval (query embedding + search) runs while that prefill finishes.
+    With a session started, follow-up questions reuse or extend the previous context.
+    With a latency budget, each question degrades in stages to finish in time: lexical
+    search when the query embedding is slow, similarity search with a smaller k when
+    retrieval ran late, a token cap when little time is left for generation, and a
+    streamed answer that stops at the deadline (or on Ctrl-C).
+    With a fast model configured, each question is routed after retrieval: lookups of a
+    retrieved symbol go to the fast model, everything else to the main (strong) one.
+    With prompt compression, context chunks lose comments and long docstrings (and
+    bodies of functions unrelated to the question) before generation, behind "# L<n>"
+    line markers so citations stay exact.
+    Every answered question is measured (retrieval time, TTFT, prompt and answer tokens,
+    decode speed, cache hits) into self.telemetry.
     """
     
-    def __init__(self, retriever, repo_map: str = "", config: LLMConfig = None):
+    EXPANSION_CHARS = 1500
+    
+    def __init__(self, retriever, repo_map: str = "", config: LLMConfig = None,
+                 graph: CodeGraph = None, max_expansions: int = 4, multi_query: bool = False,
+                 latency_budget: float = 0.0, degraded_max_tokens: int = 256,
+                 compress_prompt: bool = True, telemetry_log: str = None):
         self.retriever = retriever
         self.repo_map = repo_map
         self.config = config or LLMConfig()
+        self.graph = graph
+        self.max_expansions = max_expansions
+        self.multi_query = multi_query
+        self.latency_budget = latency_budget
+        self.degraded_max_tokens = degraded_max_tokens
+        self.compress_prompt = compress_prompt
+        self.llm = None
+        self.fast_llm = None
+        self.prompt = None
         self.chain = None
+        self.fast_chain = None
+        self.route_stats = RouteStats()
+        self.telemetry = Telemetry(telemetry_log)
+        self.last_telemetry: Optional[QueryTelemetry] = None
+        self.last_route = None
+        self.memory: Optional[SessionMemory] = None
+        self.last_retrieval_mode = None
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag")
+        # Separate pool so a query embedding never waits behind the prefill
+        self._embedder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-embed")
         self._build_chain()
+        self._prefill = self._executor.submit(self._warm_up)
         
     def _build_chain(self) -> None:
         """Build the RAG chain with appropriate prompts."""
-        llm = LLMFactory.create_llm(self.config)
+        self.llm = LLMFactory.create_llm(self.config)
         
         repo_map_section = ""
         if self.repo_map:
             repo_map_section = f"\n\nREPOSITORY MAP:\n{self.repo_map}\n"
         
-        prompt = ChatPromptTemplate.from_template(f"""You are a Senior Software Engineer assisting with a codebase.
+        self.prompt = ChatPromptTemplate.from_template(f"""You are a Senior Software Engineer assisting with a codebase.
 Use the following pieces of retrieved context to answer the question.
 If the context doesn't contain the answer, say "I don't have enough context."{repo_map_section}
 
 CONTEXT FROM REPOSITORY:
 {{context}}
 
-USER QUESTION:
+{{history}}USER QUESTION:
 {{input}}
 
 Instructions:
 - Answer specifically using the class names, function names, and variable names found in the context
-- Reference file paths when relevant
+- Reference file paths when relevant; a "# L<n>" line inside a chunk means the next line is line n of that file
 - If the repository map shows relevant files not in the context, mention them
 - Provide code examples when appropriate
 - Be precise and technical
 
 Answer:""")
         
-        combine_docs_chain = create_stuff_documents_chain(llm, prompt)
-        self.chain = create_retrieval_chain(self.retriever, combine_docs_chain)
+        self.chain = self.prompt | self.llm | StrOutputParser()
+        if self.config.fast_model_name:
+            self.fast_llm = LLMFactory.create_llm(replace(self.config, model_name=self.config.fast_model_name))
+            self.fast_chain = self.prompt | self.fast_llm | StrOutputParser()
+        
+    def _warm_up(self) -> None:
+        """Load the model and prefill the instructions + repository map part of the prompt."""
+        try:
+            prompt = self.prompt.format(context="", history="", input="")
+            marker = "CONTEXT FROM REPOSITORY:"
+            for llm in filter(None, (self.llm, self.fast_llm)):
+                LLMFactory.warm_up_llm(llm, prompt[:prompt.index(marker) + len(marker)])
+        except Exception as e:
+            logger.debug(f"Prompt prefill failed: {e}")
+    
+    def retrieve(self, question: str, budget: LatencyBudget = None) -> List[Document]:
+        """
+        Retrieve the chunks most relevant to the question. With multi-query enabled, a
+        compound question is split into sub-queries that are searched concurrently and
+        fused by reciprocal rank, so each part of the question gets its own hits.
+        With a limited budget, retrieval degrades when the query embedding is slow.
+        """
+        if budget is not None and budget.limited and hasattr(self.retriever, "lexical_search"):
+            query_vector = self._embed(question, budget)
+            if query_vector is None:
+                return self._lexical_fallback(question, budget)
+            if budget.past(FAST_RETRIEVAL_SHARE):
+                k = max(MIN_DEGRADED_K, self.retriever.k // 2)
+                budget.degrade("no_mmr", "query embedding was slow")
+                budget.degrade("reduced_k", f"k={k}")
+                return self.retriever.search_vector(question, query_vector, k=k, search_type="similarity")
+            # On time: the normal path below finds the embedding cached
+        if not self.multi_query or not hasattr(self.retriever, "search_many"):
+            return self.retriever.invoke(question)
+        queries = split_question(question)
+        if len(queries) == 1:
+            return self.retriever.invoke(question)
+        fused = reciprocal_rank_fusion(self.retriever.search_many(queries))
+        logger.info(f"Multi-query retrieval: {len(queries)} sub-queries, {len(fused)} distinct chunks")
+        return fused[:self.retriever.k]
+    
+    def _embed(self, question: str, budget: LatencyBudget = None):
+        """Query embedding, or None if it isn't ready within the budget's embedding share."""
+        if budget is None or not budget.limited:
+            return self.retriever.embed_query(question)
+        future = self._embedder.submit(self.retriever.embed_query, question)
+        try:
+            return future.result(timeout=budget.until(EMBED_SHARE))
+        except TimeoutError:
+            # Left running: the vector lands in the embedding cache for later questions
+            return None
+    
+    def _lexical_fallback(self, question: str, budget: LatencyBudget) -> List[Document]:
+        budget.degrade("lexical", "query embedding didn't finish in time")
+        return self.retriever.lexical_search(question)
+    
+    def expand(self, documents: List[Document]) -> List[Document]:
+        """
+        Append the definitions directly called from the retrieved chunks, best chunks first,
+        so helpers defined in other files are in context without another retrieval round.
+        
+        Args:
+            documents: Retrieved chunks (chunks without line metadata are not expanded)
+            
+        Returns:
+            The documents followed by at most max_expansions referenced definitions
+        """
+        if self.graph is None or not self.max_expansions:
+            return documents
+        
+        in_context = {}
+        for doc in documents:
+            if doc.metadata.get("start_line"):
+                path = os.path.relpath(doc.metadata["source"], self.graph.repo_path)
+                in_context.setdefault(path, []).append((doc.metadata["start_line"], doc.metadata["end_line"]))
+        
+        expansions = []
+        for doc in documents:
+            if not doc.metadata.get("start_line"):
+                continue
+            path = os.path.relpath(doc.metadata["source"], self.graph.repo_path)
+            for definition in self.graph.referenced_definitions(path, doc.metadata["start_line"], doc.metadata["end_line"]):
+                def_path, qualname, start, end = definition
+                if any(s <= start and end <= e for s, e in in_context.get(def_path, ())):
+                    continue
+                text = self.graph.definition_text(definition)
+                if not text:
+                    continue
+                if len(text) > self.EXPANSION_CHARS:
+                    text = text[:self.EXPANSION_CHARS] + "\n..."
+                expansions.append(Document(page_content=text, metadata={
+                    "source": os.path.join(self.graph.repo_path, def_path),
+                    "symbol": qualname,
+                    "start_line": start,
+                    "end_line": end,
+                    "expanded_from": doc.metadata.get("symbol") or path,
+                }))
+                in_context.setdefault(def_path, []).append((start, end))
+                if len(expansions) >= self.max_expansions:
+                    break
+            if len(expansions) >= self.max_expansions:
+                break
+        
+        if expansions:
+            logger.info(f"Expanded context with {len(expansions)} referenced definitions")
+        return documents + expansions
+    
+    @staticmethod
+    def format_context(documents: List[Document]) -> str:
+        """Join chunks for the prompt, each under a "# path:start-end" header for citations."""
+        sections = []
+        for doc in documents:
+            header = doc.metadata.get("source", "unknown")
+            if doc.metadata.get("start_line"):
+                header += f":{doc.metadata['start_line']}-{doc.metadata['end_line']}"
+            if doc.metadata.get("expanded_from"):
+                header += f" (called from {doc.metadata['expanded_from']})"
+            sections.append(f"# {header}\n{doc.page_content}")
+        return "\n\n".join(sections)
+    
+    def generate(self, question: str, documents: List[Document], history: str = "",
+                 budget: LatencyBudget = None, on_token: Callable[[str], None] = None,
+                 route: str = STRONG, telemetry: QueryTelemetry = None) -> str:
+        """
+        Answer the question from the given context documents (and conversation so far).
+        
+        Args:
+            question: User's question
+            documents: Context documents
+            history: Conversation so far
+            budget: Latency budget; the answer is capped and stopped at its deadline
+            on_token: Called with each piece of the answer as it streams in
+            route: FAST for the fast model (if configured), STRONG for the main one
+            telemetry: Filled in with token counts and generation timings (the answer
+                is then always streamed, to see its first token)
+            
+        Returns:
+            The answer (partial if stopped at the deadline or by Ctrl-C)
+        """
+        context = self.format_context(documents)
+        if self.compress_prompt:
+            compressed = self.format_context(compress_documents(documents, question))
+            logger.info(f"Compressed context from {len(context)} to {len(compressed)} chars "
+                        f"({1 - len(compressed) / max(len(context), 1):.0%} smaller)")
+            context = compressed
+        inputs = {
+            "context": context,
+            "history": f"CONVERSATION SO FAR:\n{history}\n\n" if history else "",
+            "input": question,
+        }
+        llm, chain = (self.fast_llm, self.fast_chain) if route == FAST and self.fast_chain else (self.llm, self.chain)
+        if on_token is None and telemetry is None and (budget is None or not budget.limited):
+            return chain.invoke(inputs)
+        
+        if budget is not None and (budget.degradations or budget.past(1 - GENERATION_SHARE)):
+            budget.degrade("max_tokens", f"answer capped at {self.degraded_max_tokens} tokens")
+            llm = LLMFactory.limit_tokens(llm, self.degraded_max_tokens)
+            chain = self.prompt | llm | StrOutputParser()
+        if telemetry is not None:
+            telemetry.context_tokens = estimate_tokens(inputs["context"])
+            telemetry.history_tokens = estimate_tokens(inputs["history"])
+            telemetry.repo_map_tokens = estimate_tokens(self.repo_map)
+            telemetry.prompt_tokens = estimate_tokens(self.prompt.format(**inputs))
+        return self._stream(chain, inputs, budget or LatencyBudget(), on_token, telemetry)
+    
+    @staticmethod
+    def _stream(chain, inputs: dict, budget: LatencyBudget, on_token: Callable[[str], None] = None,
+                telemetry: QueryTelemetry = None) -> str:
+        """
+        Stream the answer on a worker thread so the deadline and Ctrl-C are honored even
+        while no tokens arrive. Stopping closes the stream, which ends the request.
+        Token usage comes from the provider when it reports it; otherwise the prompt
+        estimate already in telemetry stays and the answer is estimated the same way.
+        """
+        parts: queue.Queue = queue.Queue()
+        cancel = threading.Event()
+        usage = UsageCollector()
+        
+        def produce():
+            stream = chain.stream(inputs, config={"callbacks": [usage]})
+            try:
+                for part in stream:
+                    if cancel.is_set():
+                        break
+                    parts.put(part)
+            except Exception as e:
+                parts.put(e)
+            finally:
+                stream.close()
+            parts.put(None)
         
-    def query(self, question: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        first_token = None
+        threading.Thread(target=produce, name="rag-generate", daemon=True).start()
+        answer = []
+        try:
+            while True:
+                part = parts.get(timeout=budget.remaining())
+                if part is None:
+                    break
+                if isinstance(part, Exception):
+                    raise part
+                if first_token is None and part:
+                    first_token = time.perf_counter()
+                answer.append(part)
+                if on_token is not None:
+                    on_token(part)
+        except queue.Empty:
+            budget.degrade("deadline", "answer stopped at the deadline")
+        except KeyboardInterrupt:
+            budget.degrade("cancelled", "answer interrupted")
+        finally:
+            cancel.set()
+        
+        answer = "".join(answer)
+        if telemetry is not None:
+            finished = time.perf_counter()
+            telemetry.generation_ms = (finished - started) * 1000
+            if first_token is not None:
+                telemetry.ttft_ms = (first_token - budget.start) * 1000
+            if usage.reported:
+                telemetry.prompt_tokens, telemetry.completion_tokens = usage.input_tokens, usage.output_tokens
+                if first_token is not None and finished > first_token and usage.output_tokens > 1:
+                    # The first token's time is prefill; decode speed counts the rest
+                    telemetry.tokens_per_s = (usage.output_tokens - 1) / (finished - first_token)
+            else:
+                telemetry.tokens_estimated = True
+                telemetry.completion_tokens = estimate_tokens(answer)
+        return answer
+    
+    def start_session(self, max_turns: int = 4, reuse_threshold: float = 0.9,
+                      extend_threshold: float = 0.7) -> None:
+        """Keep conversation state between questions (interactive mode)."""
+        embed = getattr(self.retriever, "embed_query", None)
+        if embed is None:
+            logger.warning("Retriever can't embed queries; follow-up detection is off")
+        self.memory = SessionMemory(max_turns, reuse_threshold, extend_threshold)
+    
+    def reset_session(self) -> None:
+        """Forget previous turns; the next question is retrieved from scratch."""
+        if self.memory is not None:
+            self.memory.reset()
+    
+    def _session_context(self, question: str, budget: LatencyBudget = None):
+        """Context for a question given the session: (documents, query vector, mode)."""
+        query_vector = self._embed(question, budget)
+        if query_vector is None:
+            # No vector to compare with the previous turn either
+            return self._lexical_fallback(question, budget), None, "new"
+        mode = self.memory.classify(question, query_vector)
+        last = self.memory.last
+        if mode == "reuse":
+            return last.documents, query_vector, mode
+        if mode == "new":
+            return self.expand(self.retrieve(question, budget)), query_vector, mode
+        
+        # Extend: search for the question in the light of the previous one, add what's new
+        seen = {(doc.metadata.get("source"), doc.metadata.get("start_line"), doc.page_content[:200])
+                for doc in last.documents}
+        fresh = [doc for doc in self.expand(self.retrieve(f"{last.question}\n{question}", budget))
+                 if (doc.metadata.get("source"), doc.metadata.get("start_line"), doc.page_content[:200]) not in seen]
+        k = getattr(self.retriever, "k", 8)
+        fresh = fresh[:max(2, k // 2)]
+        # Chained follow-ups would otherwise pile up every earlier turn's chunks; the
+        # oldest carried chunks make room so the context stays at k
+        carried = last.documents[len(last.documents) - max(k - len(fresh), 0):]
+        return carried + fresh, query_vector, mode
+        
+    def query(self, question: str, on_token: Callable[[str], None] = None) -> Dict[str, Any]:
         """
         Query the codebase with a question.
         
         Args:
             question: User's question about the codebase
+            on_token: Stream the answer to this callback (Ctrl-C then stops the answer
+                instead of raising)
             
         Returns:
-            Dictionary containing answer and source documents
+            Dictionary containing answer and source documents, the retrieval mode, the
+            degradations applied to stay within the latency budget (if any), the
+            model route and the question's telemetry
         """
         if not self.chain:
             raise ValueError("RAG chain not initialized")
             
-        response = self.chain.invoke({"input": question})
-        return response
+        budget = LatencyBudget(self.latency_budget)
+        telemetry = QueryTelemetry(question=question)
+        counts_before = self._cache_counts()
+        use_memory = self.memory is not None and hasattr(self.retriever, "embed_query")
+        if use_memory:
+            retrieval = self._executor.submit(self._timed, self._session_context, question, budget)
+        else:
+            retrieval = self._executor.submit(self._timed, lambda: (self.expand(self.retrieve(question, budget)), None, "new"))
+        if self._prefill is not None:
+            try:
+                self._prefill.result(timeout=budget.remaining())
+                self._prefill = None
+            except TimeoutError:
+                pass
+        (documents, query_vector, self.last_retrieval_mode), telemetry.retrieval_ms = retrieval.result()
+        # A shard selector ("@billing ...") only steers retrieval
+        if hasattr(self.retriever, "strip_selector"):
+            question = self.retriever.strip_selector(question)
+        
+        route = STRONG
+        if self.fast_chain is not None:
+            route, reason = classify(question, documents)
+            logger.info(f"Routed to the {route} model: {reason}")
+        self.last_route = route
+        answer = self.generate(question, documents, self.memory.history() if use_memory else "",
+                               budget=budget, on_token=on_token, route=route, telemetry=telemetry)
+        self.route_stats.record(route, budget.elapsed())
+        if use_memory and query_vector is not None:
+            self.memory.add(question, answer, query_vector, documents)
+        
+        telemetry.total_ms = budget.elapsed() * 1000
+        telemetry.route, telemetry.retrieval_mode, telemetry.chunks = route, self.last_retrieval_mode, len(documents)
+        embedding_hits, embedding_misses, result_hits, result_misses = (
+            after - before for after, before in zip(self._cache_counts(), counts_before))
+        telemetry.embedding_cached = embedding_hits > 0 and not embedding_misses
+        telemetry.results_cached = result_hits > 0 and not result_misses
+        telemetry.degradations = list(budget.degradations)
+        self.telemetry.record(telemetry)
+        self.last_telemetry = telemetry
+        return {"input": question, "context": documents, "answer": answer,
+                "retrieval": self.last_retrieval_mode, "degradations": budget.degradations, "route": route,
+                "telemetry": telemetry}
+    
+    @staticmethod
+    def _timed(fn, *args):
+        """fn(*args) and its duration in ms."""
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, (time.perf_counter() - start) * 1000
+    
+    def _cache_counts(self):
+        """Query-embedding hits and misses, then search-result hits and misses, of the retriever so far."""
+        if hasattr(self.retriever, "cache_counts"):
+            return self.retriever.cache_counts()
+        return 0, 0, 0, 0
     
     def ask(self, question: str) -> str:
         """
@@ -1,7 +1,10 @@
 import os
 import ast
+import json
+import threading
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
+from code_graph import CodeGraph, extract_python_graph, module_name
 
 
 class RepoMapper:
@@ -9,11 +12,177 @@ class RepoMapper:
     Creates a compressed tree structure of the entire codebase.
     This gives the LLM a global view of file structure and class definitions.
     Essential for large codebases (100k+ lines).
+    Per-file definitions are cached by (size, mtime) so unchanged files are not re-parsed.
+    Mapping also yields the import/call graph (self.graph), assembled from the cached per-file data.
+    The cache is guarded by a lock, so the map can be built while indexing updates it.
     """
     
-    def __init__(self, repo_path: str):
+    SUMMARY_CHARS = 2000
+    
+    def __init__(self, repo_path: str, cache_path: str = None):
         self.repo_path = repo_path
         self.tree_structure = {}
+        self.cache_path = cache_path
+        self.cache: Dict[str, dict] = self._load_cache()
+        self._cache_dirty = False
+        self._lock = threading.RLock()
+        self.graph: Optional[CodeGraph] = None
+        
+    def _load_cache(self) -> Dict[str, dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+            
+    def save_cache(self) -> None:
+        """Persist the definitions cache if anything changed."""
+        with self._lock:
+            if not self.cache_path or not self._cache_dirty:
+                return
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f)
+            os.replace(tmp_path, self.cache_path)
+            self._cache_dirty = False
+        
+    def invalidate(self, paths: List[str]) -> None:
+        """
+        Drop cached definitions for repo-relative paths known to have changed.
+        
+        Args:
+            paths: Paths relative to the repository root
+        """
+        with self._lock:
+            for path in paths:
+                if self.cache.pop(path, None) is not None:
+                    self._cache_dirty = True
+                
+    def restamp(self, paths: List[str]) -> None:
+        """
+        Take the current mtime of files known to be unchanged (same content, e.g. a fresh
+        checkout of the commit an imported cache was built at), so their entries stay valid.
+        
+        Args:
+            paths: Paths relative to the repository root
+        """
+        with self._lock:
+            for path in paths:
+                entry = self.cache.get(path)
+                try:
+                    stat = os.stat(os.path.join(self.repo_path, path))
+                except OSError:
+                    continue
+                if entry and entry["size"] == stat.st_size and entry["mtime_ns"] != stat.st_mtime_ns:
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                    self._cache_dirty = True
+                
+    def _entry(self, file_path: str) -> dict:
+        """Cache entry of a file, emptied when its size or mtime changed."""
+        path = os.path.relpath(file_path, self.repo_path)
+        stat = os.stat(file_path)
+        entry = self.cache.get(path)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self.cache[path] = entry
+        return entry
+        
+    def definitions_for(self, file_path: str) -> List[str]:
+        """
+        Definitions of a Python file, served from the cache while the file is unchanged.
+        
+        Args:
+            file_path: Path to Python file
+            
+        Returns:
+            List of definition strings
+        """
+        with self._lock:
+            entry = self._entry(file_path)
+            if "definitions" not in entry:
+                entry["definitions"] = self.extract_python_definitions(file_path)
+                self._cache_dirty = True
+            return entry["definitions"]
+        
+    def graph_for(self, file_path: str) -> Optional[dict]:
+        """Definitions, imports and calls of a Python file (None if it doesn't parse), cached."""
+        with self._lock:
+            entry = self._entry(file_path)
+            if "graph" not in entry:
+                path = os.path.relpath(file_path, self.repo_path)
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        entry["graph"] = extract_python_graph(
+                            f.read(), module_name(path), is_package=os.path.basename(path) == "__init__.py"
+                        )
+                except (SyntaxError, ValueError, OSError):
+                    entry["graph"] = None
+                self._cache_dirty = True
+            return entry["graph"]
+        
+    def summary_for(self, file_path: str) -> str:
+        """
+        Short text describing a file, embedded as its vector in the file-level index:
+        the path, docstrings and definition signatures for Python, the path and leading
+        lines for other languages. Cached like the definitions.
+        
+        Args:
+            file_path: Path to a source file
+            
+        Returns:
+            Summary text of at most SUMMARY_CHARS characters
+        """
+        with self._lock:
+            entry = self._entry(file_path)
+            if "summary" not in entry:
+                if file_path.endswith('.py'):
+                    summary = self.extract_python_summary(file_path)
+                else:
+                    summary = self.extract_header_summary(file_path)
+                entry["summary"] = summary[:self.SUMMARY_CHARS]
+                self._cache_dirty = True
+            return entry["summary"]
+        
+    def extract_python_summary(self, file_path: str) -> str:
+        """Path, module docstring, and each class/function signature with its docstring's first line."""
+        lines = [os.path.relpath(file_path, self.repo_path)]
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+        except Exception:
+            return lines[0]
+            
+        def describe(node, indent: str) -> None:
+            for child in node.body:
+                if isinstance(child, ast.ClassDef):
+                    signature = f"{indent}class {child.name}"
+                elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    signature = f"{indent}def {child.name}({', '.join(arg.arg for arg in child.args.args)})"
+                else:
+                    continue
+                doc = ast.get_docstring(child)
+                lines.append(f"{signature}: {doc.strip().splitlines()[0]}" if doc else signature)
+                if isinstance(child, ast.ClassDef):
+                    describe(child, indent + "  ")
+                    
+        doc = ast.get_docstring(tree)
+        if doc:
+            lines.append(doc.strip().split("\n\n")[0])
+        describe(tree, "")
+        return "\n".join(lines)
+        
+    def extract_header_summary(self, file_path: str) -> str:
+        """Path plus the file's first lines (usually imports and a header comment)."""
+        path = os.path.relpath(file_path, self.repo_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                head = f.read(self.SUMMARY_CHARS)
+        except OSError:
+            return path
+        return f"{path}\n{head}"
         
     def extract_python_definitions(self, file_path: str) -> List[str]:
         """
@@ -57,6 +226,8 @@ class RepoMapper:
             extensions = {'.py'}
             
         tree_lines = []
+        seen = set()
+        graph_files = {}
         
         for root, dirs, files in os.walk(self.repo_path):
             dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
@@ -80,12 +251,22 @@ class RepoMapper:
                 tree_lines.append(f"{sub_indent}{file}:")
                 
                 file_path = os.path.join(root, file)
+                seen.add(os.path.relpath(file_path, self.repo_path))
                 
                 if file_ext == '.py':
-                    definitions = self.extract_python_definitions(file_path)
+                    graph = self.graph_for(file_path)
+                    if graph is not None:
+                        graph_files[os.path.relpath(file_path, self.repo_path)] = graph
+                    definitions = self.definitions_for(file_path)
                     for definition in definitions:
                         tree_lines.append(f"{sub_indent}  {definition}")
         
+        with self._lock:
+            self.invalidate([path for path in self.cache if path not in seen])
+        self.save_cache()
+        
+        self.graph = CodeGraph(repo_path=self.repo_path, files=graph_files)
+        
         return '\n'.join(tree_lines)
     
     def get_compact_map(self, extensions: Set[str] = None, max_lines: int = 100) -> str:
@@ -0,0 +1,79 @@
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from typing import Any, List, Tuple
+
+
+class CodeRetriever(BaseRetriever):
+    """
+    Retriever that delegates to VectorStore.search, so the store's own search paths
+    (side indexes, rescoring, vectorized MMR) plug into RAG chains.
+    """
+
+    store: Any
+    k: int = 8
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.store.search(query, k=self.k)
+
+    def embed_query(self, query: str) -> List[float]:
+        """Query embedding as used for search (cached by the store)."""
+        return self.store.embed_query(query)
+
+    def search_many(self, queries: List[str]) -> List[List[Document]]:
+        """Rankings for several sub-queries, embedded in one batch and searched concurrently."""
+        return self.store.search_many(queries, k=self.k)
+
+    def search_vector(self, query: str, query_vector, k: int = None, search_type: str = None) -> List[Document]:
+        """Search with the query's embedding from embed_query(), optionally with a smaller k or plain similarity."""
+        return [doc for doc, _ in self.store.search_by_vector(query_vector, k or self.k, search_type)]
+
+    def lexical_search(self, query: str, k: int = None) -> List[Document]:
+        """Keyword search that needs no query embedding."""
+        return [doc for doc, _ in self.store.lexical_search(query, k or self.k)]
+
+    def cache_counts(self) -> Tuple[int, int, int, int]:
+        """Hits and misses of the store's query-embedding cache, then of its result cache."""
+        embeddings, results = self.store.embedding_cache, self.store.result_cache
+        return embeddings.hits, embeddings.misses, results.hits, results.misses
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Retriever over a ShardedIndex. A leading "@name" in the question restricts
+    the search to those shards; otherwise every shard is searched.
+    """
+
+    index: Any
+    k: int = 8
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        shards, query = self.index.parse_shard_prefix(query)
+        return [doc for doc, _ in self.index.search(query, k=self.k, shards=shards)]
+
+    def strip_selector(self, query: str) -> str:
+        """The question without its "@name" shard selector, as the model should see it."""
+        return self.index.parse_shard_prefix(query)[1]
+
+    def embed_query(self, query: str) -> List[float]:
+        _, query = self.index.parse_shard_prefix(query)
+        return self.index.embed_query(query)
+
+    def search_many(self, queries: List[str]) -> List[List[Document]]:
+        shards, first = self.index.parse_shard_prefix(queries[0])
+        queries = [first] + [self.index.parse_shard_prefix(q)[1] for q in queries[1:]]
+        return [[doc for doc, _ in ranking] for ranking in self.index.search_many(queries, k=self.k, shards=shards)]
+
+    def search_vector(self, query: str, query_vector, k: int = None, search_type: str = None) -> List[Document]:
+        shards, _ = self.index.parse_shard_prefix(query)
+        return [doc for doc, _ in self.index.search_by_vector(query_vector, k or self.k, shards, search_type=search_type)]
+
+    def lexical_search(self, query: str, k: int = None) -> List[Document]:
+        shards, query = self.index.parse_shard_prefix(query)
+        return [doc for doc, _ in self.index.lexical_search(query, k or self.k, shards)]
+
+    def cache_counts(self) -> Tuple[int, int, int, int]:
+        """Cache hits and misses summed over the shards' stores (see CodeRetriever.cache_counts)."""
+        stores = [shard.vector_store for shard in self.index.shards.values()]
+        return (sum(store.embedding_cache.hits for store in stores), sum(store.embedding_cache.misses for store in stores),
+                sum(store.result_cache.hits for store in stores), sum(store.result_cache.misses for store in stores))
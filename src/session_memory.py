@@ -0,0 +1,99 @@
+import re
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_UP_START = re.compile(r"^\s*(and|also|then|so|but|what about|how about|same for|why)\b", re.IGNORECASE)
+REFERRING_WORDS = {"it", "its", "that", "this", "these", "those", "they", "them", "there", "above", "previous"}
+FOLLOW_UP_MAX_WORDS = 12
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    query_vector: np.ndarray
+    documents: List[Document]
+
+
+class SessionMemory:
+    """
+    Bounded memory of an interactive session: the last few turns with their query
+    embeddings and retrieved context, plus a compressed one-line-per-turn summary of
+    older turns. Follow-ups close to the previous query reuse its context outright;
+    looser follow-ups ("and where is that called?") extend it with a search for the
+    combined question instead of starting from scratch.
+    """
+
+    def __init__(self, max_turns: int = 4, reuse_threshold: float = 0.9,
+                 extend_threshold: float = 0.7, summary_chars: int = 1200):
+        self.turns: deque = deque(maxlen=max(1, max_turns))
+        self.reuse_threshold = reuse_threshold
+        self.extend_threshold = extend_threshold
+        self.summary_chars = summary_chars
+        self.summary: List[str] = []
+
+    def reset(self) -> None:
+        self.turns.clear()
+        self.summary.clear()
+
+    @property
+    def last(self) -> Optional[Turn]:
+        return self.turns[-1] if self.turns else None
+
+    @staticmethod
+    def _looks_like_follow_up(question: str) -> bool:
+        words = re.findall(r"[a-z']+", question.lower())
+        if len(words) > FOLLOW_UP_MAX_WORDS:
+            return False
+        return bool(FOLLOW_UP_START.match(question)) or any(word in REFERRING_WORDS for word in words)
+
+    def classify(self, question: str, query_vector) -> str:
+        """
+        Decide how to get context for a question.
+
+        Returns:
+            "reuse" (previous context as is), "extend" (previous context plus a search
+            for the combined question) or "new" (independent retrieval)
+        """
+        last = self.last
+        if last is None:
+            return "new"
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(query) * np.linalg.norm(last.query_vector)
+        similarity = float(query @ last.query_vector / norms) if norms else 0.0
+        if similarity >= self.reuse_threshold:
+            mode = "reuse"
+        elif similarity >= self.extend_threshold or self._looks_like_follow_up(question):
+            mode = "extend"
+        else:
+            return "new"
+        logger.info(f"Follow-up question ({mode} previous context, similarity {similarity:.2f})")
+        return mode
+
+    def add(self, question: str, answer: str, query_vector, documents: List[Document]) -> None:
+        """Record a finished turn, compressing the oldest one into the summary when full."""
+        if len(self.turns) == self.turns.maxlen:
+            self._compress(self.turns[0])
+        self.turns.append(Turn(question, answer, np.asarray(query_vector, dtype=np.float32), documents))
+
+    def _compress(self, turn: Turn) -> None:
+        first_sentence = re.split(r"(?<=[.!?])\s", turn.answer.strip(), maxsplit=1)[0]
+        self.summary.append(f"- {turn.question[:120]} -> {first_sentence[:160]}")
+        while self.summary and sum(len(line) + 1 for line in self.summary) > self.summary_chars:
+            self.summary.pop(0)
+
+    def history(self, answer_chars: int = 400) -> str:
+        """Conversation so far for the prompt: the summary, then the recent turns (answers truncated)."""
+        if not self.turns:
+            return ""
+        lines = ["Earlier:"] + self.summary if self.summary else []
+        for turn in self.turns:
+            answer = turn.answer if len(turn.answer) <= answer_chars else turn.answer[:answer_chars] + "..."
+            lines.append(f"Q: {turn.question}\nA: {answer}")
+        return "\n".join(lines)
@@ -0,0 +1,355 @@
+import ast
+import importlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_CHUNKING = ("structural", "recursive")
+
+# Whole definitions are kept up to this multiple of chunk_size before being split
+MAX_DEFINITION_FACTOR = 2
+
+TREE_SITTER_GRAMMARS = {
+    Language.JS: "javascript",
+    Language.TS: "typescript",
+    Language.JAVA: "java",
+    Language.CPP: "cpp",
+    Language.GO: "go",
+    Language.RUST: "rust",
+}
+
+# Node types treated as definitions, per grammar; "class" definitions are split into members
+TREE_SITTER_DEFINITIONS = {
+    "javascript": {
+        "function_declaration": "function", "generator_function_declaration": "function",
+        "method_definition": "function", "class_declaration": "class",
+    },
+    "typescript": {
+        "function_declaration": "function", "generator_function_declaration": "function",
+        "method_definition": "function", "class_declaration": "class",
+        "abstract_class_declaration": "class", "interface_declaration": "class",
+        "enum_declaration": "class", "type_alias_declaration": "function",
+    },
+    "java": {
+        "method_declaration": "function", "constructor_declaration": "function",
+        "class_declaration": "class", "interface_declaration": "class",
+        "enum_declaration": "class", "record_declaration": "class",
+    },
+    "cpp": {
+        "function_definition": "function", "class_specifier": "class",
+        "struct_specifier": "class", "namespace_definition": "class",
+    },
+    "go": {
+        "function_declaration": "function", "method_declaration": "function",
+        "type_declaration": "function",
+    },
+    "rust": {
+        "function_item": "function", "struct_item": "function", "enum_item": "function",
+        "impl_item": "class", "trait_item": "class", "mod_item": "class",
+    },
+}
+
+# Wrappers whose inner declaration carries the name (e.g. `export class Foo`)
+TREE_SITTER_WRAPPERS = ("export_statement", "template_declaration")
+
+
+@dataclass
+class _Node:
+    """A top-level statement or definition, by 1-based inclusive line range."""
+    start: int
+    end: int
+    kind: str = "code"  # code, function, class
+    name: str = ""
+    children: List["_Node"] = field(default_factory=list)
+
+
+def _python_nodes(body: List[ast.stmt]) -> List[_Node]:
+    nodes = []
+    for stmt in body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([d.lineno for d in stmt.decorator_list] + [stmt.lineno])
+            if isinstance(stmt, ast.ClassDef):
+                nodes.append(_Node(start, stmt.end_lineno, "class", stmt.name, _python_nodes(stmt.body)))
+            else:
+                nodes.append(_Node(start, stmt.end_lineno, "function", stmt.name))
+        else:
+            nodes.append(_Node(stmt.lineno, stmt.end_lineno))
+    return nodes
+
+
+def _node_name(node) -> str:
+    """Best-effort identifier of a tree-sitter definition node."""
+    for field_name in ("name", "type", "declarator"):
+        child = node.child_by_field_name(field_name)
+        depth = 0
+        # C++ declarators nest (pointer -> function -> qualified identifier)
+        while child is not None and child.child_by_field_name("declarator") is not None and depth < 5:
+            child = child.child_by_field_name("declarator")
+            depth += 1
+        if child is not None:
+            return child.text.decode("utf-8", errors="replace")
+    for child in node.named_children:
+        if child.type.endswith("identifier") or child.type == "type_spec":
+            return _node_name(child) if child.type == "type_spec" else child.text.decode("utf-8", errors="replace")
+    return ""
+
+
+def _tree_sitter_nodes(parent, definitions: Dict[str, str]) -> List[_Node]:
+    nodes = []
+    for child in parent.named_children:
+        if child.type == "comment":
+            # Comments belong to whatever follows them
+            continue
+        target = child
+        if child.type in TREE_SITTER_WRAPPERS:
+            inner = child.child_by_field_name("declaration")
+            if inner is None and child.named_children:
+                inner = child.named_children[-1]
+            target = inner or child
+        start, end = child.start_point[0] + 1, child.end_point[0] + 1
+        kind = definitions.get(target.type)
+        if kind is None:
+            nodes.append(_Node(start, end))
+            continue
+        children = []
+        if kind == "class":
+            body = target.child_by_field_name("body")
+            if body is not None:
+                children = _tree_sitter_nodes(body, definitions)
+        nodes.append(_Node(start, end, kind, _node_name(target), children))
+    return nodes
+
+
+class StructuralChunker:
+    """
+    Splits source files along their definitions instead of a fixed character window.
+    Every top-level function and class becomes one chunk; classes too large to embed whole
+    are split into their methods, and only a single oversized function is cut into
+    line-aligned pieces. Module-level code between definitions is grouped into "<module>"
+    chunks; short runs of such code sitting between two definitions join the definition after
+    them, so a constant doesn't cost an embedding call of its own. Python is parsed with
+    `ast`, other languages with tree-sitter when a grammar is installed; files that can't be
+    parsed fall back to the recursive splitter.
+
+    Every chunk carries `symbol` (qualified, e.g. "AuthManager.login"), `kind`, `parent`
+    (enclosing class or ""), and 1-based inclusive `start_line`/`end_line` metadata.
+    """
+
+    def __init__(self, chunk_size: int = 2000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_definition = chunk_size * MAX_DEFINITION_FACTOR
+        self._parsers: Dict[str, object] = {}
+        self._splitters: Dict[Language, RecursiveCharacterTextSplitter] = {}
+
+    def split_document(self, doc: Document) -> List[Document]:
+        """
+        Split one loaded source file into structural chunks.
+
+        Args:
+            doc: Document with "source" and "language" metadata
+
+        Returns:
+            List of chunks with symbol and line-range metadata
+        """
+        text = doc.page_content
+        if not text.strip():
+            return []
+        nodes = self._parse(text, doc.metadata["language"])
+        if nodes is None:
+            return self._fallback(doc)
+
+        lines = text.split("\n")
+        chunks = []
+        spans = self._merge(self._spans(nodes, lines, 1, len(lines), ""), lines)
+        for start, end, symbol, kind, parent in spans:
+            # Report the trimmed range, so leading blank lines don't skew start_line
+            while start < end and not lines[start - 1].strip():
+                start += 1
+            while end > start and not lines[end - 1].strip():
+                end -= 1
+            content = "\n".join(lines[start - 1:end])
+            if not content.strip():
+                continue
+            chunks.append(Document(page_content=content, metadata={
+                **doc.metadata,
+                "symbol": symbol,
+                "kind": kind,
+                "parent": parent,
+                "start_line": start,
+                "end_line": end,
+            }))
+        return chunks
+
+    def _parse(self, text: str, language: Language) -> Optional[List[_Node]]:
+        if language == Language.PYTHON:
+            try:
+                return _python_nodes(ast.parse(text).body)
+            except (SyntaxError, ValueError):
+                return None
+
+        grammar = TREE_SITTER_GRAMMARS.get(language)
+        parser = self._tree_sitter_parser(grammar) if grammar else None
+        if parser is None:
+            return None
+        tree = parser.parse(text.encode("utf-8"))
+        if tree.root_node.has_error:
+            return None
+        return _tree_sitter_nodes(tree.root_node, TREE_SITTER_DEFINITIONS[grammar])
+
+    def _tree_sitter_parser(self, grammar: str):
+        """
+        Parser for a grammar from its tree_sitter_<lang> wheel (bundled, see
+        requirements-optional.txt) or else tree-sitter-language-pack.
+        """
+        if grammar in self._parsers:
+            return self._parsers[grammar]
+        parser = None
+        try:
+            from tree_sitter import Language as TSLanguage, Parser
+            module = importlib.import_module(f"tree_sitter_{grammar}")
+            language = module.language_typescript() if grammar == "typescript" else module.language()
+            parser = Parser(TSLanguage(language))
+        except Exception:
+            try:
+                # Recent releases fetch grammars on first use, so this can fail offline
+                from tree_sitter_language_pack import get_parser
+                parser = get_parser(grammar)
+            except Exception:
+                logger.info(f"No tree-sitter grammar for {grammar}; using the recursive splitter")
+        self._parsers[grammar] = parser
+        return parser
+
+    def _size(self, lines: List[str], start: int, end: int) -> int:
+        return sum(len(line) + 1 for line in lines[start - 1:end])
+
+    def _spans(self, nodes: List[_Node], lines: List[str], first: int, last: int,
+               parent: str) -> List[Tuple[int, int, str, str, str]]:
+        """
+        Assign every line in [first, last] to a span of (start, end, symbol, kind, parent).
+        A definition owns the comments and blank lines before it; runs of plain statements
+        are grouped; trailing lines join the last span.
+        """
+        spans = []
+        cursor = first
+        code_start = None
+
+        def flush_code(end: int) -> None:
+            nonlocal code_start
+            if code_start is not None and end >= code_start:
+                symbol = parent or "<module>"
+                spans.extend(self._pieces(lines, code_start, end, symbol, "module" if not parent else "class", parent))
+            code_start = None
+
+        for node in nodes:
+            if node.kind == "code":
+                if code_start is None:
+                    code_start = cursor
+                cursor = node.end + 1
+                continue
+            flush_code(cursor - 1)
+
+            symbol = f"{parent}.{node.name}" if parent else node.name
+            start, end = cursor, node.end
+            if self._size(lines, start, end) <= self.max_definition:
+                kind = "method" if parent and node.kind == "function" else node.kind
+                spans.append((start, end, symbol, kind, parent))
+            elif node.children:
+                spans.extend(self._spans(node.children, lines, start, end, symbol))
+            else:
+                spans.extend(self._pieces(lines, start, end, symbol, "method" if parent else node.kind, parent))
+            cursor = node.end + 1
+
+        if code_start is not None:
+            flush_code(last)
+        elif cursor <= last:
+            if spans:
+                start, _, symbol, kind, span_parent = spans[-1]
+                spans[-1] = (start, last, symbol, kind, span_parent)
+            else:
+                spans.append((cursor, last, parent or "<module>", "module", parent))
+        return spans
+
+    def _merge(self, spans: List[Tuple[int, int, str, str, str]],
+               lines: List[str]) -> List[Tuple[int, int, str, str, str]]:
+        """
+        Pack small runs of plain statements sitting between two definitions (constants,
+        aliases) into the definition that follows them, while the result fits in chunk_size.
+        Definitions are never packed together, so every chunk keeps a single symbol and the
+        line range of that definition.
+        """
+        def is_code(span):
+            return span[2] == (span[4] or "<module>")
+
+        def fits(start, end):
+            return self._size(lines, start, end) <= self.chunk_size
+
+        merged = []
+        pending = None  # a small code span waiting for the next definition
+        for span in spans:
+            if is_code(span):
+                if pending is not None:
+                    merged.append(pending)
+                pending = span
+                continue
+            if pending is not None:
+                if pending[4] == span[4] and merged and not is_code(merged[-1]) and fits(pending[0], span[1]):
+                    span = (pending[0],) + span[1:]
+                else:
+                    merged.append(pending)
+                pending = None
+            merged.append(span)
+        if pending is not None:
+            merged.append(pending)
+        return merged
+
+    def _pieces(self, lines: List[str], start: int, end: int, symbol: str, kind: str,
+                parent: str) -> List[Tuple[int, int, str, str, str]]:
+        """Cut [start, end] into line-aligned pieces of at most chunk_size, overlapping by chunk_overlap."""
+        if self._size(lines, start, end) <= self.chunk_size:
+            return [(start, end, symbol, kind, parent)]
+        pieces = []
+        piece_start = start
+        while piece_start <= end:
+            piece_end, size = piece_start, len(lines[piece_start - 1]) + 1
+            while piece_end < end and size + len(lines[piece_end]) + 1 <= self.chunk_size:
+                piece_end += 1
+                size += len(lines[piece_end - 1]) + 1
+            pieces.append((piece_start, piece_end, symbol, kind, parent))
+            if piece_end >= end:
+                break
+            # Step back over whole lines to carry chunk_overlap characters into the next piece
+            next_start, overlap = piece_end + 1, 0
+            while next_start - 1 > piece_start and overlap + len(lines[next_start - 2]) + 1 <= self.chunk_overlap:
+                next_start -= 1
+                overlap += len(lines[next_start - 1]) + 1
+            piece_start = next_start
+        return pieces
+
+    def _fallback(self, doc: Document) -> List[Document]:
+        """Recursive character splitting, with line ranges derived from each chunk's offset."""
+        language = doc.metadata["language"]
+        if language not in self._splitters:
+            self._splitters[language] = RecursiveCharacterTextSplitter.from_language(
+                language=language,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                add_start_index=True
+            )
+        chunks = self._splitters[language].split_documents([doc])
+        text = doc.page_content
+        for chunk in chunks:
+            offset = chunk.metadata.pop("start_index", -1)
+            start_line = text.count("\n", 0, offset) + 1 if offset >= 0 else 0
+            chunk.metadata.update({
+                "symbol": "",
+                "kind": "text",
+                "parent": "",
+                "start_line": start_line,
+                "end_line": start_line + chunk.page_content.count("\n") if start_line else 0,
+            })
+        return chunks
@@ -0,0 +1,141 @@
+import json
+import math
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters, for providers that don't report usage
+CHARS_PER_TOKEN = 4
+# Fields summarized by Telemetry.summary(), in display order
+TIMED_FIELDS = ("retrieval_ms", "ttft_ms", "generation_ms", "total_ms",
+                "prompt_tokens", "completion_tokens", "tokens_per_s")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class UsageCollector(BaseCallbackHandler):
+    """Token usage the provider reported for the model calls of one request (Ollama, OpenAI with stream_usage)."""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.reported = False
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(generation.message, "usage_metadata", None) if isinstance(generation, ChatGeneration) else None
+                if usage:
+                    self.input_tokens += usage.get("input_tokens", 0)
+                    self.output_tokens += usage.get("output_tokens", 0)
+                    self.reported = True
+
+
+@dataclass
+class QueryTelemetry:
+    """Measurements of one answered question."""
+    question: str
+    timestamp: float = field(default_factory=time.time)
+    route: Optional[str] = None
+    retrieval_mode: Optional[str] = None
+    chunks: int = 0
+    retrieval_ms: float = 0.0
+    ttft_ms: Optional[float] = None  # question received -> first answer token
+    generation_ms: float = 0.0  # prompt sent -> answer finished
+    total_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False  # provider reported no usage; counts are chars / 4
+    context_tokens: int = 0  # part of the prompt spent on retrieved chunks
+    repo_map_tokens: int = 0
+    history_tokens: int = 0
+    tokens_per_s: Optional[float] = None  # reported completion tokens over the decode time after the first token
+    embedding_cached: bool = False  # query embedding came from the cache (no embedding call)
+    results_cached: bool = False  # search results came from the cache (no search)
+    degradations: List[str] = field(default_factory=list)
+
+    def line(self) -> str:
+        """One-line summary shown after an answer."""
+        parts = [f"retrieval {self.retrieval_ms:.0f} ms ({self.retrieval_mode or 'new'}, {self.chunks} chunks)"]
+        if self.ttft_ms is not None:
+            parts.append(f"TTFT {self.ttft_ms / 1000:.2f}s")
+        approx = "~" if self.tokens_estimated else ""
+        # The breakdown is always an estimate; providers only report the whole prompt
+        parts.append(f"{approx}{self.prompt_tokens} prompt tokens (context ~{self.context_tokens}, "
+                     f"map ~{self.repo_map_tokens}) + {approx}{self.completion_tokens} answer tokens")
+        if self.tokens_per_s:
+            parts.append(f"{self.tokens_per_s:.1f} tok/s")
+        cached = [name for name, hit in (("embedding", self.embedding_cached), ("results", self.results_cached)) if hit]
+        if cached:
+            parts.append(f"cached {' + '.join(cached)}")
+        return " · ".join(parts)
+
+
+class Telemetry:
+    """
+    Rolling window of per-question measurements, with p50 / p95 per stage, optionally
+    appended to a JSONL log (one QueryTelemetry object per line) for later analysis.
+    """
+
+    WINDOW = 1000
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.log_path = log_path
+        self.entries: deque = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, entry: QueryTelemetry) -> None:
+        with self._lock:
+            self.entries.append(entry)
+            if not self.log_path:
+                return
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(asdict(entry)) + "\n")
+            except OSError as e:
+                logger.warning(f"Can't append to telemetry log {self.log_path}: {e}")
+                self.log_path = None
+
+    def summary(self) -> Dict[str, dict]:
+        """Per field in TIMED_FIELDS: p50, p95 and number of questions measured."""
+        with self._lock:
+            entries = list(self.entries)
+        result = {}
+        for name in TIMED_FIELDS:
+            values = np.asarray([getattr(e, name) for e in entries if getattr(e, name) is not None], dtype=np.float64)
+            result[name] = {
+                "n": len(values),
+                "p50": float(np.percentile(values, 50)) if len(values) else None,
+                "p95": float(np.percentile(values, 95)) if len(values) else None,
+            }
+        return result
+
+    def report(self) -> str:
+        with self._lock:
+            entries = list(self.entries)
+        if not entries:
+            return "No questions answered yet"
+        lines = [f"Last {len(entries)} questions:"]
+        for name, stats in self.summary().items():
+            if stats["n"]:
+                lines.append(f"  {name:<18} p50 {stats['p50']:>9.1f}   p95 {stats['p95']:>9.1f}")
+        embedded = sum(e.embedding_cached for e in entries)
+        searched = sum(e.results_cached for e in entries)
+        reused = sum(e.retrieval_mode == "reuse" for e in entries)
+        estimated = sum(e.tokens_estimated for e in entries)
+        lines.append(f"  cached embeddings {embedded / len(entries):.0%}, cached results {searched / len(entries):.0%}, "
+                     f"reused contexts {reused / len(entries):.0%}"
+                     + (f"; token counts estimated for {estimated}" if estimated else ""))
+        if self.log_path:
+            lines.append(f"  logging to {self.log_path}")
+        return "\n".join(lines)
@@ -4,53 +4,137 @@ except ImportError:
     Chroma = None
     
 from langchain_core.documents import Document
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 import os
+import time
+import uuid
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from config import LLMConfig
+import numpy as np
+from config import LLMConfig, RetrievalConfig
 from llm_factory import LLMFactory
+from quantization import QuantizedIndex
+from ann_index import IVFIndex, HNSWIndex, check_ann_support
+from mmr import maximal_marginal_relevance
+from cache import LRUCache
+from file_index import FileSummaryIndex
+from lexical_index import LexicalIndex
+from dedup import DuplicateRegistry, content_hash, location
+from retriever import CodeRetriever
 
 logger = logging.getLogger(__name__)
 
+CHROMA_DB_FILE = "chroma.sqlite3"
+
+
 class VectorStore:
     """
     Manages vector storage using ChromaDB for semantic code search.
     Uses embeddings to enable searching by meaning rather than keywords.
+    Optionally keeps a side index for candidate search: an int8/float16 quantized copy
+    of the vectors, or an approximate nearest-neighbor index (IVF or HNSW) with tunable
+    nprobe / ef. Candidates from a lossy index are rescored at full precision.
+    With dedup on, chunk ids are content hashes: identical chunks are embedded and stored
+    once, and every location is listed in a DuplicateRegistry.
+    With retrieval top_files set, search is two-tier: a FileSummaryIndex picks the best
+    files and only their chunks are scored.
+    With lexical on (a latency budget is set), a BM25 LexicalIndex of the chunk texts is
+    loaded in the background when the store opens and kept in step with every write, so
+    the degraded keyword search never has to build it.
     """
     
-    def __init__(self, persist_directory: str = "./chroma_db", config: LLMConfig = None):
+    PAGE_SIZE = 5000
+
+    def __init__(self, persist_directory: str = "./chroma_db", config: LLMConfig = None,
+                 retrieval_config: RetrievalConfig = None, dedup: bool = True, lexical: bool = False):
         self.persist_directory = persist_directory
         self.config = config or LLMConfig()
+        self.retrieval_config = retrieval_config or RetrievalConfig()
+        check_ann_support(self.retrieval_config.ann)
+        self.dedup = dedup
+        self.duplicates = DuplicateRegistry(persist_directory)
         self.db = None
+        self.embeddings = None
         self.retriever = None
+        self.side_index = None
+        self.file_index = None
+        self.last_timing = {}
+        self.generation = 0
+        self.embedding_cache = LRUCache(self.retrieval_config.cache_size)
+        self.result_cache = LRUCache(self.retrieval_config.cache_size)
+        self.lexical = lexical
+        self.lexical_index: Optional[LexicalIndex] = None
+        self._lexical_loaded = threading.Event()
+        self._lexical_removed: Set[str] = set()  # deletions while the index loads
+        self._lexical_lock = threading.Lock()
         if Chroma is None:
             logger.warning("ChromaDB not installed. Vector storage will not work.")
         
-    def initialize_from_documents(self, documents: List[Document]) -> None:
+    def initialize_from_documents(self, documents: List[Document]) -> List[str]:
         """
         Initialize vector store from code documents.
         
         Args:
             documents: List of Document objects containing code chunks
+            
+        Returns:
+            Chunk ids, in the same order as the documents
         """
         if not documents:
             raise ValueError("Cannot initialize vector store with empty documents")
-            
-        embeddings = LLMFactory.create_embeddings(self.config)
         
-        self.db = Chroma.from_documents(
-            documents,
-            embeddings,
-            persist_directory=self.persist_directory
-        )
+        self.reset()
+        ids = self.add_documents(documents, flush_side_index=False)
+        self.finish_bulk_load()
+        
+        logger.info(f"Vector store initialized with {len(documents)} documents")
+        return ids
+    
+    def reset(self) -> None:
+        """
+        Replace any existing collection with an empty one that batches can be streamed into.
+        The retriever is live immediately, so written batches are searchable mid-build.
+        """
+        self.embeddings = LLMFactory.create_embeddings(self.config)
         
-        self.retriever = self.db.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 8}
+        if os.path.exists(self.persist_directory):
+            # Start from an empty collection instead of appending to the old one
+            Chroma(persist_directory=self.persist_directory).delete_collection()
+        
+        self.db = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+            collection_metadata={"hnsw:space": "cosine"}
         )
+        self.side_index = self._new_side_index()
+        self.duplicates = DuplicateRegistry(self.persist_directory)
+        self.duplicates.clear()
+        self.file_index = FileSummaryIndex(self.persist_directory, self.embeddings)
+        self.file_index.reset()
+        self.retriever = self._make_retriever()
+        self._bump_generation(reindexed=True)
+        if self.lexical:
+            # Nothing stored yet: the index fills up as batches are added
+            self._open_lexical_index(background=False)
+        else:
+            self._drop_lexical_index()
         
-        logger.info(f"Vector store initialized with {len(documents)} documents")
-        logger.info(f"Using MMR (Maximal Marginal Relevance) for diverse retrieval")
+        if self.retrieval_config.search_type == "mmr":
+            logger.info(f"Using MMR (Maximal Marginal Relevance) for diverse retrieval")
+    
+    def finish_bulk_load(self, retrain: bool = True) -> None:
+        """
+        Finalize streamed writes: persist the side index, retraining IVF on the full
+        collection after a full build (incremental updates keep the existing centroids),
+        and the duplicate registry.
+        """
+        self.duplicates.save()
+        if retrain and isinstance(self.side_index, IVFIndex):
+            self._build_side_index()
+        elif self.side_index is not None:
+            self.side_index.save(self.persist_directory)
     
     def load_existing(self) -> bool:
         """
@@ -59,20 +143,31 @@ class VectorStore:
         Returns:
             True if loaded successfully, False otherwise
         """
-        if not os.path.exists(self.persist_directory):
+        # The directory alone isn't enough: the repository map cache may be written
+        # there (concurrently with indexing) before any collection exists
+        if not os.path.exists(os.path.join(self.persist_directory, CHROMA_DB_FILE)):
             return False
             
         try:
-            embeddings = LLMFactory.create_embeddings(self.config)
+            self.embeddings = LLMFactory.create_embeddings(self.config)
             self.db = Chroma(
                 persist_directory=self.persist_directory,
-                embedding_function=embeddings
+                embedding_function=self.embeddings
             )
             
-            self.retriever = self.db.as_retriever(
-                search_type="mmr",
-                search_kwargs={"k": 8}
-            )
+            self.side_index = self._load_side_index()
+            if self.side_index is None:
+                self._build_side_index()
+            self.duplicates = DuplicateRegistry.load(self.persist_directory)
+            self.file_index = FileSummaryIndex(self.persist_directory, self.embeddings)
+            self.file_index.load()
+            
+            self.retriever = self._make_retriever()
+            self._bump_generation(reindexed=True)
+            if self.lexical:
+                self._open_lexical_index(background=True)
+            else:
+                self._drop_lexical_index()
             
             logger.info(f"Loaded existing vector store from {self.persist_directory}")
             return True
@@ -80,43 +175,607 @@ class VectorStore:
             logger.error(f"Error loading existing vector store: {e}")
             return False
     
-    def search(self, query: str, k: int = 8) -> List[Document]:
+    def _make_retriever(self):
+        return CodeRetriever(store=self, k=self.retrieval_config.k)
+    
+    def _iter_embeddings(self) -> Iterator[Tuple[List[str], list]]:
+        """Page through every (ids, embeddings) batch stored in the collection."""
+        offset = 0
+        while True:
+            batch = self.db.get(limit=self.PAGE_SIZE, offset=offset, include=["embeddings"])
+            if not batch["ids"]:
+                break
+            yield batch["ids"], batch["embeddings"]
+            offset += len(batch["ids"])
+    
+    def _new_side_index(self):
+        """Create an empty side index for the configured mode, or None for plain Chroma search."""
+        rc = self.retrieval_config
+        if rc.ann == "ivf":
+            return IVFIndex(rc.quantization or "float32", nlist=rc.ann_nlist, nprobe=rc.ann_nprobe, threads=rc.ann_threads)
+        if rc.ann == "hnsw":
+            if rc.quantization:
+                logger.warning("HNSW mode stores float32 vectors; ignoring quantization setting")
+            return HNSWIndex(ef=rc.ann_ef, threads=rc.ann_threads)
+        if rc.quantization:
+            return QuantizedIndex(rc.quantization)
+        return None
+    
+    def _load_side_index(self):
+        """Load the persisted side index if it matches the configured mode."""
+        rc = self.retrieval_config
+        if rc.ann == "hnsw":
+            return HNSWIndex.load(self.persist_directory, ef=rc.ann_ef, threads=rc.ann_threads)
+        if rc.ann == "ivf":
+            index = IVFIndex.load(self.persist_directory, nprobe=rc.ann_nprobe, threads=rc.ann_threads)
+            expected = rc.quantization or "float32"
+        elif rc.quantization:
+            index = QuantizedIndex.load(self.persist_directory)
+            expected = rc.quantization
+        else:
+            return None
+        return index if index is not None and index.dtype == expected else None
+    
+    def _build_side_index(self) -> None:
+        """Load every vector in the collection into a fresh side index and persist it."""
+        index = self._new_side_index()
+        self.side_index = index
+        if index is None:
+            return
+        
+        if isinstance(index, IVFIndex):
+            sample = []
+            for _, vectors in self._iter_embeddings():
+                sample.extend(vectors)
+                if len(sample) >= IVFIndex.TRAIN_SAMPLE:
+                    break
+            if sample:
+                index.train(sample)
+        
+        for ids, vectors in self._iter_embeddings():
+            index.add(ids, vectors)
+        index.save(self.persist_directory)
+        
+        full_bytes = len(index) * index.dimension * 4
+        logger.info(
+            f"Built {type(index).__name__} over {len(index)} vectors "
+            f"({index.nbytes / 1e6:.1f} MB in memory vs {full_bytes / 1e6:.1f} MB float32)"
+        )
+    
+    def search(self, query: str, k: int = None) -> List[Document]:
         """
         Search for relevant code chunks using semantic similarity.
         
         Args:
             query: Search query
-            k: Number of results to return
+            k: Number of results to return (defaults to the configured k)
             
         Returns:
             List of relevant Document objects
         """
-        if not self.retriever:
+        return [doc for doc, _ in self.search_with_scores(query, k)]
+    
+    def search_with_scores(self, query: str, k: int = None, search_type: str = None) -> List[Tuple[Document, float]]:
+        """
+        Embed the query and search, recording per-stage timings in self.last_timing.
+        
+        Args:
+            query: Search query
+            k: Number of results to return (defaults to the configured k)
+            search_type: "mmr" or "similarity" (defaults to the configured search type)
+            
+        Returns:
+            List of (Document, cosine similarity) pairs
+        """
+        if not self.db:
             raise ValueError("Vector store not initialized. Call initialize_from_documents() first.")
+        
+        search_type = search_type or self.retrieval_config.search_type
+        start = time.perf_counter()
+        hits_before = self.embedding_cache.hits
+        query_vector = self.embed_query(query)
+        embedding_hit = self.embedding_cache.hits > hits_before
+        embedded = time.perf_counter()
+        hits_before = self.result_cache.hits
+        results = self.search_by_vector(query_vector, k, search_type)
+        result_hit = self.result_cache.hits > hits_before
+        done = time.perf_counter()
+        
+        self.last_timing = {
+            "embed_ms": (embedded - start) * 1000,
+            "search_ms": (done - embedded) * 1000,
+            "total_ms": (done - start) * 1000,
+            "embedding_cache_hit": embedding_hit,
+            "result_cache_hit": result_hit,
+        }
+        logger.info(
+            f"Retrieved {len(results)} chunks in {self.last_timing['total_ms']:.1f} ms "
+            f"(embed {self.last_timing['embed_ms']:.1f} ms{' cached' if embedding_hit else ''}, "
+            f"{search_type} {self.last_timing['search_ms']:.1f} ms{' cached' if result_hit else ''})"
+        )
+        return results
+    
+    def _query_key(self, query: str) -> Tuple[str, str]:
+        # Only whitespace is normalized: embeddings (and identifiers) are case-sensitive
+        return self.config.embedding_model, " ".join(query.split())
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, reusing the cached vector for repeated text (ignoring whitespace differences).
+        """
+        key = self._query_key(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.embedding_cache.put(key, vector)
+        return vector
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several queries with one batched call for the ones not already cached.
+        """
+        keys = [self._query_key(query) for query in queries]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.embeddings.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.embedding_cache.put(keys[i], vector)
+        return vectors
+    
+    def search_many(self, queries: List[str], k: int = None) -> List[List[Document]]:
+        """
+        Run several queries at once: one batched embedding call and one batched side index
+        search, then the per-query fetch, rescoring and MMR run concurrently.
+        
+        Returns:
+            One ranked document list per query
+        """
+        vectors = self.embed_queries(queries)
+        hits = self._side_hits(vectors, k)
+        with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="multi-query") as executor:
+            results = list(executor.map(lambda args: self.search_by_vector(args[0], k, side_hits=args[1]),
+                                        zip(vectors, hits)))
+        return [[doc for doc, _ in ranking] for ranking in results]
+    
+    def _side_hits(self, vectors: list, k: int = None) -> list:
+        """
+        Side index candidates for a batch of query embeddings in one search_batch call
+        (hnswlib spreads the batch over its native threads), or None per query when the
+        candidates come from Chroma or the two-tier file search instead.
+        """
+        rc = self.retrieval_config
+        if self.side_index is None or rc.top_files or not vectors:
+            return [None] * len(vectors)
+        k = k or rc.k
+        n_candidates = max(k, rc.fetch_k) if rc.search_type == "mmr" else k
+        return self.side_index.search_batch(vectors, self._side_search_size(n_candidates))
+    
+    def _side_search_size(self, n: int) -> int:
+        """Side index candidates fetched for n results: more when a lossy index is rescored."""
+        if self.retrieval_config.rescore and not self.side_index.exact:
+            return n * max(1, self.retrieval_config.rescore_multiplier)
+        return n
+    
+    def lexical_search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
+        """
+        Keyword (BM25) search that needs no query embedding, for when the embedding model
+        is too slow to answer within the latency budget. While the lexical index is still
+        loading it answers from the chunks read so far; without lexical on, the first call
+        builds the index.
+        
+        Returns:
+            List of (Document, BM25 score) pairs
+        """
+        if not self.db:
+            raise ValueError("Vector store not initialized. Call initialize_from_documents() first.")
+        if self.lexical_index is None:
+            self._open_lexical_index(background=False)
+        with self._lexical_lock:
+            if not self._lexical_loaded.is_set():
+                logger.info(f"Lexical index still loading; searching {len(self.lexical_index)} chunks")
+            hits = self.lexical_index.search(query, k or self.retrieval_config.k)
+        return self._expand_duplicates(self._fetch_documents(hits))
+    
+    def _open_lexical_index(self, background: bool) -> None:
+        """Start a lexical index over the stored chunk texts, filled on a thread or right away."""
+        index = LexicalIndex()
+        with self._lexical_lock:
+            self.lexical_index = index
+            self._lexical_loaded.clear()
+            self._lexical_removed.clear()
+        if background:
+            threading.Thread(target=self._fill_lexical_index, args=(index, self.db),
+                             name="lexical-index", daemon=True).start()
+        else:
+            self._fill_lexical_index(index, self.db)
+    
+    def _drop_lexical_index(self) -> None:
+        with self._lexical_lock:
+            self.lexical_index = None
+    
+    def _fill_lexical_index(self, index: LexicalIndex, db) -> None:
+        start = time.perf_counter()
+        try:
+            # Deletions during a pass shift the pages, so a pass that comes up short is repeated
+            for _ in range(3):
+                offset = 0
+                while True:
+                    batch = db.get(limit=self.PAGE_SIZE, offset=offset, include=["documents"])
+                    if not batch["ids"]:
+                        break
+                    offset += len(batch["ids"])
+                    with self._lexical_lock:
+                        if self.lexical_index is not index:
+                            return  # the store was reloaded meanwhile
+                        # Chunks written meanwhile are already indexed; deleted ones stay out
+                        rows = [(chunk_id, text) for chunk_id, text in zip(batch["ids"], batch["documents"])
+                                if chunk_id not in self._lexical_removed and chunk_id not in index.positions]
+                        index.add([chunk_id for chunk_id, _ in rows], [text for _, text in rows])
+                with self._lexical_lock:
+                    if len(index) >= db._collection.count():
+                        break
+        except Exception as e:
+            logger.warning(f"Loading the lexical index failed: {e}")
+        with self._lexical_lock:
+            if self.lexical_index is index:
+                self._lexical_removed.clear()
+                self._lexical_loaded.set()
+        logger.info(f"Loaded lexical index over {len(index)} chunks in {time.perf_counter() - start:.2f}s")
+    
+    def _update_lexical_index(self, added: List[Document] = (), added_ids: List[str] = (),
+                              removed_ids: List[str] = ()) -> None:
+        """Keep the lexical index in step with chunks written to or deleted from the collection."""
+        with self._lexical_lock:
+            if self.lexical_index is None:
+                return
+            if removed_ids:
+                self.lexical_index.remove(removed_ids)
+                if not self._lexical_loaded.is_set():
+                    self._lexical_removed.update(removed_ids)
+            if added_ids:
+                self._lexical_removed.difference_update(added_ids)
+                self.lexical_index.add(list(added_ids), [doc.page_content for doc in added])
+    
+    def _bump_generation(self, reindexed: bool = False) -> None:
+        """
+        Invalidate cached results after the indexed content changed.
+        Query embeddings only depend on the text and model, so they survive
+        incremental additions and are dropped only when the index is rebuilt or reloaded.
+        """
+        self.generation += 1
+        self.result_cache.clear()
+        if reindexed:
+            self.embedding_cache.clear()
+    
+    def search_by_vector(self, query_vector, k: int = None, search_type: str = None,
+                         side_hits: Optional[List[Tuple[str, float]]] = None) -> List[Tuple[Document, float]]:
+        """
+        Search with an already computed query embedding.
+        MMR runs as one NumPy pass over the candidate matrix fetched with the search.
+        
+        Args:
+            query_vector: Query embedding
+            k: Number of results to return (defaults to the configured k)
+            search_type: "mmr" or "similarity" (defaults to the configured search type)
+            side_hits: Side index candidates already found for this query by a batched search
             
-        results = self.retriever.get_relevant_documents(query)
-        return results[:k]
+        Returns:
+            List of (Document, cosine similarity) pairs
+        """
+        rc = self.retrieval_config
+        k = k or rc.k
+        search_type = search_type or rc.search_type
+        mmr = search_type == "mmr"
+        
+        cache_key = (self.generation, self._fingerprint(query_vector), k, search_type,
+                     rc.fetch_k if mmr else None, rc.lambda_mult if mmr else None, rc.top_files)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return self._expand_duplicates(self._fetch_documents(cached))
+        
+        n_candidates = max(k, rc.fetch_k) if mmr else k
+        files = self.file_index.top_files(query_vector, rc.top_files) if rc.top_files and self.file_index else []
+        if files:
+            documents, scores, vectors = self._candidates_in(query_vector, n_candidates, files)
+        else:
+            documents, scores, vectors = self._candidates(query_vector, n_candidates, need_vectors=mmr, hits=side_hits)
+        
+        if mmr and documents:
+            order = maximal_marginal_relevance(query_vector, vectors, k, rc.lambda_mult)
+        else:
+            order = range(min(k, len(documents)))
+        results = [(documents[i], float(scores[i])) for i in order]
+        
+        self.result_cache.put(cache_key, [(doc.id, score) for doc, score in results])
+        return self._expand_duplicates(results)
+    
+    def _expand_duplicates(self, results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """List every source of deduplicated chunks in metadata["sources"], representative first."""
+        if len(self.duplicates):
+            for doc, _ in results:
+                sources = self.duplicates.sources(doc.id)
+                if sources:
+                    doc.metadata["sources"] = sources
+        return results
+    
+    @staticmethod
+    def _fingerprint(query_vector) -> str:
+        """Stable hash of a query embedding, tolerant to float noise below 1e-4."""
+        rounded = np.round(QuantizedIndex.normalize(query_vector)[0], 4)
+        return hashlib.blake2b(rounded.tobytes(), digest_size=16).hexdigest()
+    
+    def _fetch_documents(self, scored_ids: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        """Load documents by chunk id, keeping the given order and scores."""
+        if not scored_ids:
+            return []
+        rows = self.db.get(ids=[doc_id for doc_id, _ in scored_ids], include=["documents", "metadatas"])
+        position = {doc_id: i for i, doc_id in enumerate(rows["ids"])}
+        return [
+            (Document(page_content=rows["documents"][position[doc_id]],
+                      metadata=rows["metadatas"][position[doc_id]] or {}, id=doc_id), score)
+            for doc_id, score in scored_ids if doc_id in position
+        ]
+    
+    def _candidates(self, query_vector, n: int, need_vectors: bool,
+                    hits: Optional[List[Tuple[str, float]]] = None) -> Tuple[List[Document], np.ndarray, Optional[np.ndarray]]:
+        """
+        Best n candidates, sorted by cosine similarity, with their embedding matrix
+        when needed (MMR, or rescoring a lossy side index). hits are side index
+        results fetched ahead by search_many; otherwise the side index is searched here.
+        """
+        query = QuantizedIndex.normalize(query_vector)[0]
+        
+        if self.side_index is None:
+            n = min(n, self.db._collection.count())
+            if n <= 0:
+                return [], np.empty(0), None
+            result = self.db._collection.query(
+                query_embeddings=[query_vector],
+                n_results=n,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids, texts, metadatas = result["ids"][0], result["documents"][0], result["metadatas"][0]
+            vectors = np.asarray(result["embeddings"][0], dtype=np.float32)
+            scores = QuantizedIndex.normalize(vectors) @ query
+        else:
+            rescore = self.retrieval_config.rescore and not self.side_index.exact
+            if hits is None:
+                hits = self.side_index.search(query_vector, self._side_search_size(n))
+            if not hits:
+                return [], np.empty(0), None
+            
+            with_vectors = rescore or need_vectors
+            include = ["documents", "metadatas"] + (["embeddings"] if with_vectors else [])
+            rows = self.db.get(ids=[doc_id for doc_id, _ in hits], include=include)
+            position = {doc_id: i for i, doc_id in enumerate(rows["ids"])}
+            hits = [(doc_id, score) for doc_id, score in hits if doc_id in position]
+            
+            ids = [doc_id for doc_id, _ in hits]
+            rows_order = [position[doc_id] for doc_id in ids]
+            texts = [rows["documents"][i] for i in rows_order]
+            metadatas = [rows["metadatas"][i] for i in rows_order]
+            vectors = np.asarray(rows["embeddings"], dtype=np.float32)[rows_order] if with_vectors else None
+            scores = (QuantizedIndex.normalize(vectors) @ query if rescore
+                      else np.array([score for _, score in hits], dtype=np.float32))
+        
+        order = np.argsort(-scores, kind="stable")[:n]
+        documents = [
+            Document(page_content=texts[i], metadata=metadatas[i] or {}, id=ids[i])
+            for i in order
+        ]
+        return documents, scores[order], vectors[order] if vectors is not None else None
+    
+    def _candidates_in(self, query_vector, n: int, sources: List[str]) -> Tuple[List[Document], np.ndarray, np.ndarray]:
+        """
+        Best n candidates among the chunks of the given files only, scored exactly.
+        Chunks stored under another copy's path are included through the duplicate registry.
+        """
+        include = ["documents", "metadatas", "embeddings"]
+        rows = self.db.get(where={"source": {"$in": sources}}, include=include)
+        ids, texts, metadatas = list(rows["ids"]), list(rows["documents"]), list(rows["metadatas"])
+        vectors = list(rows["embeddings"])
+        
+        present = set(ids)
+        shared = [chunk_id for chunk_id in self.duplicates.ids_for_sources(sources) if chunk_id not in present]
+        if shared:
+            extra = self.db.get(ids=shared, include=include)
+            ids += extra["ids"]
+            texts += extra["documents"]
+            metadatas += extra["metadatas"]
+            vectors += list(extra["embeddings"])
+        if not ids:
+            return [], np.empty(0), np.empty((0, 0), dtype=np.float32)
+        
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scores = QuantizedIndex.normalize(vectors) @ QuantizedIndex.normalize(query_vector)[0]
+        order = np.argsort(-scores, kind="stable")[:n]
+        documents = [Document(page_content=texts[i], metadata=metadatas[i] or {}, id=ids[i]) for i in order]
+        return documents, scores[order], vectors[order]
+    
+    def relocate_sources(self, move: Callable[[str], str]) -> int:
+        """
+        Rewrite the source path of every chunk, duplicate location and file summary, e.g.
+        after importing an index built from a checkout at another path. No re-embedding.
+        
+        Args:
+            move: Maps an old source path to the new one
+            
+        Returns:
+            Number of chunks updated
+        """
+        updated, offset = 0, 0
+        while True:
+            batch = self.db.get(limit=self.PAGE_SIZE, offset=offset, include=["metadatas"])
+            if not batch["ids"]:
+                break
+            metadatas = [{**(metadata or {}), "source": move(metadata["source"])} if metadata and "source" in metadata
+                         else metadata for metadata in batch["metadatas"]]
+            self.db._collection.update(ids=batch["ids"], metadatas=metadatas)
+            updated += len(batch["ids"])
+            offset += len(batch["ids"])
+        self.duplicates.relocate(move)
+        self.duplicates.save()
+        if self.file_index is not None:
+            self.file_index.relocate(move)
+        self._bump_generation()
+        return updated
+    
+    def update_file_summaries(self, summaries: Dict[str, str], removed: List[str] = ()) -> None:
+        """
+        Refresh the file-level vectors used by two-tier retrieval.
+        
+        Args:
+            summaries: Summary text per source path of new or changed files
+            removed: Source paths of files no longer indexed
+        """
+        if removed:
+            self.file_index.delete(list(removed))
+        if summaries:
+            self.file_index.upsert(summaries)
+        self._bump_generation()
     
     def get_retriever(self):
         """
         Get the retriever object for use in RAG chains.
         
         Returns:
-            Retriever object configured with MMR search
+            Retriever object configured with the store's search settings (MMR by default)
         """
         if not self.retriever:
             raise ValueError("Vector store not initialized")
         return self.retriever
     
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], flush_side_index: bool = True) -> List[str]:
         """
         Add new documents to existing vector store.
         
         Args:
             documents: List of Document objects to add
+            flush_side_index: Persist the side index after adding (off while streaming batches)
+            
+        Returns:
+            Chunk ids of the added documents
         """
         if not self.db:
             raise ValueError("Vector store not initialized")
+        if not documents:
+            return []
             
-        self.db.add_documents(documents)
-        logger.info(f"Added {len(documents)} new documents to vector store")
+        if self.dedup:
+            ids = [content_hash(doc.page_content) for doc in documents]
+            new_documents, new_ids = self._register_duplicates(documents, ids)
+        else:
+            ids = [str(uuid.uuid4()) for _ in documents]
+            new_documents, new_ids = documents, ids
+        
+        for start in range(0, len(new_documents), self.PAGE_SIZE):
+            end = start + self.PAGE_SIZE
+            self.db.add_documents(new_documents[start:end], ids=new_ids[start:end])
+        
+        self._update_lexical_index(added=new_documents, added_ids=new_ids)
+        if self.side_index is not None and new_ids:
+            rows = self.db.get(ids=new_ids, include=["embeddings"])
+            self.side_index.add(rows["ids"], rows["embeddings"])
+            if flush_side_index:
+                self.side_index.save(self.persist_directory)
+        if flush_side_index:
+            self.duplicates.save()
+        
+        self._bump_generation()
+        duplicates = len(documents) - len(new_documents)
+        logger.info(f"Added {len(new_documents)} new documents to vector store"
+                    + (f" ({duplicates} duplicate chunks not re-embedded)" if duplicates else ""))
+        return ids
+    
+    def _register_duplicates(self, documents: List[Document], ids: List[str]) -> Tuple[List[Document], List[str]]:
+        """
+        Record chunks whose content is already stored (or repeated within the batch) as extra
+        locations, returning only the documents that still need embedding.
+        """
+        stored = self.db.get(ids=list(dict.fromkeys(ids)), include=["metadatas"])
+        representatives = {chunk_id: location(metadata or {})
+                           for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])}
+        new = {}
+        for doc, chunk_id in zip(documents, ids):
+            if chunk_id in representatives:
+                self.duplicates.add(chunk_id, representatives[chunk_id], location(doc.metadata))
+            elif chunk_id in new:
+                self.duplicates.add(chunk_id, location(new[chunk_id].metadata), location(doc.metadata))
+            else:
+                new[chunk_id] = doc
+        return list(new.values()), list(new)
+    
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        Remove chunks from the store and any side index.
+        
+        Args:
+            ids: Chunk ids to delete
+        """
+        if not self.db:
+            raise ValueError("Vector store not initialized")
+        if not ids:
+            return
+        
+        for start in range(0, len(ids), self.PAGE_SIZE):
+            self.db.delete(ids=ids[start:start + self.PAGE_SIZE])
+        self._update_lexical_index(removed_ids=ids)
+        if self.side_index is not None:
+            self.side_index.remove(ids)
+            self.side_index.save(self.persist_directory)
+        self.duplicates.forget(ids)
+        self.duplicates.save()
+        
+        self._bump_generation()
+        logger.info(f"Deleted {len(ids)} documents from vector store")
+    
+    def prune_unreferenced(self, referenced: Set[str]) -> int:
+        """
+        Delete stored chunks no file refers to, i.e. what a resumed build wrote after its
+        last checkpoint for files that changed (or with random ids, see dedup) before the rerun.
+        
+        Returns:
+            Number of chunks deleted
+        """
+        unreferenced, offset = [], 0
+        while True:
+            batch = self.db.get(limit=self.PAGE_SIZE, offset=offset, include=[])
+            if not batch["ids"]:
+                break
+            unreferenced.extend(chunk_id for chunk_id in batch["ids"] if chunk_id not in referenced)
+            offset += len(batch["ids"])
+        self.delete_documents(unreferenced)
+        return len(unreferenced)
+    
+    def release_sources(self, ids_by_source: Dict[str, List[str]]) -> None:
+        """
+        Remove the chunks of changed or deleted files. A deduplicated chunk is only deleted
+        once no other file still contains it; if its representative location goes away, the
+        stored metadata is moved to a remaining copy.
+        
+        Args:
+            ids_by_source: Chunk ids per source path, as returned when the files were added
+        """
+        orphaned, moved = [], {}
+        for source, ids in ids_by_source.items():
+            for chunk_id in dict.fromkeys(ids):
+                is_orphaned, representative = self.duplicates.release(chunk_id, source)
+                if is_orphaned:
+                    orphaned.append(chunk_id)
+                    moved.pop(chunk_id, None)
+                elif representative:
+                    moved[chunk_id] = representative
+        
+        if moved:
+            rows = self.db.get(ids=list(moved), include=["metadatas"])
+            self.db._collection.update(
+                ids=rows["ids"],
+                metadatas=[{**(metadata or {}), **moved[chunk_id]}
+                           for chunk_id, metadata in zip(rows["ids"], rows["metadatas"])]
+            )
+            self._bump_generation()
+        if orphaned:
+            self.delete_documents(orphaned)
+        self.duplicates.save()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from file_reader import read_source_file
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_file_mentioning_autogenerated_is_indexed(tmp_path):
+    text = (
+        "# Order handling; please DO NOT EDIT the public API without a review\n"
+        "class Order:\n"
+        '    """Orders with autogenerated ids."""\n'
+    )
+    path = _write(tmp_path, "orders.py", text)
+    assert read_source_file(path) == (text, None)
+
+
+def test_generator_headers_are_skipped(tmp_path):
+    headers = {
+        "api.go": "// Code generated by protoc-gen-go. DO NOT EDIT.\n\npackage api\n",
+        "schema.py": "#!/usr/bin/env python\n# @generated by schema-tool\nSCHEMA = {}\n",
+        "types.ts": "/*\n Copyright (c) Example\n @generated\n*/\nexport type Id = string;\n",
+    }
+    for name, text in headers.items():
+        assert read_source_file(_write(tmp_path, name, text)) == (None, "generated"), name
+
+
+def test_header_after_code_is_ignored(tmp_path):
+    text = "package api\n\n// Code generated by hand. DO NOT EDIT.\n"
+    path = _write(tmp_path, "api.go", text)
+    assert read_source_file(path) == (text, None)
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from langchain_core.documents import Document
+from config import LLMConfig
+from rag_chain import RAGChain
+
+
+class FakeRetriever:
+    """Returns k new chunks per search; every question embeds to its own direction."""
+
+    def __init__(self, k: int = 4):
+        self.k = k
+        self.searches = 0
+        self.questions = []
+
+    def invoke(self, question):
+        self.searches += 1
+        return [Document(page_content=f"def f{self.searches}_{i}(): pass",
+                         metadata={"source": f"search{self.searches}.py", "start_line": i + 1, "end_line": i + 1})
+                for i in range(self.k)]
+
+    def embed_query(self, question):
+        if question not in self.questions:
+            self.questions.append(question)
+        vector = [0.0] * 16
+        vector[self.questions.index(question)] = 1.0
+        return vector
+
+
+def test_chained_follow_ups_keep_context_bounded():
+    retriever = FakeRetriever(k=4)
+    chain = RAGChain(retriever, config=LLMConfig(provider="offline"), compress_prompt=False)
+    chain.start_session()
+
+    result = chain.query("How is a session created?")
+    assert result["retrieval"] == "new"
+    sizes = []
+    for follow_up in ("and where is that called?", "and what calls it?", "and where is it tested?"):
+        result = chain.query(follow_up)
+        assert result["retrieval"] == "extend"
+        sizes.append(len(result["context"]))
+
+    assert retriever.searches == 4
+    assert max(sizes) <= retriever.k
+    # The newest search results are always in the context
+    assert any(doc.metadata["source"] == "search4.py" for doc in result["context"])
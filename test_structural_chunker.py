@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from langchain_core.documents import Document
+from langchain_text_splitters import Language
+from structural_chunker import StructuralChunker
+
+JS_SOURCE = """import { api } from "./api";
+
+const RETRIES = 3;
+
+export class Client {
+  constructor(base) {
+    this.base = base;
+  }
+
+  fetch(path) {
+    return api(this.base + path);
+  }
+}
+
+function helper(x) {
+  return x * RETRIES;
+}
+"""
+
+GO_SOURCE = """package api
+
+import "fmt"
+
+type Server struct {
+\tName string
+}
+
+func (s *Server) Start() error {
+\tfmt.Println(s.Name)
+\treturn nil
+}
+"""
+
+
+def _chunks(text, source, language, chunk_size=2000):
+    doc = Document(page_content=text, metadata={"source": source, "language": language})
+    return [(chunk.metadata["symbol"], chunk.metadata["kind"], chunk.metadata["start_line"], chunk.metadata["end_line"])
+            for chunk in StructuralChunker(chunk_size=chunk_size, chunk_overlap=0).split_document(doc)]
+
+
+def test_javascript_definitions_become_chunks():
+    pytest.importorskip("tree_sitter_javascript")
+    assert _chunks(JS_SOURCE, "client.js", Language.JS) == [
+        ("<module>", "module", 1, 3),
+        ("Client", "class", 5, 13),
+        ("helper", "function", 15, 17),
+    ]
+
+
+def test_large_javascript_class_is_split_into_methods():
+    pytest.importorskip("tree_sitter_javascript")
+    chunks = _chunks(JS_SOURCE, "client.js", Language.JS, chunk_size=60)
+    # The class header joins the first method and the closing brace the last
+    assert ("Client.constructor", "method", 5, 8) in chunks
+    assert ("Client.fetch", "method", 10, 13) in chunks
+
+
+def test_go_declarations_become_chunks():
+    pytest.importorskip("tree_sitter_go")
+    assert _chunks(GO_SOURCE, "server.go", Language.GO) == [
+        ("<module>", "module", 1, 3),
+        ("Server", "function", 5, 7),
+        ("Start", "function", 9, 12),
+    ]